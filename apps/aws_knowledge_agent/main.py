@@ -1,14 +1,31 @@
 import logging
 import os
 import time
+import weakref
+from contextlib import asynccontextmanager
 from strands import Agent
 from strands.multiagent.a2a import A2AServer
 import uvicorn
-from fastapi import FastAPI
+from fastapi import FastAPI, Response
 from mcp.client.streamable_http import streamablehttp_client
-from strands import Agent
-from strands.models import BedrockModel
-from strands.tools.mcp.mcp_client import MCPClient
+from strands.hooks import BeforeInvocationEvent, HookProvider, HookRegistry
+from strands.tools.mcp.mcp_agent_tool import MCPAgentTool
+from strands.tools.registry import ToolRegistry
+
+from omnisearch_common.a2a_streaming import CancelOnDisconnectRequestHandler, StreamingA2AExecutor
+from omnisearch_common.admission import AdmissionMiddleware, admission_control
+from omnisearch_common.agent_cards import agent_card_etag, agent_card_registry
+from omnisearch_common.agent_pool import AgentPool
+from omnisearch_common.agent_template import AgentTemplate
+from omnisearch_common.bedrock_model import SPECIALIST_FALLBACK_MODELS, resilient_bedrock_model
+from omnisearch_common.context_budget import context_budget
+from omnisearch_common.http_transport import shared_transport
+from omnisearch_common.loop_monitor import loop_monitor
+from omnisearch_common.metrics import CONTENT_TYPE, render_metrics
+from omnisearch_common.prompt_cache import prompt_cache_reporter
+from omnisearch_common.task_store import task_store
+from omnisearch_common.tool_schema_cache import ListChangedMCPClient, tool_schema_cache
+from omnisearch_common.tracing import TraceContextMiddleware, setup_tracing
 
 
 system_prompt = """
@@ -110,47 +127,126 @@ Remember: You extract quotes. Another agent will handle interpretation and synth
 
 logging.basicConfig(level=logging.INFO)
 
+setup_tracing("aws_knowledge_agent")
+
 # Use the complete runtime URL from environment variable, fallback to local
 runtime_url = os.environ.get("AGENTCORE_RUNTIME_URL", "http://127.0.0.1:9000/")
 
 logging.info(f"Runtime URL: {runtime_url}")
 
 
-streamable_http_mcp_client = MCPClient(
-    lambda: streamablehttp_client("https://knowledge-mcp.global.api.aws")
-)
+knowledge_mcp_url = "https://knowledge-mcp.global.api.aws"
 
-bedrock_model = BedrockModel(
-    model_id="apac.amazon.nova-pro-v1:0",
+streamable_http_mcp_client = ListChangedMCPClient(
+    lambda: streamablehttp_client(knowledge_mcp_url),
+    on_tools_changed=lambda: tool_schema_cache.invalidate(knowledge_mcp_url),
 )
 
+bedrock_model = resilient_bedrock_model("apac.amazon.nova-pro-v1:0", fallbacks=SPECIALIST_FALLBACK_MODELS)
+
+
+def list_mcp_tools():
+    return [tool.mcp_tool for tool in streamable_http_mcp_client.list_tools_sync()]
+
+
 with streamable_http_mcp_client:
 
-    tools = streamable_http_mcp_client.list_tools_sync()
+    tools = [
+        MCPAgentTool(mcp_tool, streamable_http_mcp_client)
+        for mcp_tool in tool_schema_cache.get(knowledge_mcp_url, list_mcp_tools)
+    ]
+
+    tool_schema_version = tool_schema_cache.version(knowledge_mcp_url)
+
+    # Serve schemas from memory on every task; the cache refreshes them in the
+    # background on TTL expiry or `tools/list_changed`, and we swap them in here.
+    class RefreshTools(HookProvider):
+        def __init__(self):
+            # Schema version each pooled agent's tools were built from.
+            self._versions: weakref.WeakKeyDictionary[Agent, int] = weakref.WeakKeyDictionary()
+
+        def register_hooks(self, registry: HookRegistry, **kwargs) -> None:
+            registry.add_callback(BeforeInvocationEvent, self._refresh_tools)
 
-    strands_agent = Agent(
+        def _refresh_tools(self, event: BeforeInvocationEvent) -> None:
+            mcp_tools = tool_schema_cache.get(knowledge_mcp_url, list_mcp_tools)
+            version = tool_schema_cache.version(knowledge_mcp_url)
+            if self._versions.setdefault(event.agent, tool_schema_version) == version:
+                return
+
+            # A registry of the new tools replaces the old one, as ToolRegistry cannot unregister tools.
+            tool_registry = ToolRegistry()
+            tool_registry.process_tools([MCPAgentTool(mcp_tool, streamable_http_mcp_client) for mcp_tool in mcp_tools])
+            event.agent.tool_registry = tool_registry
+
+            self._versions[event.agent] = version
+            logging.info(f"Reloaded {len(mcp_tools)} MCP tools (schema version {version})")
+
+    agent_template = AgentTemplate(
         name="AWS Knowledge Search Agent",
         description="A search agent that executes AWS Knowledge MCP tools and extracts verbatim quotes from AWS documentation, API references, best practices, and architectural guidance without interpretation or synthesis.",
         system_prompt=system_prompt,
-        tools=[tools],
-        callback_handler=None,
+        tools=tools,
         model=bedrock_model,
+        hooks=[prompt_cache_reporter, context_budget, RefreshTools()],
     )
 
+    # Every A2A task checks out an agent of its own, so concurrent tasks never share a history.
+    agent_pool = AgentPool(agent_template)
+
     host, port = "0.0.0.0", 9000
 
     # Pass runtime_url to http_url parameter AND use serve_at_root=True
     a2a_server = A2AServer(
-        agent=strands_agent,
+        agent=agent_template.agent,
         http_url=runtime_url,
         serve_at_root=True,  # Serves locally at root (/) regardless of remote URL path complexity
+        task_store=task_store,  # bounded, so memory stays flat over days of uptime
+    )
+
+    # Stream the answer as artifact chunks so the orchestrator can relay it as it is written,
+    # and stop working on a task once the orchestrator gives up on it.
+    a2a_server.request_handler = CancelOnDisconnectRequestHandler(
+        agent_executor=StreamingA2AExecutor(agent_template.agent, checkout=agent_pool.agent),
+        task_store=task_store,
     )
 
-    app = FastAPI()
+    @asynccontextmanager
+    async def lifespan(app: FastAPI):
+        loop_monitor.start()
+        try:
+            yield
+        finally:
+            loop_monitor.stop()
+
+    app = FastAPI(lifespan=lifespan)
+
+    # Lets clients revalidate their cached agent card with a conditional GET.
+    app.middleware("http")(agent_card_etag)
+
+    # Bound concurrent agent runs; excess requests queue briefly or are shed with 429/503.
+    app.add_middleware(AdmissionMiddleware, control=admission_control)
+
+    # Outermost, so queueing and rejections are part of the caller's trace too.
+    app.add_middleware(TraceContextMiddleware)
 
     @app.get("/ping")
     def ping():
-        return {"status": "Healthy", "time_of_last_update": int(time.time())}
+        status = "HealthyBusy" if admission_control.busy else "Healthy"
+        return {"status": status, "time_of_last_update": int(time.time())}
+
+    @app.get("/metrics")
+    def metrics():
+        metrics_text = render_metrics(
+            admission=admission_control.stats,
+            agent_cards=agent_card_registry.stats,
+            agent_pool=agent_pool.stats,
+            event_loop=loop_monitor.stats,
+            task_store=task_store.stats,
+            tool_schema_cache=tool_schema_cache.stats,
+            transport=shared_transport.stats,
+        )
+        return Response(metrics_text, media_type=CONTENT_TYPE)
 
     app.mount("/", a2a_server.to_fastapi_app())
 
@@ -1,44 +1,101 @@
 import asyncio
-from strands import Agent
-from strands import Agent
-from strands.models import BedrockModel
-from strands_tools.a2a_client import A2AClientToolProvider
+from strands import Agent, tool
+
+from omnisearch_common.a2a_streaming import A2AStreamingClient
+from omnisearch_common.a2a_tool_provider import PooledA2AClientToolProvider
+from omnisearch_common.agent_cards import agent_card_registry
+from omnisearch_common.bedrock_model import resilient_bedrock_model
+from omnisearch_common.deadline import enforce_deadline
+from omnisearch_common.prompt_cache import RequestUsage, prompt_cache_reporter, request_usage
+from omnisearch_common.tracing import setup_tracing
+
+setup_tracing("enduser_agent")
 
 system_prompt = """
 pick an agent and make a sample call
 """
 
-agent_provider = A2AClientToolProvider(known_agent_urls=["http://127.0.0.1:10000"])
+known_agent_urls = ["http://127.0.0.1:10000"]
 
-bedrock_model = BedrockModel(
-    model_id="global.anthropic.claude-sonnet-4-5-20250929-v1:0",
-)
+# How long the user waits for an answer. The agents it reaches over A2A are sent what
+# is left of it, and everything still running when it passes is cancelled.
+REQUEST_TIMEOUT = 300  # [sec]
+
+agent_provider = PooledA2AClientToolProvider(known_agent_urls=known_agent_urls)
+
+a2a_stream_client = A2AStreamingClient()
+
+
+@tool
+async def a2a_send_message(message_text: str, target_agent_url: str):
+    """Send a message to a specific A2A agent and return its response, streamed as it is written.
+
+    Args:
+        message_text: The message content to send to the agent.
+        target_agent_url: The URL of the target A2A agent.
+    """
+    chunks: list[str] = []
+    async for text in a2a_stream_client.stream(target_agent_url, message_text):
+        chunks.append(text)
+        yield text
+
+    yield {"status": "success", "content": [{"text": "".join(chunks)}]}
+
+
+bedrock_model = resilient_bedrock_model("global.anthropic.claude-sonnet-4-5-20250929-v1:0")
 
 strands_agent = Agent(
     name="Enduser Agent",
     description="A helpful assistant.",
     system_prompt=system_prompt,
-    tools=agent_provider.tools,
+    tools=[
+        a2a_send_message,
+        agent_provider.a2a_discover_agent,
+        agent_provider.a2a_list_discovered_agents,
+    ],
     callback_handler=None,
     model=bedrock_model,
+    hooks=[prompt_cache_reporter],
 )
 
 
 # Async function that iterates over streamed agent events
 async def process_streaming_response():
+    # Discover the agents while the model plans its first step.
+    agent_card_registry.prefetch(known_agent_urls)
+
+    # Collects the tokens of this agent and of every agent it reaches over A2A.
+    usage = RequestUsage()
+    request_usage.set(usage)
+
     prompt = "Amazon S3 Vectors とはどのようなサービスですか ? 情報のソースもわかれば教えてください。"
 
     # Get an async iterator for the agent's response stream
     agent_stream = strands_agent.stream_async(prompt)
 
     # Process events as they arrive
-    async for event in agent_stream:
-        if "data" in event:
-            # Print text chunks as they're generated
-            print(event["data"], end="", flush=True)
-        elif "current_tool_use" in event and event["current_tool_use"].get("name"):
-            # Print tool usage information
-            print(f"\n[Tool use delta for: {event['current_tool_use']['name']}]")
+    try:
+        async with enforce_deadline(REQUEST_TIMEOUT):
+            async for event in agent_stream:
+                if "data" in event:
+                    # Print text chunks as they're generated
+                    print(event["data"], end="", flush=True)
+                elif "tool_stream_event" in event and isinstance(event["tool_stream_event"]["data"], str):
+                    # Print the remote agent's response as it streams in
+                    print(event["tool_stream_event"]["data"], end="", flush=True)
+                elif "current_tool_use" in event and event["current_tool_use"].get("name"):
+                    # Print tool usage information
+                    print(f"\n[Tool use delta for: {event['current_tool_use']['name']}]")
+    except TimeoutError:
+        print(f"\n\n[No answer within {REQUEST_TIMEOUT}s]")
+
+    print("\n\n[Token usage by layer]")
+    for layer, layer_usage in {**usage.layers, "Total": usage.total}.items():
+        print(
+            f"{layer}: {layer_usage.model_calls} model calls, {layer_usage.input_tokens} input "
+            f"(+{layer_usage.cache_read_input_tokens} cache-read) / {layer_usage.output_tokens} output tokens, "
+            f"~${layer_usage.cost_usd:.4f}"
+        )
 
 
 # Run the agent with the async event processing
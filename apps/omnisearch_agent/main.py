@@ -1,225 +1,277 @@
 import logging
 import os
 import time
-from strands import Agent
+from contextlib import asynccontextmanager
+from urllib.parse import urlsplit, urlunsplit
+from strands import tool
 from strands.multiagent.a2a import A2AServer
 import uvicorn
-from fastapi import FastAPI
-from mcp.client.streamable_http import streamablehttp_client
-from strands import Agent
-from strands.models import BedrockModel
-from strands.tools.mcp.mcp_client import MCPClient
-from strands_tools.a2a_client import A2AClientToolProvider
+from fastapi import FastAPI, Response
+from strands.types.tools import ToolContext
+
+from omnisearch_common.a2a_streaming import A2AStreamingClient, CancelOnDisconnectRequestHandler, StreamingA2AExecutor
+from omnisearch_common.a2a_tool_provider import PooledA2AClientToolProvider
+from omnisearch_common.admission import AdmissionMiddleware, admission_control
+from omnisearch_common.agent_cards import agent_card_etag, agent_card_registry
+from omnisearch_common.agent_pool import AgentPool
+from omnisearch_common.agent_template import AgentTemplate
+from omnisearch_common.bedrock_model import resilient_bedrock_model
+from omnisearch_common.dedupe import near_duplicate_detector
+from omnisearch_common.fanout import (
+    Specialist,
+    SpecialistResult,
+    collected_results,
+    fan_out,
+    format_results,
+    specialist_flights,
+    stream_chunk,
+    stream_sink,
+)
+from omnisearch_common.http_transport import shared_transport
+from omnisearch_common.loop_monitor import loop_monitor
+from omnisearch_common.metrics import CONTENT_TYPE, render_metrics
+from omnisearch_common.prompt_cache import prompt_cache_reporter
+from omnisearch_common.result_cache import result_cache
+from omnisearch_common.task_store import task_store
+from omnisearch_common.thinking_filter import ThinkingFilter
+from omnisearch_common.tracing import TraceContextMiddleware, setup_tracing
 
 system_prompt = """
 # Omni Search Agent System Prompt
 
 ## Role and Purpose
 
-You are an **Omni Search Agent**, serving as an intelligent aggregation layer between end-user agents and specialized search agents. Your primary responsibility is to:
-
-1. Analyze incoming search queries
-2. Delegate searches to appropriate specialized search agents
-3. Collect and aggregate results from multiple agents
-4. Format aggregated results according to specified output format
+You are an **Omni Search Agent**, the routing layer between end-user agents and specialized search agents. Your only job is to decide which specialized search agents a query needs and to consult them with a single `search_specialists` call.
 
-You do NOT perform searches yourself. You orchestrate specialized search agents and consolidate their findings.
+You do NOT perform searches, and you do NOT write the answer. `search_specialists` merges, deduplicates and formats the specialists' results itself, and its result is returned to the user verbatim as the final answer; the conversation ends with that call.
 
-## Core Responsibilities
+## How to Handle a Query
 
 ### 1. Query Analysis
 
 When receiving a query, analyze:
 - **Domain/Technology**: Which specialized agents should be consulted? (e.g., AWS, Azure, Microsoft, general web)
-- **Query Complexity**: Does this require single or multiple specialized agents?
-- **Information Type**: Documentation, code samples, availability data, general information?
+- **Query Complexity**: Does it span more than one domain?
 
 ### 2. Agent Selection
 
-Select appropriate specialized search agents based on query characteristics:
-
-- **Multiple agents may be needed** if query spans multiple domains
+- Use `a2a_list_discovered_agents` to see the specialized search agents and their skills, and `a2a_discover_agent` for an agent URL you have been given
 - **Prioritize official documentation agents** for technical queries
-- **Use web search agents** as fallback or supplement
-- **Consider complementary agents** that might provide related valuable information
+- **Pass several agent URLs** when the query spans more than one domain; omit `agent_urls` to consult every known agent
 
-### 3. Result Aggregation
+### 3. Search
 
-After receiving results from specialized agents:
+Call `search_specialists` exactly once, passing the user's query unchanged and every agent it needs. Do not call it once per agent, and do not write any text before or after the call.
 
-- **Preserve verbatim quotes**: Never modify or paraphrase agent results
-- **Maintain source attribution**: Keep all source URLs and titles intact
-- **Group related information**: Combine related quotes from same/related sources into single Result sections
-- **Remove duplicates**: If multiple agents return identical information, include only once
-- **Preserve metadata**: Keep version/date information when present
+## Example Execution Flow
 
-### 4. Output Formatting
+```
+1. Receive query: "How to configure Azure Functions with Python 3.11?"
 
-Format all aggregated results following this strict structure:
+2. Analyze query:
+   - Domain: Microsoft/Azure
+   - Type: Configuration documentation
 
-```markdown
-# Result N
+3. Call search_specialists once with the query and the Microsoft documentation agent's URL
 
-(Version/date information if found in source - leave empty if none)
+4. Done: the tool's formatted results are the answer
+```
 
-## Content
+## Limitations and Boundaries
 
-[Exact quotes from source(s) - verbatim only]
+**You do NOT:**
+- Perform web searches directly
+- Access MCP servers directly
+- Summarize, rewrite, reformat or comment on the results
+- Call `search_specialists` more than once per query
+"""
 
-## Sources
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
 
-- [Source Title](Full URL)
-- [Source Title](Full URL)
+setup_tracing("omnisearch_agent")
 
----
-```
+DEFAULT_TIMEOUT = 300  # [sec], end to end, unless the caller sends a deadline of its own
 
-## Formatting Rules
+runtime_url = os.environ.get("AGENTCORE_RUNTIME_URL", "http://127.0.0.1:10000/")
 
-### ✅ MUST
 
-- Copy all content exactly as provided by search agents (character-for-character)
-- Preserve all formatting, code blocks, lists, emphasis
-- Use complete markdown link format for sources: `[Title](URL)`
-- Extract and include version/date information when present
-- Group related quotes from same topic/source into one Result section
-- Separate distinct pieces of information with `---` divider
-- Number results sequentially starting from 1
+specialist_agent_urls = ["http://127.0.0.1:9000"]
 
-### ❌ NEVER
+agent_provider = PooledA2AClientToolProvider(known_agent_urls=specialist_agent_urls)
 
-- Summarize, paraphrase, or reword agent results
-- Add your own explanations, commentary, or interpretations
-- Combine information from sources into new sentences
-- Add transitional phrases like "according to", "the documentation states"
-- Modify code formatting or technical content
-- Omit or shorten source URLs
-- Add content not present in agent results
+a2a_stream_client = A2AStreamingClient(timeout=DEFAULT_TIMEOUT)
 
-## Quality Assurance
 
-Before delivering results:
+def a2a_specialist(url: str) -> Specialist:
+    async def search(query: str) -> str:
+        chunks: list[str] = []
+        async for text in a2a_stream_client.stream(url, query):
+            chunks.append(text)
+            await stream_chunk(text)
+        return "".join(chunks)
 
-- [ ] All content is verbatim from search agent results
-- [ ] Every source has complete title and URL
-- [ ] Related information is properly grouped
-- [ ] Duplicates have been removed
-- [ ] Version/date info is included where available
-- [ ] Code blocks and formatting are preserved
-- [ ] Each Result section has clear separation
-- [ ] Sources are listed in markdown link format
+    return Specialist(url, search, cache=result_cache)
 
-## Edge Cases
 
-### No Results Found
-If no specialized agents return results:
-```markdown
-# Search Results
+def normalize_agent_url(url: str) -> str:
+    """`url` with its scheme and host lowercased and without a trailing slash, as model-written URLs vary."""
+    parts = urlsplit(url.strip())
+    return urlunsplit((parts.scheme.lower(), parts.netloc.lower(), parts.path.rstrip("/"), parts.query, ""))
 
-No relevant information found from available sources.
 
-Attempted searches:
-- [Agent 1 Name]: No results
-- [Agent 2 Name]: No results
-```
+specialists = {normalize_agent_url(url): a2a_specialist(url) for url in specialist_agent_urls}
 
-### Partial Results
-If some agents fail but others succeed, include successful results only and note which agents were consulted.
 
-### Conflicting Information
-If agents return conflicting information, include both as separate Result sections. Do NOT attempt to resolve conflicts or determine which is correct.
+@tool(context=True)
+async def search_specialists(
+    query: str, tool_context: ToolContext, agent_urls: list[str] | None = None
+) -> str:
+    """Search the selected specialized search agents in parallel and return all of their results.
 
-## Example Execution Flow
+    The merged, deduplicated results are returned to the user as the final answer as-is.
 
-```
-1. Receive query: "How to configure Azure Functions with Python 3.11?"
+    Call this once with every agent the query needs instead of messaging agents one by one.
 
-2. Analyze query:
-   - Domain: Microsoft/Azure
-   - Type: Configuration documentation
-   - Agents needed: Microsoft Documentation agent
+    Args:
+        query: The search query to send to each specialized search agent.
+        agent_urls: URLs of the specialized search agents to consult, as listed by
+            a2a_list_discovered_agents. All known agents are consulted when omitted;
+            URLs of unknown agents are ignored.
+    """
+    # Only configured specialists are searched: the URLs come from the model, and an
+    # unknown one would make this server send the query to an arbitrary host.
+    requested = dict.fromkeys(normalize_agent_url(url) for url in agent_urls or [])
+    if unknown := [url for url in requested if url not in specialists]:
+        logger.warning(f"Ignoring unknown specialist agent URLs: {unknown}")
+    selected = [specialists[url] for url in requested if url in specialists] or list(specialists.values())
 
-3. Delegate to Microsoft Documentation agent
+    results = await fan_out(query, selected)
 
-4. Receive results from agent(s)
+    # Merging is deterministic (see format_results), so no model turn follows this call.
+    tool_context.invocation_state["request_state"]["stop_event_loop"] = True
 
-5. Aggregate and format:
-   - Group related configuration info
-   - Preserve exact quotes
-   - Include all source URLs
-   - Add version info if present
+    return format_results(results)
 
-6. Deliver formatted results
-```
 
-## Limitations and Boundaries
+bedrock_model = resilient_bedrock_model("apac.amazon.nova-pro-v1:0")
 
-**You do NOT:**
-- Perform web searches directly
-- Access MCP servers directly
-- Interpret or explain results
-- Make recommendations
-- Filter results by quality (include all agent results)
-- Decide which information is "better" or "more accurate"
-
-**You ARE:**
-- A coordination and aggregation layer
-- A format enforcer
-- A duplicate remover
-- A results organizer
-
-## Success Criteria
-
-A successful response:
-1. Correctly identifies relevant specialized agents
-2. Collects results from all selected agents
-3. Preserves all content verbatim
-4. Groups related information logically
-5. Follows output format exactly
-6. Includes complete source attribution
-7. Contains no added interpretation or commentary
-
-Remember: Your value lies in intelligent agent orchestration and meticulous result aggregation, not in search execution or content interpretation.
-"""
+agent_template = AgentTemplate(
+    name="Omni Search Agent",
+    description="A search orchestrator that integrates multiple specialized search agents (Web search, AWS, Azure, Microsoft, Strands Agents, etc.) and intelligently delegates queries to the most appropriate agents. Accurately retrieves official documentation, code samples, and technical information with complete source attribution.",
+    system_prompt=system_prompt,
+    tools=[
+        search_specialists,
+        agent_provider.a2a_discover_agent,
+        agent_provider.a2a_list_discovered_agents,
+    ],
+    model=bedrock_model,
+    hooks=[prompt_cache_reporter],
+)
 
-logging.basicConfig(level=logging.INFO)
-logger = logging.getLogger(__name__)
+# Every A2A task checks out an agent of its own, so concurrent tasks never share a history.
+agent_pool = AgentPool(agent_template)
 
-DEFAULT_TIMEOUT = 300  # [sec]
 
-runtime_url = os.environ.get("AGENTCORE_RUNTIME_URL", "http://127.0.0.1:10000/")
+class OmnisearchA2AExecutor(StreamingA2AExecutor):
+    """Relays specialist output to the caller as progress while the specialists are still answering.
 
+    The model only selects the specialists; their merged results are the answer.
+    """
 
-agent_provider = A2AClientToolProvider(known_agent_urls=["http://127.0.0.1:9000"])
+    async def _execute_streaming(self, context, updater):
+        async def forward(specialist: str, text: str):
+            await self.report_progress(updater, text, source=specialist)
 
-bedrock_model = BedrockModel(
-    model_id="apac.amazon.nova-pro-v1:0",
-)
+        token = stream_sink.set(forward)
+        try:
+            await super()._execute_streaming(context, updater)
+        finally:
+            stream_sink.reset(token)
+
+    async def answer(self, agent, content_blocks):
+        results: list[SpecialistResult] = []
+        token = collected_results.set(results)
+        try:
+            thinking_filter = ThinkingFilter()
+            async for event in agent.stream_async(content_blocks):
+                if "data" in event:
+                    yield thinking_filter.feed(event["data"])
+        finally:
+            collected_results.reset(token)
+
+        if not results:
+            yield thinking_filter.flush()
+            return
+
+        answer = format_results(results)
+        # search_specialists ends the turn on its tool result; record the answer so the
+        # conversation keeps alternating between user and assistant.
+        agent.messages.append({"role": "assistant", "content": [{"text": answer}]})
+        yield answer
 
-strands_agent = Agent(
-    name="Omni Search Agent",
-    description="A search orchestrator that integrates multiple specialized search agents (Web search, AWS, Azure, Microsoft, Strands Agents, etc.) and intelligently delegates queries to the most appropriate agents. Accurately retrieves official documentation, code samples, and technical information with complete source attribution.",
-    system_prompt=system_prompt,
-    tools=agent_provider.tools,
-    callback_handler=None,
-    model=bedrock_model,
-)
 
 host, port = "0.0.0.0", 10000
 
 # Pass runtime_url to http_url parameter AND use serve_at_root=True
 a2a_server = A2AServer(
-    agent=strands_agent,
+    agent=agent_template.agent,
     http_url=runtime_url,
     serve_at_root=True,  # Serves locally at root (/) regardless of remote URL path complexity
+    task_store=task_store,  # bounded, so memory stays flat over days of uptime
+)
+
+# A task that outlives its deadline or its client is cancelled, along with the specialist
+# A2A tasks and model streams it started; the specialists are sent what is left of the deadline.
+a2a_server.request_handler = CancelOnDisconnectRequestHandler(
+    agent_executor=OmnisearchA2AExecutor(agent_template.agent, checkout=agent_pool.agent, timeout=DEFAULT_TIMEOUT),
+    task_store=task_store,
 )
 
-app = FastAPI()
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    loop_monitor.start()
+    # Discover every specialist concurrently in the background; cards cached on disk
+    # (AGENT_CARD_CACHE_PATH) are served at once, so no request waits on discovery.
+    agent_card_registry.prefetch(specialist_agent_urls)
+    try:
+        yield
+    finally:
+        loop_monitor.stop()
+
+
+app = FastAPI(lifespan=lifespan)
+
+# Lets clients revalidate their cached agent card with a conditional GET.
+app.middleware("http")(agent_card_etag)
+
+# Bound concurrent agent runs; excess requests queue briefly or are shed with 429/503.
+app.add_middleware(AdmissionMiddleware, control=admission_control)
+
+# Outermost, so queueing and rejections are part of the caller's trace too.
+app.add_middleware(TraceContextMiddleware)
 
 
 @app.get("/ping")
 def ping():
-    return {"status": "Healthy", "time_of_last_update": int(time.time())}
+    status = "HealthyBusy" if admission_control.busy else "Healthy"
+    return {"status": status, "time_of_last_update": int(time.time())}
+
+
+@app.get("/metrics")
+def metrics():
+    metrics_text = render_metrics(
+        admission=admission_control.stats,
+        agent_cards=agent_card_registry.stats,
+        agent_pool=agent_pool.stats,
+        event_loop=loop_monitor.stats,
+        near_duplicates=near_duplicate_detector.stats,
+        single_flight=specialist_flights.stats,
+        task_store=task_store.stats,
+        transport=shared_transport.stats,
+    )
+    return Response(metrics_text, media_type=CONTENT_TYPE)
 
 
 app.mount("/", a2a_server.to_fastapi_app())
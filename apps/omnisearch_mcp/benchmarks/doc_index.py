@@ -0,0 +1,220 @@
+"""Query latency benchmark for src.doc_index against the remote specialist path.
+
+Run from apps/omnisearch_mcp:
+
+    python -m benchmarks.doc_index [--index PATH] [--remote 3] [--remote-seconds 20.0]
+
+Without `--index` a synthetic index of `--pages` generated pages is built in a
+temporary directory. Queries are the router corpus. With `--remote N` the first N
+queries that miss the index are also sent to the online specialist of their
+domain to measure the remote path; otherwise `--remote-seconds` is used as an
+estimate of one specialist search.
+
+The synthetic pages contain the queries' own words, so they measure latency, not
+how often real queries are answered. For that, `--api-reference` indexes the AWS
+API reference bundled with botocore (one page per operation) and checks the
+labelled queries in `doc_index_queries.jsonl`: each names a fragment of the page
+URL that answers it, or null when the index does not cover the topic and the
+query must go to the specialists. This is what the `DOC_INDEX_MIN_*` defaults
+are tuned on.
+"""
+
+import argparse
+import asyncio
+import gzip
+import html
+import json
+import os
+import random
+import re
+import statistics
+import tempfile
+import time
+from pathlib import Path
+
+from omnisearch_common.bm25 import tokenize
+from src.doc_index import DocumentIndex
+from src.router import Router
+
+CORPUS = Path(__file__).with_name("router_queries.jsonl")
+LABELLED = Path(__file__).with_name("doc_index_queries.jsonl")
+
+# Services the labelled queries are about, and unrelated ones the answers have to be found among.
+API_REFERENCE_SERVICES = ["s3vectors", "lambda", "dynamodb", "bedrock", "bedrock-agent", "bedrock-runtime"]
+API_REFERENCE_FILLER = (
+    "appsync athena batch codebuild comprehend ecr elastictranscoder glue iot kms polly rekognition sagemaker "
+    "secretsmanager ses sns ssm transcribe translate xray"
+).split()
+HTML_TAG = re.compile(r"<[^>]+>")
+
+
+def synthetic_pages(queries: list[str], count: int, seed: int = 1) -> list[tuple[str, str, str]]:
+    # Pages mix a Zipf-like filler vocabulary with words from the queries, so
+    # postings lists have realistic lengths; the first pages each also hold a
+    # section answering one of the queries, as if it had been fetched for it.
+    rng = random.Random(seed)
+    query_words = sorted({term for query in queries for term in tokenize(query) if len(term) > 2})
+    filler = [f"word{i}" for i in range(20000)]
+    weights = [1 / (rank + 1) for rank in range(len(filler))]
+
+    pages = []
+    for number in range(count):
+        domain = "aws" if number % 2 == 0 else "microsoft"
+        sections = []
+        for heading in range(rng.randint(3, 12)):
+            words = rng.choices(filler, weights, k=rng.randint(40, 300)) + rng.sample(query_words, 8)
+            rng.shuffle(words)
+            sections.append(f"## Section {heading}\n\n" + " ".join(words))
+        if number < len(queries):
+            sections.insert(rng.randrange(len(sections)), f"## {queries[number]}\n\n" + " ".join(filler[100:160]))
+        text = f"# Page {number}\n\n" + "\n\n".join(sections)
+        pages.append((f"https://docs.example.com/{domain}/page-{number}", text, domain))
+    return pages
+
+
+def api_reference_pages(services: list[str]) -> list[tuple[str, str, str]]:
+    # Each operation becomes a markdown page like the ones aws___read_documentation returns.
+    import botocore
+
+    data = Path(botocore.__file__).with_name("data")
+
+    def text(documentation: str | None) -> str:
+        return html.unescape(HTML_TAG.sub(" ", documentation or "")).strip()
+
+    pages = []
+    for service in services:
+        version = sorted(os.listdir(data / service))[-1]
+        with gzip.open(data / service / version / "service-2.json.gz") as file:
+            model = json.load(file)
+        shapes = model["shapes"]
+
+        def members(reference: dict | None) -> list[str]:
+            shape = shapes.get((reference or {}).get("shape"), {})
+            return [
+                f"### {name}\n\n{text(member['documentation'])}"
+                for name, member in shape.get("members", {}).items()
+                if member.get("documentation")
+            ]
+
+        for name, operation in model["operations"].items():
+            sections = [f"# {name} - {model['metadata']['serviceId']}", text(operation.get("documentation"))]
+            if request := members(operation.get("input")):
+                sections += ["## Request Parameters", *request]
+            if response := members(operation.get("output")):
+                sections += ["## Response Elements", *response]
+            url = f"https://docs.aws.amazon.com/{service}/latest/APIReference/API_{name}.html"
+            pages.append((url, "\n\n".join(sections), "aws"))
+    return pages
+
+
+def evaluate(index: DocumentIndex, labelled: list[dict]) -> None:
+    answered = correct = false_answers = 0
+    for case in labelled:
+        hits = index.search(case["query"], "aws")
+        local = index.answer(case["query"], "aws") is not None
+        on_page = any(case["expected"] and case["expected"] in hit.passage.url for hit in hits)
+        answered += local and case["expected"] is not None
+        correct += local and on_page
+        false_answers += local and case["expected"] is None
+        relevance, coverage = (hits[0].relevance, hits[0].coverage) if hits else (0.0, 0.0)
+        print(
+            f"{'answer' if local else 'online':6} {relevance:4.0%} {coverage:4.0%} "
+            f"{'covered' if case['expected'] else 'not covered':11} {case['query']}"
+        )
+    covered = sum(case["expected"] is not None for case in labelled)
+    print()
+    print(f"covered queries answered:     {answered}/{covered} ({correct} with the expected page among the hits)")
+    print(f"uncovered queries answered:   {false_answers}/{len(labelled) - covered} (should stay 0)")
+
+
+def percentile(values: list[float], share: float) -> float:
+    return sorted(values)[min(len(values) - 1, int(len(values) * share))]
+
+
+async def remote_search(domain: str, query: str) -> float:
+    # Imported lazily: the specialists need AWS credentials and network access.
+    from src.aws_knowledge_agent import query_aws
+    from src.microsoft_knowledge_agent import query_microsoft
+
+    started = time.perf_counter()
+    await {"aws": query_aws, "microsoft": query_microsoft}[domain](query)
+    return time.perf_counter() - started
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--index", type=Path)
+    parser.add_argument("--corpus", type=Path, default=CORPUS)
+    parser.add_argument("--pages", type=int, default=2000)
+    parser.add_argument("--repeat", type=int, default=20)
+    parser.add_argument("--remote", type=int, default=0)
+    parser.add_argument("--remote-seconds", type=float, default=20.0)
+    parser.add_argument("--api-reference", action="store_true", help="measure answer quality on real pages")
+    args = parser.parse_args()
+
+    if args.api_reference:
+        labelled = [json.loads(line) for line in LABELLED.read_text().splitlines() if line.strip()]
+        with tempfile.TemporaryDirectory() as directory:
+            index = DocumentIndex(directory)
+            for url, text, domain in api_reference_pages(API_REFERENCE_SERVICES + API_REFERENCE_FILLER):
+                index.ingest(url, text, domain)
+            index.compact()
+            stats = index.stats()
+            print(f"index: {stats['pages']} pages, {stats['passages']} passages, {stats['terms']} terms\n")
+            evaluate(index, labelled)
+            index.close()
+        return
+
+    corpus = [json.loads(line) for line in args.corpus.read_text().splitlines() if line.strip()]
+    queries = [case["query"] for case in corpus]
+    router = Router()
+
+    with tempfile.TemporaryDirectory() as directory:
+        index = DocumentIndex(args.index or directory)
+        if args.index is None:
+            started = time.perf_counter()
+            for url, text, domain in synthetic_pages(queries, args.pages):
+                index.ingest(url, text, domain)
+            ingested = time.perf_counter() - started
+            started = time.perf_counter()
+            index.compact()
+            print(f"ingested {args.pages} pages in {ingested:.2f}s, compacted in {time.perf_counter() - started:.2f}s")
+
+        latencies = []
+        for _ in range(args.repeat):
+            for query in queries:
+                started = time.perf_counter()
+                index.search(query, router.route(query).specialist)
+                latencies.append(time.perf_counter() - started)
+
+        misses = []
+        for query in queries:
+            domain = router.route(query).specialist
+            if index.answer(query, domain) is None:
+                misses.append((domain or "aws", query))
+        answered = len(queries) - len(misses)
+
+        remote = [asyncio.run(remote_search(domain, query)) for domain, query in misses[: args.remote]]
+        remote_seconds = statistics.median(remote) if remote else args.remote_seconds
+        stats = index.stats()
+        index.close()
+
+    local_seconds = statistics.median(latencies)
+    print()
+    print(f"index:                 {stats['pages']} pages, {stats['passages']} passages, {stats['terms']} terms")
+    print(f"queries:               {len(queries)}")
+    print(
+        f"local latency:         p50 {local_seconds * 1e3:.2f} ms, p95 {percentile(latencies, 0.95) * 1e3:.2f} ms, "
+        f"p99 {percentile(latencies, 0.99) * 1e3:.2f} ms"
+    )
+    print(f"answered locally:      {answered} (synthetic pages seeded with the queries; see --api-reference)")
+    print(
+        f"remote latency:        {remote_seconds:.2f}s/query "
+        f"({'measured over ' + str(len(remote)) + ' queries' if remote else 'estimate'})"
+    )
+    print(f"speedup on a hit:      {remote_seconds / local_seconds:,.0f}x")
+    print(f"estimated time saved:  {answered * remote_seconds:.1f}s over the corpus")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,109 @@
+"""Routing accuracy and latency benchmark for src.router.
+
+Run from apps/omnisearch_mcp:
+
+    python -m benchmarks.router [--measure 5] [--llm-turn-seconds 3.0]
+
+Each labeled query has `expected` set to the specialist it should be sent to, or
+null when only the LLM can decide (cross-domain or no domain at all).
+`router_queries.jsonl` is the corpus the rules were written against, so its
+accuracy only shows they still hold; `router_holdout.jsonl` was labelled without
+tuning the rules on it and is the better guide to accuracy on new queries.
+
+A direct route skips the orchestrator's model turn that picks the specialists.
+With `--measure N` that turn (its model, system prompt and tool) is timed for the
+first N directly routed queries; otherwise `--llm-turn-seconds` is used and the
+time saved is reported as an estimate.
+"""
+
+import argparse
+import asyncio
+import json
+import statistics
+import time
+from pathlib import Path
+
+from src.router import Router
+
+CORPUS = Path(__file__).with_name("router_queries.jsonl")
+HOLDOUT = Path(__file__).with_name("router_holdout.jsonl")
+
+
+def evaluate(router: Router, corpus: list[dict]) -> tuple[int, int, int]:
+    """Correct, direct and misrouted counts; misroutes and missed direct routes are printed."""
+    correct = direct = misrouted = 0
+    for case in corpus:
+        route = router.route(case["query"])
+        if route.specialist == case["expected"]:
+            correct += 1
+        if route.specialist is not None:
+            direct += 1
+            if route.specialist != case["expected"]:
+                misrouted += 1
+                print(f"MISROUTED  {route.specialist:<10} {route.scores} {case['query']}")
+        elif case["expected"] is not None:
+            print(f"FALLBACK   {case['expected']:<10} {route.scores} {case['query']}")
+    return correct, direct, misrouted
+
+
+async def model_turn(query: str) -> float:
+    """Seconds the orchestrator takes to pick the specialists for `query`."""
+    # Imported lazily: the orchestrator needs AWS credentials and network access.
+    from main import bedrock_model, search_specialists, system_prompt
+
+    messages = [{"role": "user", "content": [{"text": query}]}]
+    started = time.perf_counter()
+    async for _ in bedrock_model.stream(messages, [search_specialists.tool_spec], system_prompt):
+        pass
+    return time.perf_counter() - started
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--corpus", type=Path, default=CORPUS)
+    parser.add_argument("--holdout", type=Path, default=HOLDOUT)
+    parser.add_argument("--measure", type=int, default=0, help="time the skipped model turn for N queries")
+    parser.add_argument("--llm-turn-seconds", type=float, default=3.0, help="estimate used without --measure")
+    parser.add_argument("--repeat", type=int, default=1000)
+    args = parser.parse_args()
+
+    router = Router()
+    corpora = {}
+    for label, path in (("rules corpus", args.corpus), ("held-out", args.holdout)):
+        corpus = [json.loads(line) for line in path.read_text().splitlines() if line.strip()]
+        corpora[label] = (corpus, evaluate(router, corpus))
+
+    corpus = corpora["rules corpus"][0]
+    started = time.perf_counter()
+    for _ in range(args.repeat):
+        for case in corpus:
+            router.route(case["query"])
+    per_query = (time.perf_counter() - started) / (args.repeat * len(corpus))
+
+    direct_queries = [
+        case["query"] for corpus, _ in corpora.values() for case in corpus if router.route(case["query"]).specialist
+    ]
+    turns = [asyncio.run(model_turn(query)) for query in direct_queries[: args.measure]]
+    turn_seconds = statistics.median(turns) if turns else args.llm_turn_seconds
+
+    print()
+    for label, (corpus, (correct, direct, misrouted)) in corpora.items():
+        total = len(corpus)
+        print(f"{label + ':':<23}{total} queries")
+        print(f"  accuracy:            {correct / total:.1%}")
+        print(f"  direct routes:       {direct} ({direct / total:.1%} of queries skip the LLM turn)")
+        print(f"  misrouted:           {misrouted}")
+    print(f"router latency:        {per_query * 1e6:.1f} us/query")
+    print(
+        f"model turn skipped:    {turn_seconds:.2f}s/query "
+        f"({'measured over ' + str(len(turns)) + ' queries' if turns else 'estimate, not measured'})"
+    )
+    direct_share = len(direct_queries) / sum(len(corpus) for corpus, _ in corpora.values())
+    print(
+        f"{'time saved:' if turns else 'estimated time saved:':<23}"
+        f"{direct_share * turn_seconds:.2f}s/query on average over both corpora"
+    )
+
+
+if __name__ == "__main__":
+    main()
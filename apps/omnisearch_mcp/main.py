@@ -1,21 +1,50 @@
-import re
-
-from a2a.client import ClientFactory, ClientConfig
-from a2a.types import Message, Part, Role, TextPart, TaskArtifactUpdateEvent
-from mcp.server.fastmcp import FastMCP
+from contextlib import asynccontextmanager
+
+from mcp.server.fastmcp import Context, FastMCP
+from mcp.types import CallToolResult, TextContent
+from opentelemetry.trace import SpanKind
+from starlette.applications import Starlette
+from starlette.requests import Request
+from starlette.responses import Response
+from starlette.routing import Route as HTTPRoute
 import logging
 import os
 import asyncio
-from strands import Agent, tool
-from strands.multiagent.a2a import A2AServer
+import threading
+from strands import tool
 import uvicorn
-from fastapi import FastAPI
-from mcp.client.streamable_http import streamablehttp_client
-from strands import Agent
-from strands.models import BedrockModel
-from strands.tools.mcp.mcp_client import MCPClient
-
-from src.aws_knowledge_agent import query_aws
+from strands.types.tools import ToolContext
+
+from omnisearch_common.a2a_streaming import A2AStreamingClient
+from omnisearch_common.agent_cards import agent_card_registry
+from omnisearch_common.agent_template import AgentTemplate
+from omnisearch_common.bedrock_model import resilient_bedrock_model
+from omnisearch_common.deadline import enforce_deadline, extract_deadline
+from omnisearch_common.dedupe import near_duplicate_detector
+from omnisearch_common.fanout import (
+    Specialist,
+    SpecialistResult,
+    collected_results,
+    fan_out,
+    format_results,
+    merge_results,
+    specialist_flights,
+    stream_chunk,
+    stream_sink,
+)
+from omnisearch_common.http_transport import shared_transport
+from omnisearch_common.loop_monitor import loop_monitor
+from omnisearch_common.metrics import CONTENT_TYPE, render_metrics
+from omnisearch_common.prompt_cache import RequestUsage, prompt_cache_reporter, request_usage
+from omnisearch_common.result_cache import result_cache
+from omnisearch_common.thinking_filter import ThinkingFilter, strip_thinking
+from omnisearch_common.tool_schema_cache import tool_schema_cache
+from omnisearch_common.tracing import TRACE_CONTEXT_KEY, extract_trace_context, setup_tracing, tracer
+from src.aws_knowledge_agent import aws_knowledge_mcp_pool, query_aws
+from src.doc_index import document_index, local_first
+from src.document_cache import document_cache
+from src.microsoft_knowledge_agent import microsoft_knowledge_mcp_pool, query_microsoft
+from src.router import Route, query_router
 
 mcp = FastMCP("omnisearch_mcp")
 
@@ -24,206 +53,296 @@ system_prompt = """
 
 ## Role and Purpose
 
-You are an **Omni Search Agent**, serving as an intelligent aggregation layer between end-user agents and specialized search agents. Your primary responsibility is to:
+You are an **Omni Search Agent**, the routing layer between end-user agents and specialized search agents. Your only job is to decide which specialized search agents a query needs and to consult them with a single `search_specialists` call.
 
-1. Analyze incoming search queries
-2. Delegate searches to appropriate specialized search agents
-3. Collect and aggregate results from multiple agents
-4. Format aggregated results according to specified output format
+You do NOT perform searches, and you do NOT write the answer. `search_specialists` merges, deduplicates and formats the specialists' results itself, and its result is returned to the user verbatim as the final answer; the conversation ends with that call.
 
-You do NOT perform searches yourself. You orchestrate specialized search agents and consolidate their findings.
-
-## Core Responsibilities
+## How to Handle a Query
 
 ### 1. Query Analysis
 
 When receiving a query, analyze:
 - **Domain/Technology**: Which specialized agents should be consulted? (e.g., AWS, Azure, Microsoft, general web)
-- **Query Complexity**: Does this require single or multiple specialized agents?
-- **Information Type**: Documentation, code samples, availability data, general information?
+- **Query Complexity**: Does it span more than one domain?
 
 ### 2. Agent Selection
 
-Select appropriate specialized search agents based on query characteristics:
-
-- **Multiple agents may be needed** if query spans multiple domains
-- **Prioritize official documentation agents** for technical queries
-- **Use web search agents** as fallback or supplement
-- **Consider complementary agents** that might provide related valuable information
-
-### 3. Result Aggregation
-
-After receiving results from specialized agents:
-
-- **Preserve verbatim quotes**: Never modify or paraphrase agent results
-- **Maintain source attribution**: Keep all source URLs and titles intact
-- **Group related information**: Combine related quotes from same/related sources into single Result sections
-- **Remove duplicates**: If multiple agents return identical information, include only once
-- **Preserve metadata**: Keep version/date information when present
-
-### 4. Output Formatting
-
-Format all aggregated results following this strict structure:
-
-```markdown
-# Result N
-
-(Version/date information if found in source - leave empty if none)
+- `"aws"`: AWS services and documentation
+- `"microsoft"`: Microsoft, Azure and Windows documentation
+- **Pass several domains** when the query spans more than one; when unsure, pass both
 
-## Content
+### 3. Search
 
-[Exact quotes from source(s) - verbatim only]
+Call `search_specialists` exactly once, passing the user's query unchanged and every agent it needs. Do not call it once per agent, and do not write any text before or after the call.
 
-## Sources
-
-- [Source Title](Full URL)
-- [Source Title](Full URL)
+## Example Execution Flow
 
----
 ```
+1. Receive query: "How to configure Azure Functions with Python 3.11?"
 
-## Formatting Rules
+2. Analyze query:
+   - Domain: Microsoft/Azure
+   - Type: Configuration documentation
 
-### ✅ MUST
+3. Call search_specialists once with the query and domains ["microsoft"]
 
-- Copy all content exactly as provided by search agents (character-for-character)
-- Preserve all formatting, code blocks, lists, emphasis
-- Use complete markdown link format for sources: `[Title](URL)`
-- Extract and include version/date information when present
-- Group related quotes from same topic/source into one Result section
-- Separate distinct pieces of information with `---` divider
-- Number results sequentially starting from 1
+4. Done: the tool's formatted results are the answer
+```
 
-### ❌ NEVER
+## Limitations and Boundaries
 
-- Summarize, paraphrase, or reword agent results
-- Add your own explanations, commentary, or interpretations
-- Combine information from sources into new sentences
-- Add transitional phrases like "according to", "the documentation states"
-- Modify code formatting or technical content
-- Omit or shorten source URLs
-- Add content not present in agent results
+**You do NOT:**
+- Perform web searches directly
+- Access MCP servers directly
+- Summarize, rewrite, reformat or comment on the results
+- Call `search_specialists` more than once per query
+"""
 
-## Quality Assurance
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
 
-Before delivering results:
+setup_tracing("omnisearch_mcp")
 
-- [ ] All content is verbatim from search agent results
-- [ ] Every source has complete title and URL
-- [ ] Related information is properly grouped
-- [ ] Duplicates have been removed
-- [ ] Version/date info is included where available
-- [ ] Code blocks and formatting are preserved
-- [ ] Each Result section has clear separation
-- [ ] Sources are listed in markdown link format
+ASK_TIMEOUT = float(os.environ.get("ASK_TIMEOUT", "300"))  # [sec], unless the caller sends a deadline of its own
 
-## Edge Cases
+# The MCP transport is stdio, so `/metrics` gets an HTTP listener of its own; unset, it is not served.
+METRICS_HOST = os.environ.get("METRICS_HOST", "127.0.0.1")
+METRICS_PORT = int(os.environ["METRICS_PORT"]) if os.environ.get("METRICS_PORT") else None
 
-### No Results Found
-If no specialized agents return results:
-```markdown
-# Search Results
+bedrock_model = resilient_bedrock_model("apac.amazon.nova-pro-v1:0", max_tokens=10000)
 
-No relevant information found from available sources.
+# Set to the URL of the AWS Knowledge A2A server (apps/aws_knowledge_agent) to
+# consult it instead of the in-process AWS specialist; its answer is streamed back.
+aws_knowledge_agent_url = os.environ.get("AWS_KNOWLEDGE_AGENT_URL")
 
-Attempted searches:
-- [Agent 1 Name]: No results
-- [Agent 2 Name]: No results
-```
+a2a_stream_client = A2AStreamingClient()
 
-### Partial Results
-If some agents fail but others succeed, include successful results only and note which agents were consulted.
 
-### Conflicting Information
-If agents return conflicting information, include both as separate Result sections. Do NOT attempt to resolve conflicts or determine which is correct.
+async def query_aws_agent(query: str) -> str:
+    chunks: list[str] = []
+    async for text in a2a_stream_client.stream(aws_knowledge_agent_url, query):
+        chunks.append(text)
+        await stream_chunk(text)
+    return "".join(chunks)
 
-## Example Execution Flow
 
-```
-1. Receive query: "How to configure Azure Functions with Python 3.11?"
+specialist_searches = {
+    "aws": query_aws_agent if aws_knowledge_agent_url else query_aws,
+    "microsoft": query_microsoft,
+}
+if document_index is not None:
+    # Pages the specialists have read answer confident matches without going online.
+    specialist_searches = {
+        domain: local_first(document_index, domain, search) for domain, search in specialist_searches.items()
+    }
 
-2. Analyze query:
-   - Domain: Microsoft/Azure
-   - Type: Configuration documentation
-   - Agents needed: Microsoft Documentation agent
+specialists = {
+    "aws": Specialist("AWS Knowledge Search Agent", specialist_searches["aws"], cache=result_cache),
+    "microsoft": Specialist("Microsoft Knowledge Search Agent", specialist_searches["microsoft"], cache=result_cache),
+}
 
-3. Delegate to Microsoft Documentation agent
 
-4. Receive results from agent(s)
+@tool(context=True)
+async def search_specialists(query: str, domains: list[str], tool_context: ToolContext) -> str:
+    """Search the selected specialized search agents in parallel and return all of their results.
 
-5. Aggregate and format:
-   - Group related configuration info
-   - Preserve exact quotes
-   - Include all source URLs
-   - Add version info if present
+    The merged, deduplicated results are returned to the user as the final answer as-is.
 
-6. Deliver formatted results
-```
+    Call this once with every domain the query needs instead of one call per domain.
 
-## Limitations and Boundaries
+    Args:
+        query: The search query to send to each specialized search agent.
+        domains: Specialized search agents to consult: "aws" for AWS documentation,
+            "microsoft" for Microsoft / Azure / Windows documentation.
+    """
+    selected = [specialists[domain] for domain in dict.fromkeys(domains) if domain in specialists]
+    if not selected:
+        selected = list(specialists.values())
 
-**You do NOT:**
-- Perform web searches directly
-- Access MCP servers directly
-- Interpret or explain results
-- Make recommendations
-- Filter results by quality (include all agent results)
-- Decide which information is "better" or "more accurate"
-
-**You ARE:**
-- A coordination and aggregation layer
-- A format enforcer
-- A duplicate remover
-- A results organizer
-
-## Success Criteria
-
-A successful response:
-1. Correctly identifies relevant specialized agents
-2. Collects results from all selected agents
-3. Preserves all content verbatim
-4. Groups related information logically
-5. Follows output format exactly
-6. Includes complete source attribution
-7. Contains no added interpretation or commentary
-
-Remember: Your value lies in intelligent agent orchestration and meticulous result aggregation, not in search execution or content interpretation.
-"""
+    results = await fan_out(query, selected)
 
-logging.basicConfig(level=logging.INFO)
-logger = logging.getLogger(__name__)
+    # Merging is deterministic (see format_results), so no model turn follows this call.
+    tool_context.invocation_state["request_state"]["stop_event_loop"] = True
 
+    return format_results(results)
 
-bedrock_model = BedrockModel(model_id="apac.amazon.nova-pro-v1:0", max_tokens=10000)
 
-strands_agent = Agent(
+omnisearch_agent_template = AgentTemplate(
     name="Omni Search Agent",
     description="A search orchestrator that integrates multiple specialized search agents (Web search, AWS, Azure, Microsoft, Strands Agents, etc.) and intelligently delegates queries to the most appropriate agents. Accurately retrieves official documentation, code samples, and technical information with complete source attribution.",
     system_prompt=system_prompt,
-    tools=[query_aws],
-    callback_handler=None,
+    tools=[search_specialists],
     model=bedrock_model,
+    hooks=[prompt_cache_reporter],
 )
 
-mcp = FastMCP("Omni search MCP")
+
+@asynccontextmanager
+async def lifespan(server: FastMCP):
+    loop_monitor.start()
+
+    # Open the upstream MCP sessions once, before the first `ask` arrives.
+    # A pool that cannot connect yet is retried lazily on its first tool call.
+    pools = [aws_knowledge_mcp_pool, microsoft_knowledge_mcp_pool]
+    errors = await asyncio.gather(*(pool.ensure_started() for pool in pools), return_exceptions=True)
+    for pool, error in zip(pools, errors):
+        if isinstance(error, Exception):
+            logger.warning(f"MCP session pool '{pool.name}' is not available yet: {error}")
+    if aws_knowledge_agent_url:
+        agent_card_registry.prefetch([aws_knowledge_agent_url])
+    try:
+        yield
+    finally:
+        await asyncio.gather(*(asyncio.to_thread(pool.stop) for pool in pools))
+        loop_monitor.stop()
+
+
+mcp = FastMCP("Omni search MCP", lifespan=lifespan)
+
+
+def ask_result(
+    text: str, route: Route, results: list[SpecialistResult], usage: RequestUsage, tokens_saved: int = 0
+) -> CallToolResult:
+    return CallToolResult(
+        content=[TextContent(type="text", text=text)],
+        _meta={
+            "omnisearch": {
+                "route": route.specialist or "llm",
+                "specialists": [
+                    {
+                        "name": result.specialist,
+                        "status": result.status,
+                        "cache": result.cache,
+                        "elapsed": round(result.elapsed, 3),
+                    }
+                    for result in results
+                ],
+                "usage": usage.to_dict(),
+                # Estimated tokens the merged answer saved by collapsing near-duplicate quotes.
+                "dedupe_tokens_saved": tokens_saved,
+            }
+        },
+    )
 
 
 @mcp.tool()
-async def ask(query: str) -> str:
+async def ask(query: str, ctx: Context) -> CallToolResult:
+    # MCP callers pass their trace context in the request `_meta`, either under
+    # TRACE_CONTEXT_KEY or as top-level `traceparent` / `tracestate` fields, and may
+    # pass the seconds they are willing to wait under DEADLINE_KEY.
+    meta = ctx.request_context.meta.model_extra if ctx.request_context.meta else None
+    parent = extract_trace_context(meta) or extract_trace_context({TRACE_CONTEXT_KEY: meta})
+    timeout = extract_deadline(meta)
+    timeout = ASK_TIMEOUT if timeout is None else timeout
+    with tracer.start_as_current_span("mcp.ask", context=parent, kind=SpanKind.SERVER) as span:
+        span.set_attribute("mcp.timeout", timeout)
+        try:
+            # Past the deadline, the specialists, their MCP calls and model streams are cancelled.
+            async with enforce_deadline(timeout):
+                result = await answer(query, ctx)
+        except TimeoutError:
+            logger.warning(f"ask missed its {timeout:.1f}s deadline")
+            return CallToolResult(
+                content=[TextContent(type="text", text=f"Deadline exceeded after {timeout:.1f}s")], isError=True
+            )
+        span.set_attribute("omnisearch.route", result.meta["omnisearch"]["route"])
+        return result
+
+
+async def answer(query: str, ctx: Context) -> CallToolResult:
+    results: list[SpecialistResult] = []
+    collected_results.set(results)
+    usage = RequestUsage()
+    request_usage.set(usage)
+
+    # Clients that send a progressToken receive the answer incrementally as
+    # progress notifications; the final result always carries the full text.
+    chunks: list[str] = []
+    progress = 0
+
+    async def emit(text: str):
+        nonlocal progress
+        if text:
+            chunks.append(text)
+            progress += 1
+            await ctx.report_progress(progress, message=text)
+
+    # Clear-cut single-domain queries skip the orchestrator model turn entirely.
+    route = query_router.route(query)
+    if route.specialist is not None:
+        logger.info(f"Routing directly to '{route.specialist}' ({route.confidence:.2f}: {route.matches})")
+
+        # The specialist's output is the answer here, so relay it as it is generated.
+        thinking_filter = ThinkingFilter()
+        token = stream_sink.set(lambda specialist, text: emit(thinking_filter.feed(text)))
+        try:
+            [specialist_result] = await fan_out(query, [specialists[route.specialist]])
+        finally:
+            stream_sink.reset(token)
+
+        if specialist_result.status == "ok":
+            if chunks:
+                await emit(thinking_filter.flush())
+                result = "".join(chunks)
+            else:  # served from the result cache, nothing was streamed
+                result = strip_thinking(specialist_result.content)
+                await emit(result)
+            omnisearch_agent_template.remember(query, result)
+            return ask_result(result, route, results, usage)
+
+        # Anything relayed before the specialist failed is superseded by the orchestrator's answer.
+        chunks.clear()
+
+    strands_agent = omnisearch_agent_template.create()
     agent_stream = strands_agent.stream_async(query)
 
-    message = ""
+    thinking_filter = ThinkingFilter()
+    searched_from = len(results)
+    tokens_saved = 0
 
     async for event in agent_stream:
         if "data" in event:
-            message = message + event["data"]
-        elif "current_tool_use" in event and event["current_tool_use"].get("name"):
-            print(f"\n[Tool use delta for: {event['current_tool_use']['name']}]")
+            await emit(thinking_filter.feed(event["data"]))
+
+    if len(results) > searched_from:
+        # The model only selected the specialists; their merged results are the answer.
+        chunks.clear()
+        merged, tokens_saved = merge_results(results[searched_from:])
+        await emit(merged)
+    else:
+        await emit(thinking_filter.flush())
+
+    result = "".join(chunks)
+
+    omnisearch_agent_template.remember(query, result)
+
+    return ask_result(result, route, results, usage, tokens_saved)
+
+
+async def metrics(request: Request) -> Response:
+    sources = {
+        "transport": shared_transport.stats,
+        "agent_cards": agent_card_registry.stats,
+        "document_cache": document_cache.stats,
+        "event_loop": loop_monitor.stats,
+        "single_flight": specialist_flights.stats,
+        "near_duplicates": near_duplicate_detector.stats,
+        "tool_schema_cache": tool_schema_cache.stats,
+    }
+    if document_index is not None:
+        sources["doc_index"] = document_index.stats
+    return Response(render_metrics(**sources), media_type=CONTENT_TYPE)
 
-    result = re.sub(r"<thinking>.*?</thinking>", "", message, flags=re.DOTALL)
 
-    return result
+def serve_metrics(host: str, port: int) -> None:
+    """Serve `/metrics` on a background thread; access logs are off, as stdout carries the MCP stream."""
+    app = Starlette(routes=[HTTPRoute("/metrics", metrics, methods=["GET"])])
+    server = uvicorn.Server(uvicorn.Config(app, host=host, port=port, access_log=False, log_config=None))
+    threading.Thread(target=server.run, name="metrics-http", daemon=True).start()
+    logger.info(f"Serving metrics at http://{host}:{port}/metrics")
 
 
 if __name__ == "__main__":
+    if METRICS_PORT is not None:
+        serve_metrics(METRICS_HOST, METRICS_PORT)
     mcp.run()
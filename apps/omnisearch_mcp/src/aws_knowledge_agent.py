@@ -2,13 +2,12 @@ import logging
 import os
 import asyncio
 from strands import Agent, tool
-from strands.multiagent.a2a import A2AServer
-import uvicorn
-from fastapi import FastAPI
-from mcp.client.streamable_http import streamablehttp_client
-from strands import Agent
-from strands.models import BedrockModel
-from strands.tools.mcp.mcp_client import MCPClient
+
+from omnisearch_common.bedrock_model import SPECIALIST_FALLBACK_MODELS, resilient_bedrock_model
+from omnisearch_common.context_budget import context_budget
+from omnisearch_common.fanout import stream_chunk
+from omnisearch_common.prompt_cache import prompt_cache_reporter
+from src.mcp_pool import DEFAULT_POOL_SIZE, MCPSessionPool
 
 
 system_prompt = """
@@ -140,40 +139,42 @@ Remember: You extract quotes. Another agent will handle interpretation and synth
 
 logging.basicConfig(level=logging.INFO)
 
-streamable_http_mcp_client = MCPClient(
-    lambda: streamablehttp_client("https://knowledge-mcp.global.api.aws")
+aws_knowledge_mcp_pool = MCPSessionPool(
+    "aws-knowledge",
+    "https://knowledge-mcp.global.api.aws",
+    size=int(os.environ.get("AWS_KNOWLEDGE_MCP_POOL_SIZE", DEFAULT_POOL_SIZE)),
 )
 
-bedrock_model = BedrockModel(model_id="apac.amazon.nova-lite-v1:0", max_tokens=10000)
+bedrock_model = resilient_bedrock_model(
+    "apac.amazon.nova-lite-v1:0", fallbacks=SPECIALIST_FALLBACK_MODELS, max_tokens=10000
+)
 
 
 @tool
 async def query_aws(query: str) -> str:
 
-    with streamable_http_mcp_client:
+    tools = await aws_knowledge_mcp_pool.tools_async()
 
-        tools = streamable_http_mcp_client.list_tools_sync()
-
-        strands_agent = Agent(
-            name="AWS Knowledge Search Agent",
-            description="A search agent that executes AWS Knowledge MCP tools and extracts verbatim quotes from AWS documentation, API references, best practices, and architectural guidance without interpretation or synthesis.",
-            system_prompt=system_prompt,
-            tools=[tools],
-            callback_handler=None,
-            model=bedrock_model,
-        )
+    strands_agent = Agent(
+        name="AWS Knowledge Search Agent",
+        description="A search agent that executes AWS Knowledge MCP tools and extracts verbatim quotes from AWS documentation, API references, best practices, and architectural guidance without interpretation or synthesis.",
+        system_prompt=system_prompt,
+        tools=tools,
+        callback_handler=None,
+        model=bedrock_model,
+        hooks=[prompt_cache_reporter, context_budget],
+    )
 
-        agent_stream = strands_agent.stream_async(query)
+    agent_stream = strands_agent.stream_async(query)
 
-        message = ""
+    chunks: list[str] = []
 
-        async for event in agent_stream:
-            if "data" in event:
-                message = message + event["data"]
-            elif "current_tool_use" in event and event["current_tool_use"].get("name"):
-                print(f"\n[Tool use delta for: {event['current_tool_use']['name']}]")
+    async for event in agent_stream:
+        if "data" in event:
+            chunks.append(event["data"])
+            await stream_chunk(event["data"])
 
-        return message
+    return "".join(chunks)
 
 
 if __name__ == "__main__":
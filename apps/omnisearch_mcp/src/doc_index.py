@@ -0,0 +1,401 @@
+import argparse
+import asyncio
+import hashlib
+import heapq
+import json
+import logging
+import mmap
+import os
+import re
+import threading
+import time
+from array import array
+from collections import Counter
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Awaitable, Callable
+
+from omnisearch_common.bm25 import K1, content_terms, idf, term_score, tokenize
+from omnisearch_common.context_budget import CHARS_PER_TOKEN, split_sections
+from omnisearch_common.results import SearchResult, Source, format_markdown
+
+logger = logging.getLogger(__name__)
+
+# MCP tools whose result is the content of the page at arguments["url"], by domain.
+INDEXED_DOCUMENT_TOOLS = {"aws___read_documentation": "aws", "microsoft_docs_fetch": "microsoft"}
+
+# Unset (the default) disables the index: nothing is ingested and specialists always search online.
+DEFAULT_INDEX_PATH = os.environ.get("DOC_INDEX_PATH")
+DEFAULT_PASSAGE_TOKENS = int(os.environ.get("DOC_INDEX_PASSAGE_TOKENS", "300"))
+# Tuned on the AWS API reference (`python -m benchmarks.doc_index --api-reference`).
+DEFAULT_MIN_RELEVANCE = float(os.environ.get("DOC_INDEX_MIN_RELEVANCE", "0.4"))  # share of the best possible score
+DEFAULT_MIN_COVERAGE = float(os.environ.get("DOC_INDEX_MIN_COVERAGE", "0.5"))  # share of query terms matched
+DEFAULT_MAX_PASSAGES = int(os.environ.get("DOC_INDEX_MAX_PASSAGES", "5"))
+
+TITLE = re.compile(r"^#\s+(.+)$", re.MULTILINE)
+
+
+@dataclass
+class Passage:
+    url: str
+    domain: str
+    title: str
+    start: int  # character offsets in the page
+    end: int
+    offset: int  # byte offset in the text file
+    size: int  # [bytes]
+    length: int  # [terms]
+
+
+@dataclass
+class Hit:
+    passage: Passage
+    text: str
+    score: float
+    coverage: float  # share of the query's content terms (no stopwords) found in the passage
+    relevance: float  # score relative to a passage with every query term many times, independent of index size
+
+
+@dataclass
+class _Page:
+    digest: str
+    passage_ids: list[int]
+
+
+class DocumentIndex:
+    """On-disk BM25 index of every documentation page the specialists have fetched.
+
+    Pages are split into passages at headings. Each generation of the index in
+    `path` consists of a page log (JSON lines), the passage texts, and an immutable
+    postings file of (passage id, term frequency) pairs per term that is
+    memory-mapped for queries, with its lexicon. Pages ingested since the last
+    compaction are appended to the log and text file and indexed in memory; a page
+    fetched again with different content supersedes its old passages.
+
+    `compact()` rewrites live passages into a new generation with a fresh postings
+    file; run it offline (`python -m src.doc_index compact`) while no server uses
+    the index.
+    """
+
+    def __init__(self, path: str | Path, passage_tokens: int = DEFAULT_PASSAGE_TOKENS):
+        self.path = Path(path)
+        self.passage_chars = passage_tokens * CHARS_PER_TOKEN
+        self.hits = 0
+        self.misses = 0
+
+        self._lock = threading.Lock()
+        self.path.mkdir(parents=True, exist_ok=True)
+        self._open()
+
+    def ingest(self, url: str, text: str, domain: str, base_offset: int = 0) -> int:
+        """Index one fetched page (or the part of it read from `base_offset`); returns the passages added."""
+        digest = hashlib.sha256(text.encode()).hexdigest()
+        key = (url, base_offset)
+        with self._lock:
+            page = self._pages.get(key)
+            if page is not None and page.digest == digest:
+                return 0
+
+            match = TITLE.search(text)
+            title = match.group(1).strip() if match else ""
+            record = {"url": url, "base": base_offset, "domain": domain, "title": title, "digest": digest}
+            passages = []
+            for section in split_sections(text, self.passage_chars):
+                body = text[section.start : section.end].strip("\n")
+                terms = tokenize(body)
+                if not terms:
+                    continue
+                data = body.encode()
+                offset = self._text_size
+                self._text.write(data)
+                self._text_size += len(data)
+                fields = [base_offset + section.start, base_offset + section.end, offset, len(data), len(terms)]
+                passages.append((fields, terms))
+            self._text.flush()
+
+            record["passages"] = [fields for fields, _ in passages]
+            self._log.write(json.dumps(record, ensure_ascii=False) + "\n")
+            self._log.flush()
+
+            first_id = self._next_id
+            self._add_page(record)
+            for passage_id, (_, terms) in enumerate(passages, start=first_id):
+                self._index_delta(passage_id, terms)
+
+        logger.info(f"Indexed {len(passages)} passages of {url}")
+        return len(passages)
+
+    def search(self, query: str, domain: str | None = None, limit: int = DEFAULT_MAX_PASSAGES) -> list[Hit]:
+        # Stopwords match nearly every passage; ranking on them only adds noise to the coverage.
+        terms = set(content_terms(tokenize(query)))
+        if not terms:
+            return []
+
+        with self._lock:
+            if not self._passages:
+                return []
+            average_length = self._total_length / len(self._passages)
+
+            scores: Counter[int] = Counter()
+            matched: Counter[int] = Counter()
+            best_possible = 0.0
+            for term in terms:
+                postings = [
+                    (passage_id, frequency)
+                    for passage_id, frequency in self._postings(term)
+                    if passage_id in self._passages
+                ]
+                # Terms the index has never seen count too: they are what the index cannot answer.
+                term_idf = idf(len(self._passages), len(postings))
+                best_possible += term_idf * (K1 + 1)
+                for passage_id, frequency in postings:
+                    passage = self._passages[passage_id]
+                    if domain is None or passage.domain == domain:
+                        scores[passage_id] += term_score(frequency, passage.length, average_length, term_idf)
+                        matched[passage_id] += 1
+
+            best = heapq.nlargest(limit, scores.items(), key=lambda item: item[1])
+            hits = []
+            for passage_id, score in best:
+                passage = self._passages[passage_id]
+                coverage = matched[passage_id] / len(terms)
+                hits.append(Hit(passage, self._read(passage), score, coverage, score / best_possible))
+            return hits
+
+    def answer(
+        self,
+        query: str,
+        domain: str | None = None,
+        min_relevance: float = DEFAULT_MIN_RELEVANCE,
+        min_coverage: float = DEFAULT_MIN_COVERAGE,
+    ) -> str | None:
+        """`# Result N` markdown of the best passages, or None when the index has no confident match.
+
+        A match is confident when the best passage contains at least `min_coverage`
+        of the query's content terms and reaches `min_relevance`, which unlike the
+        raw BM25 score does not grow with the number of query terms or passages;
+        passages scoring less than half of the best are left out.
+        """
+        hits = self.search(query, domain)
+        if not hits or hits[0].relevance < min_relevance or hits[0].coverage < min_coverage:
+            self.misses += 1
+            return None
+        self.hits += 1
+
+        results: dict[str, SearchResult] = {}
+        for hit in hits:
+            if hit.score < hits[0].score / 2:
+                break
+            result = results.get(hit.passage.url)
+            if result is None:
+                result = results[hit.passage.url] = SearchResult(
+                    sources=[Source(hit.passage.title, hit.passage.url)], specialists=["Local Document Index"]
+                )
+            result.content.append(hit.text)
+        return format_markdown(list(results.values()))
+
+    def compact(self) -> None:
+        """Write the live passages into a new generation with a single postings file and drop the old one."""
+        with self._lock:
+            generation = self._generation + 1
+            postings: dict[str, array] = {}
+            next_id = 0
+
+            with (
+                open(self._file(generation, "log"), "w") as log,
+                open(self._file(generation, "text"), "wb") as text_file,
+            ):
+                offset = 0
+                for (url, base), page in self._pages.items():
+                    live = [self._passages[passage_id] for passage_id in page.passage_ids]
+                    first = live[0] if live else None
+                    record = {
+                        "url": url,
+                        "base": base,
+                        "domain": first.domain if first else "",
+                        "title": first.title if first else "",
+                        "digest": page.digest,
+                        "passages": [],
+                    }
+                    for passage in live:
+                        data = self._read(passage).encode()
+                        text_file.write(data)
+                        record["passages"].append([passage.start, passage.end, offset, len(data), passage.length])
+                        for term, frequency in Counter(tokenize(data.decode())).items():
+                            postings.setdefault(term, array("I")).extend((next_id, frequency))
+                        offset += len(data)
+                        next_id += 1
+                    log.write(json.dumps(record, ensure_ascii=False) + "\n")
+
+            lexicon = {}
+            with open(self._file(generation, "postings"), "wb") as postings_file:
+                start = 0
+                for term in sorted(postings):
+                    postings[term].tofile(postings_file)
+                    lexicon[term] = [start, len(postings[term]) // 2]
+                    start += len(postings[term])
+            self._file(generation, "terms").write_text(json.dumps({"max_id": next_id, "terms": lexicon}))
+
+            current = self.path / "CURRENT.tmp"
+            current.write_text(str(generation))
+            os.replace(current, self.path / "CURRENT")
+
+            previous = self._generation
+            self._close()
+            for kind in ("log", "text", "postings", "terms"):
+                self._file(previous, kind).unlink(missing_ok=True)
+            self._open()
+
+        logger.info(f"Compacted document index to generation {generation} ({next_id} passages, {len(lexicon)} terms)")
+
+    def stats(self) -> dict[str, int]:
+        with self._lock:
+            return {
+                "generation": self._generation,
+                "pages": len(self._pages),
+                "passages": len(self._passages),
+                "dead_passages": self._next_id - len(self._passages),
+                "unmerged_passages": self._next_id - self._segment_size,
+                "terms": len(self._lexicon),
+                "hits": self.hits,
+                "misses": self.misses,
+            }
+
+    def close(self) -> None:
+        with self._lock:
+            self._close()
+
+    def _open(self) -> None:
+        current = self.path / "CURRENT"
+        self._generation = int(current.read_text()) if current.exists() else 0
+
+        self._pages: dict[tuple[str, int], _Page] = {}
+        self._passages: dict[int, Passage] = {}  # live passages only
+        self._next_id = 0
+        self._total_length = 0
+        self._delta: dict[str, list[tuple[int, int]]] = {}
+
+        terms_file = self._file(self._generation, "terms")
+        segment = json.loads(terms_file.read_text()) if terms_file.exists() else {"max_id": 0, "terms": {}}
+        self._segment_size: int = segment["max_id"]
+        self._lexicon: dict[str, list[int]] = segment["terms"]
+
+        self._postings_file = None
+        self._postings_map = None
+        self._postings_view = memoryview(array("I"))
+        postings_path = self._file(self._generation, "postings")
+        if postings_path.exists() and postings_path.stat().st_size:
+            self._postings_file = open(postings_path, "rb")
+            self._postings_map = mmap.mmap(self._postings_file.fileno(), 0, access=mmap.ACCESS_READ)
+            self._postings_view = memoryview(self._postings_map).cast("I")
+
+        self._text = open(self._file(self._generation, "text"), "ab+")
+        self._text_size = self._text.seek(0, os.SEEK_END)
+
+        log_path = self._file(self._generation, "log")
+        if log_path.exists():
+            for line in log_path.read_text().splitlines():
+                if line.strip():
+                    self._add_page(json.loads(line))
+        self._log = open(log_path, "a")
+
+        # Passages ingested after the postings file was written are indexed in memory.
+        for passage_id in range(self._segment_size, self._next_id):
+            if passage_id in self._passages:
+                self._index_delta(passage_id, tokenize(self._read(self._passages[passage_id])))
+
+    def _close(self) -> None:
+        self._postings_view.release()
+        if self._postings_map is not None:
+            self._postings_map.close()
+            self._postings_file.close()
+        self._text.close()
+        self._log.close()
+
+    def _add_page(self, record: dict) -> None:
+        key = (record["url"], record["base"])
+        if (previous := self._pages.pop(key, None)) is not None:
+            for passage_id in previous.passage_ids:
+                self._total_length -= self._passages.pop(passage_id).length
+
+        passage_ids = []
+        for start, end, offset, size, length in record["passages"]:
+            self._passages[self._next_id] = Passage(
+                record["url"], record["domain"], record["title"], start, end, offset, size, length
+            )
+            self._total_length += length
+            passage_ids.append(self._next_id)
+            self._next_id += 1
+        self._pages[key] = _Page(record["digest"], passage_ids)
+
+    def _index_delta(self, passage_id: int, terms: list[str]) -> None:
+        for term, frequency in Counter(terms).items():
+            self._delta.setdefault(term, []).append((passage_id, frequency))
+
+    def _postings(self, term: str) -> list[tuple[int, int]]:
+        postings = []
+        if (entry := self._lexicon.get(term)) is not None:
+            start, count = entry
+            pairs = self._postings_view[start : start + 2 * count]
+            postings.extend(zip(pairs[::2], pairs[1::2]))
+        postings.extend(self._delta.get(term, ()))
+        return postings
+
+    def _read(self, passage: Passage) -> str:
+        return os.pread(self._text.fileno(), passage.size, passage.offset).decode()
+
+    def _file(self, generation: int, kind: str) -> Path:
+        return self.path / f"{generation:06d}.{kind}"
+
+
+def local_first(
+    index: DocumentIndex, domain: str, search: Callable[[str], Awaitable[str]]
+) -> Callable[[str], Awaitable[str]]:
+    """Wrap a specialist's search so the index answers first and `search` runs only on a miss."""
+
+    async def search_local_first(query: str) -> str:
+        started = time.perf_counter()
+        answer = await asyncio.to_thread(index.answer, query, domain)
+        if answer is not None:
+            logger.info(f"Answered '{query}' from the local {domain} index in {time.perf_counter() - started:.3f}s")
+            return answer
+        return await search(query)
+
+    return search_local_first
+
+
+document_index = DocumentIndex(DEFAULT_INDEX_PATH) if DEFAULT_INDEX_PATH else None
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Maintain the local documentation index.")
+    parser.add_argument("--path", default=DEFAULT_INDEX_PATH, required=DEFAULT_INDEX_PATH is None)
+    commands = parser.add_subparsers(dest="command", required=True)
+    commands.add_parser("compact", help="merge unmerged passages into the postings file and drop dead ones")
+    commands.add_parser("stats")
+    search = commands.add_parser("search")
+    search.add_argument("query")
+    search.add_argument("--domain", choices=sorted(set(INDEXED_DOCUMENT_TOOLS.values())))
+    args = parser.parse_args()
+
+    index = DocumentIndex(args.path)
+    try:
+        if args.command == "compact":
+            started = time.perf_counter()
+            index.compact()
+            print(f"compacted in {time.perf_counter() - started:.2f}s")
+        elif args.command == "search":
+            for hit in index.search(args.query, args.domain):
+                print(
+                    f"{hit.score:8.2f} {hit.relevance:4.0%} {hit.coverage:4.0%} "
+                    f"{hit.passage.url} [{hit.passage.start}-{hit.passage.end}]"
+                )
+            print(index.answer(args.query, args.domain) or "(no confident match; specialists would search online)")
+        print(json.dumps(index.stats(), indent=2))
+    finally:
+        index.close()
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    main()
@@ -0,0 +1,178 @@
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import time
+import zlib
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, Awaitable, Callable
+
+import httpx
+
+from omnisearch_common.http_transport import pooled_http_client
+
+logger = logging.getLogger(__name__)
+
+# MCP tools whose result is the content of the page at arguments["url"].
+CACHED_DOCUMENT_TOOLS = {"aws___read_documentation", "microsoft_docs_fetch"}
+
+DEFAULT_MAX_BYTES = int(os.environ.get("DOCUMENT_CACHE_MAX_BYTES", str(64 * 1024 * 1024)))
+DEFAULT_TTL = float(os.environ.get("DOCUMENT_CACHE_TTL", "3600"))  # [sec]
+REVALIDATE_TIMEOUT = 5.0  # [sec]
+
+
+@dataclass
+class _Document:
+    digest: str  # key into DocumentCache._bodies
+    etag: str | None
+    last_modified: str | None
+    validated_at: float
+
+
+class DocumentCache:
+    """Process-wide cache of fetched documentation pages, shared by all specialists.
+
+    Entries are keyed by tool, URL and the remaining arguments (e.g. `start_index`)
+    and point at a zlib-compressed body addressed by its SHA-256, so aliases of the
+    same page share one copy. The store is an LRU bounded by total compressed size.
+
+    MCP results carry no HTTP validators, so the first fetch of a page reads its
+    ETag and Last-Modified with a HEAD sent alongside the MCP call. Once an entry is
+    older than `ttl` it is revalidated against the page itself with a conditional
+    HEAD (If-None-Match / If-Modified-Since); only a changed page, or one whose
+    server gives no validators, is fetched again through MCP.
+    """
+
+    def __init__(self, max_bytes: int = DEFAULT_MAX_BYTES, ttl: float = DEFAULT_TTL):
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+        self.revalidated = 0
+
+        self._documents: OrderedDict[str, _Document] = OrderedDict()
+        self._bodies: dict[str, tuple[bytes, int]] = {}  # digest -> (body, reference count)
+        self._http: httpx.AsyncClient | None = None
+
+    async def call(
+        self,
+        name: str,
+        arguments: dict[str, Any],
+        call_tool: Callable[[], Awaitable[dict[str, Any]]],
+    ) -> dict[str, Any]:
+        url = arguments.get("url")
+        if name not in CACHED_DOCUMENT_TOOLS or not isinstance(url, str):
+            return await call_tool()
+
+        key = f"{name} {url} " + json.dumps({k: v for k, v in arguments.items() if k != "url"}, sort_keys=True)
+
+        document = self._documents.get(key)
+        validators: tuple[str | None, str | None] = (None, None)
+        if document is not None:
+            self._documents.move_to_end(key)
+            fresh = time.time() - document.validated_at <= self.ttl
+            if not fresh:
+                fresh, validators = await self._revalidate(url, document)
+            if fresh:
+                self.hits += 1
+                document.validated_at = time.time()
+                body, _ = self._bodies[document.digest]
+                return {"status": "success", "content": json.loads(zlib.decompress(body))}
+
+        self.misses += 1
+        if document is None:
+            result, validators = await asyncio.gather(call_tool(), self._validators(url))
+        else:  # the revalidation's HEAD already read the current validators
+            result = await call_tool()
+        if result.get("status") == "success":
+            self._store(key, result["content"], *validators)
+        return result
+
+    def stats(self) -> dict[str, Any]:
+        return {
+            "documents": len(self._documents),
+            "bodies": len(self._bodies),
+            "bytes": self.size,
+            "hits": self.hits,
+            "misses": self.misses,
+            "revalidated": self.revalidated,
+        }
+
+    def _store(self, key: str, content: list[Any], etag: str | None, last_modified: str | None) -> None:
+        raw = json.dumps(content, ensure_ascii=False).encode()
+        digest = hashlib.sha256(raw).hexdigest()
+
+        if digest in self._bodies:
+            body, references = self._bodies[digest]
+            self._bodies[digest] = (body, references + 1)
+        else:
+            body = zlib.compress(raw)
+            if len(body) > self.max_bytes:
+                return
+            self._bodies[digest] = (body, 1)
+            self.size += len(body)
+
+        if key in self._documents:
+            self._release(self._documents.pop(key).digest)
+        self._documents[key] = _Document(digest, etag, last_modified, time.time())
+
+        while self.size > self.max_bytes:
+            _, evicted = self._documents.popitem(last=False)
+            self._release(evicted.digest)
+
+    def _release(self, digest: str) -> None:
+        body, references = self._bodies[digest]
+        if references > 1:
+            self._bodies[digest] = (body, references - 1)
+        else:
+            del self._bodies[digest]
+            self.size -= len(body)
+
+    async def _revalidate(self, url: str, document: _Document) -> tuple[bool, tuple[str | None, str | None]]:
+        """Whether the page is unchanged, and its current validators for the next revalidation.
+
+        An entry without validators is never considered unchanged, but the HEAD still
+        reads them, so the page fetched next can be revalidated when it expires.
+        """
+        headers = {}
+        if document.etag is not None:
+            headers["If-None-Match"] = document.etag
+        if document.last_modified is not None:
+            headers["If-Modified-Since"] = document.last_modified
+
+        response = await self._head(url, headers)
+        if response is None:
+            return False, (None, None)
+
+        validators = (response.headers.get("etag"), response.headers.get("last-modified"))
+        unchanged = response.status_code == 304 or (
+            response.is_success and validators == (document.etag, document.last_modified)
+        )
+        not_modified = bool(headers) and unchanged
+        if not_modified:
+            self.revalidated += 1
+        return not_modified, validators if response.is_success else (None, None)
+
+    async def _validators(self, url: str) -> tuple[str | None, str | None]:
+        response = await self._head(url, {})
+        if response is None or not response.is_success:
+            return None, None
+        return response.headers.get("etag"), response.headers.get("last-modified")
+
+    async def _head(self, url: str, headers: dict[str, str]) -> httpx.Response | None:
+        try:
+            return await self._client().head(url, headers=headers)
+        except httpx.HTTPError as e:
+            logger.debug(f"HEAD {url} failed: {e}")
+            return None
+
+    def _client(self) -> httpx.AsyncClient:
+        if self._http is None:
+            self._http = pooled_http_client(REVALIDATE_TIMEOUT, follow_redirects=True)
+        return self._http
+
+
+document_cache = DocumentCache()
@@ -0,0 +1,269 @@
+import asyncio
+import logging
+import os
+import threading
+from contextlib import asynccontextmanager
+from datetime import timedelta
+from typing import Any
+
+from mcp.client.streamable_http import streamablehttp_client
+from mcp.types import Tool as MCPTool
+from strands.tools.mcp.mcp_agent_tool import MCPAgentTool
+from strands.tools.mcp.mcp_client import MCPClient
+from strands.types.exceptions import MCPClientInitializationError
+
+from omnisearch_common.deadline import remaining
+from omnisearch_common.tool_schema_cache import ListChangedMCPClient, tool_schema_cache
+from omnisearch_common.tracing import tracer
+from src.doc_index import INDEXED_DOCUMENT_TOOLS, document_index
+from src.document_cache import document_cache
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_POOL_SIZE = int(os.environ.get("MCP_POOL_SIZE", "2"))
+DEFAULT_HEALTH_CHECK_INTERVAL = float(os.environ.get("MCP_HEALTH_CHECK_INTERVAL", "30"))  # [sec]
+
+
+class MCPSessionPool:
+    """A fixed-size set of long-lived MCP sessions to a single upstream server.
+
+    Sessions are opened once and shared by every concurrent tool call. A background
+    thread probes each session periodically and reconnects the ones that died; a
+    call that finds its session dead reconnects it and runs once more.
+
+    Each session runs on its own background thread (strands' MCPClient). Code on an
+    event loop uses the async methods, which never wait for a handshake, a tool
+    listing or a tool call on the loop itself.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        url: str,
+        size: int = DEFAULT_POOL_SIZE,
+        health_check_interval: float = DEFAULT_HEALTH_CHECK_INTERVAL,
+    ):
+        self.name = name
+        self.url = url
+        self.size = max(1, size)
+        self.health_check_interval = health_check_interval
+
+        self._clients: list[MCPClient | None] = [None] * self.size
+        self._in_flight = [0] * self.size
+        self._lock = threading.Lock()
+        self._start_lock = threading.Lock()
+        self._reconnect_locks = [threading.Lock() for _ in range(self.size)]
+        self._started = False
+        # One per health thread, so a thread still winding down after stop() never sees a restart's event.
+        self._stop_event = threading.Event()
+        self._health_thread: threading.Thread | None = None
+
+    def start(self) -> "MCPSessionPool":
+        with self._start_lock:
+            if self._started:
+                return self
+
+            clients: list[MCPClient | None] = []
+            try:
+                for _ in range(self.size):
+                    clients.append(self._connect())
+            except BaseException:
+                for client in clients:
+                    self._close(client)
+                raise
+            with self._lock:
+                self._clients = clients
+
+            self._stop_event = threading.Event()
+            self._health_thread = threading.Thread(
+                target=self._health_check_loop,
+                args=(self._stop_event,),
+                name=f"{self.name}-mcp-health",
+                daemon=True,
+            )
+            self._health_thread.start()
+            self._started = True
+
+        tool_schema_cache.get(self.url, self._list_tools)
+
+        logger.info(f"MCP session pool '{self.name}' opened {self.size} session(s) to {self.url}")
+        return self
+
+    def stop(self) -> None:
+        with self._start_lock:
+            self._stop_event.set()
+            with self._lock:
+                clients, self._clients = self._clients, [None] * self.size
+            for client in clients:
+                if client is not None:
+                    self._close(client)
+            self._started = False
+
+    def tools(self) -> list[MCPAgentTool]:
+        mcp_tools = tool_schema_cache.get(self.url, self._list_tools)
+        return [PooledMCPTool(mcp_tool, self) for mcp_tool in mcp_tools]
+
+    async def tools_async(self) -> list[MCPAgentTool]:
+        await self.ensure_started()
+        mcp_tools = await tool_schema_cache.get_async(self.url, self._list_tools)
+        return [PooledMCPTool(mcp_tool, self) for mcp_tool in mcp_tools]
+
+    async def ensure_started(self) -> "MCPSessionPool":
+        if not self._started:
+            await asyncio.to_thread(self.start)
+        return self
+
+    @asynccontextmanager
+    async def session(self):
+        await self.ensure_started()
+
+        with self._lock:
+            index = min(range(self.size), key=self._in_flight.__getitem__)
+            self._in_flight[index] += 1
+            client = self._clients[index]
+
+        try:
+            if client is None:
+                client = await asyncio.to_thread(self._reconnect, index, client)
+            yield client
+        finally:
+            with self._lock:
+                self._in_flight[index] -= 1
+
+    async def call_tool(
+        self, tool_use_id: str, name: str, arguments: dict[str, Any] | None = None
+    ) -> dict[str, Any]:
+        with tracer.start_as_current_span(f"mcp.call_tool {name}", attributes={"mcp.server": self.name}) as span:
+            result = await self._call_tool(tool_use_id, name, arguments)
+            span.set_attribute("mcp.status", result["status"])
+            return result
+
+    async def _call_tool(self, tool_use_id: str, name: str, arguments: dict[str, Any] | None) -> dict[str, Any]:
+        # Upstream servers are not told the request's deadline, but are not waited for past it either.
+        left = remaining()
+        read_timeout = timedelta(seconds=left) if left is not None else None
+
+        async with self.session() as client:
+            try:
+                result = await client.call_tool_async(tool_use_id, name, arguments, read_timeout)
+            except MCPClientInitializationError:  # the session had stopped; the call never ran
+                pass
+            else:
+                # call_tool_async also turns transport failures into error results; only a
+                # session that no longer answers tells those apart from errors of the tool.
+                if result["status"] != "error" or await asyncio.to_thread(self._alive, client):
+                    return result
+
+        logger.warning(f"MCP session to {self.url} dropped during '{name}', retrying")
+        await asyncio.to_thread(self._replace, client)
+        async with self.session() as client:
+            return await client.call_tool_async(tool_use_id, name, arguments, read_timeout)
+
+    def _connect(self) -> MCPClient:
+        client = ListChangedMCPClient(
+            lambda: streamablehttp_client(self.url),
+            on_tools_changed=lambda: tool_schema_cache.invalidate(self.url),
+        )
+        with tracer.start_as_current_span("mcp.connect", attributes={"mcp.server": self.name}):
+            return client.start()
+
+    def _list_tools(self) -> list[MCPTool]:
+        with tracer.start_as_current_span("mcp.list_tools", attributes={"mcp.server": self.name}):
+            for client in list(self._clients):
+                if client is None:
+                    continue
+                try:
+                    return self._list_all_tools(client)
+                except MCPClientInitializationError:  # stopped session; try the next one
+                    continue
+            return self._list_all_tools(self._reconnect(0, self._clients[0]))
+
+    def _list_all_tools(self, client: MCPClient) -> list[MCPTool]:
+        mcp_tools: list[MCPTool] = []
+        pagination_token = None
+        while True:
+            page = client.list_tools_sync(pagination_token)
+            mcp_tools.extend(tool.mcp_tool for tool in page)
+            pagination_token = page.pagination_token
+            if pagination_token is None:
+                return mcp_tools
+
+    def _alive(self, client: MCPClient) -> bool:
+        try:
+            client.list_tools_sync()
+        except Exception:
+            return False
+        return True
+
+    def _close(self, client: MCPClient) -> None:
+        try:
+            client.stop(None, None, None)
+        except Exception:
+            logger.exception(f"Failed to close MCP session to {self.url}")
+
+    def _replace(self, stale: MCPClient) -> None:
+        with self._lock:
+            index = next((index for index, client in enumerate(self._clients) if client is stale), None)
+        if index is not None:  # otherwise it was replaced already
+            self._reconnect(index, stale)
+
+    def _reconnect(self, index: int, stale: MCPClient | None) -> MCPClient:
+        with self._reconnect_locks[index]:
+            current = self._clients[index]
+            # Another caller may have replaced the session while we were waiting.
+            if current is not stale and current is not None:
+                return current
+
+            if current is not None:
+                self._close(current)
+
+            logger.info(f"Reconnecting MCP session {index} of pool '{self.name}'")
+            client = self._connect()
+            with self._lock:
+                self._clients[index] = client
+            return client
+
+    def _health_check_loop(self, stop_event: threading.Event) -> None:
+        while not stop_event.wait(self.health_check_interval):
+            for index in range(self.size):
+                if stop_event.is_set():
+                    return
+                client = self._clients[index]
+                try:
+                    if client is None:
+                        raise ConnectionError("session is not running")
+                    client.list_tools_sync()
+                except Exception as e:
+                    if stop_event.is_set():  # stopped while probing; stop() closed the sessions
+                        return
+                    logger.warning(f"MCP session {index} of pool '{self.name}' is unhealthy: {e}")
+                    try:
+                        self._reconnect(index, client)
+                    except Exception:
+                        logger.exception(f"Failed to reconnect MCP session {index} of pool '{self.name}'")
+
+
+class PooledMCPTool(MCPAgentTool):
+    """An MCP tool whose calls are dispatched to whichever pooled session is least busy."""
+
+    def __init__(self, mcp_tool: MCPTool, pool: MCPSessionPool):
+        super().__init__(mcp_tool, mcp_client=None)
+        self.pool = pool
+
+    async def stream(self, tool_use, invocation_state, **kwargs):
+        tool_use_id = tool_use["toolUseId"]
+
+        def call_tool():
+            return self.pool.call_tool(tool_use_id=tool_use_id, name=self.tool_name, arguments=tool_use["input"])
+
+        result = await document_cache.call(self.tool_name, tool_use["input"], call_tool)
+
+        # Every page read is kept in the local index so later queries can be answered offline.
+        domain = INDEXED_DOCUMENT_TOOLS.get(self.tool_name)
+        url = tool_use["input"].get("url")
+        if document_index is not None and domain and isinstance(url, str) and result.get("status") == "success":
+            text = "".join(block["text"] for block in result["content"] if "text" in block)
+            base_offset = tool_use["input"].get("start_index") or 0
+            await asyncio.to_thread(document_index.ingest, url, text, domain, base_offset)
+
+        yield {**result, "toolUseId": tool_use_id}
@@ -2,13 +2,12 @@ import logging
 import os
 import asyncio
 from strands import Agent, tool
-from strands.multiagent.a2a import A2AServer
-import uvicorn
-from fastapi import FastAPI
-from mcp.client.streamable_http import streamablehttp_client
-from strands import Agent
-from strands.models import BedrockModel
-from strands.tools.mcp.mcp_client import MCPClient
+
+from omnisearch_common.bedrock_model import SPECIALIST_FALLBACK_MODELS, resilient_bedrock_model
+from omnisearch_common.context_budget import context_budget
+from omnisearch_common.fanout import stream_chunk
+from omnisearch_common.prompt_cache import prompt_cache_reporter
+from src.mcp_pool import DEFAULT_POOL_SIZE, MCPSessionPool
 
 
 system_prompt = """
@@ -137,42 +136,44 @@ Remember: You extract quotes. Another agent will handle interpretation and synth
 
 logging.basicConfig(level=logging.INFO)
 
-streamable_http_mcp_client = MCPClient(
-    lambda: streamablehttp_client("https://learn.microsoft.com/api/mcp")
+microsoft_knowledge_mcp_pool = MCPSessionPool(
+    "microsoft-learn",
+    "https://learn.microsoft.com/api/mcp",
+    size=int(os.environ.get("MICROSOFT_KNOWLEDGE_MCP_POOL_SIZE", DEFAULT_POOL_SIZE)),
 )
 
-bedrock_model = BedrockModel(model_id="apac.amazon.nova-pro-v1:0", max_tokens=10000)
+bedrock_model = resilient_bedrock_model(
+    "apac.amazon.nova-pro-v1:0", fallbacks=SPECIALIST_FALLBACK_MODELS, max_tokens=10000
+)
 
 
 @tool
-async def query_aws(query: str) -> str:
-
-    with streamable_http_mcp_client:
+async def query_microsoft(query: str) -> str:
 
-        tools = streamable_http_mcp_client.list_tools_sync()
+    tools = await microsoft_knowledge_mcp_pool.tools_async()
 
-        strands_agent = Agent(
-            name="Microsoft Knowledge Search Agent",
-            description="A search agent that executes Microsoft Knowledge MCP tools and extracts verbatim quotes from Microsoft documentation, API references, best practices, and architectural guidance without interpretation or synthesis.",
-            system_prompt=system_prompt,
-            tools=[tools],
-            callback_handler=None,
-            model=bedrock_model,
-        )
+    strands_agent = Agent(
+        name="Microsoft Knowledge Search Agent",
+        description="A search agent that executes Microsoft Knowledge MCP tools and extracts verbatim quotes from Microsoft documentation, API references, best practices, and architectural guidance without interpretation or synthesis.",
+        system_prompt=system_prompt,
+        tools=tools,
+        callback_handler=None,
+        model=bedrock_model,
+        hooks=[prompt_cache_reporter, context_budget],
+    )
 
-        agent_stream = strands_agent.stream_async(query)
+    agent_stream = strands_agent.stream_async(query)
 
-        message = ""
+    chunks: list[str] = []
 
-        async for event in agent_stream:
-            if "data" in event:
-                message = message + event["data"]
-            elif "current_tool_use" in event and event["current_tool_use"].get("name"):
-                print(f"\n[Tool use delta for: {event['current_tool_use']['name']}]")
+    async for event in agent_stream:
+        if "data" in event:
+            chunks.append(event["data"])
+            await stream_chunk(event["data"])
 
-        return message
+    return "".join(chunks)
 
 
 if __name__ == "__main__":
-    result = asyncio.run(query_aws("How do I launch WSL2 with a custom image?"))
+    result = asyncio.run(query_microsoft("How do I launch WSL2 with a custom image?"))
     print(result)
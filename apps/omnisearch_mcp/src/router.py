@@ -0,0 +1,158 @@
+import os
+import re
+import unicodedata
+from dataclasses import dataclass, field
+
+DEFAULT_CONFIDENCE_THRESHOLD = float(os.environ.get("ROUTER_CONFIDENCE_THRESHOLD", "0.85"))
+DEFAULT_MIN_SCORE = float(os.environ.get("ROUTER_MIN_SCORE", "2"))
+
+# Service names and keywords per specialist domain, with how strongly each one
+# points at that domain. Patterns are regular expressions matched case-insensitively
+# on NFKC-normalized text; ambiguous words ("lambda", "functions") get low weights.
+ROUTING_RULES: dict[str, dict[str, float]] = {
+    "aws": {
+        r"aws": 3,
+        r"amazon": 3,
+        r"アマゾン": 3,
+        r"s3(?:\s*vectors)?": 3,
+        r"ec2": 3,
+        r"ecs": 2,
+        r"eks": 3,
+        r"fargate": 3,
+        r"lambda": 1.5,
+        r"dynamodb": 3,
+        r"rds": 2,
+        r"aurora": 2,
+        r"redshift": 3,
+        r"athena": 2,
+        r"glue": 1,
+        r"kinesis": 3,
+        r"sqs": 3,
+        r"sns": 2,
+        r"eventbridge": 3,
+        r"step\s*functions": 3,
+        r"api\s*gateway": 2,
+        r"cloudformation": 3,
+        r"cdk": 2,
+        r"cloudwatch": 3,
+        r"cloudfront": 3,
+        r"cloudtrail": 3,
+        r"route\s*53": 3,
+        r"vpc": 1,
+        r"iam": 1,
+        r"cognito": 3,
+        r"kms": 1.5,
+        r"secrets\s*manager": 2,
+        r"ecr": 2,
+        r"elastic\s*beanstalk": 3,
+        r"sagemaker": 3,
+        r"bedrock": 3,
+        r"agentcore": 3,
+        r"nova": 1,
+        r"amplify": 2,
+        r"appsync": 3,
+    },
+    "microsoft": {
+        r"microsoft": 3,
+        r"マイクロソフト": 3,
+        r"azure": 3,
+        r"entra(?:\s*id)?": 3,
+        r"active\s*directory": 2,
+        r"wsl2?": 3,
+        r"windows": 2,
+        r"powershell": 3,
+        r"\.net": 2,
+        r"c#": 2,
+        r"visual\s*studio": 3,
+        r"vs\s*code": 2,
+        r"functions": 0.5,
+        r"app\s*service": 2,
+        r"aks": 3,
+        r"cosmos\s*db": 3,
+        r"blob\s*storage": 2,
+        r"bicep": 3,
+        r"arm\s*templates?": 2,
+        r"devops": 0.5,
+        r"teams": 1.5,
+        r"sharepoint": 3,
+        r"(?:office|microsoft)\s*365": 3,
+        r"power\s*(?:bi|automate|apps)": 3,
+        r"dynamics\s*365": 3,
+        r"graph\s*api": 2,
+        r"intune": 3,
+        r"defender": 2,
+        r"sentinel": 1.5,
+        r"hyper-v": 3,
+        r"sql\s*server": 2,
+        r"copilot": 1,
+        r"fabric": 1,
+    },
+}
+
+
+@dataclass(frozen=True)
+class Route:
+    # The single specialist to dispatch to, or None when the LLM has to decide.
+    specialist: str | None
+    confidence: float
+    scores: dict[str, float] = field(default_factory=dict)
+    matches: tuple[str, ...] = ()
+
+
+class Router:
+    """Routes a query to a specialist domain without a model call.
+
+    Every rule is compiled into one alternation regex, so a query is scanned once
+    regardless of how many service names are known. Each distinct matched term adds
+    its weight to its domain; the route is direct only when the best domain has at
+    least `min_score` and holds `confidence_threshold` of the total score.
+    """
+
+    def __init__(
+        self,
+        rules: dict[str, dict[str, float]] = ROUTING_RULES,
+        confidence_threshold: float = DEFAULT_CONFIDENCE_THRESHOLD,
+        min_score: float = DEFAULT_MIN_SCORE,
+    ):
+        self.confidence_threshold = confidence_threshold
+        self.min_score = min_score
+
+        self._terms: dict[str, tuple[str, float]] = {}
+        alternatives = []
+        for domain, patterns in rules.items():
+            for pattern, weight in patterns.items():
+                group = f"t{len(self._terms)}"
+                self._terms[group] = (domain, weight)
+                alternatives.append(f"(?P<{group}>{pattern})")
+
+        # ASCII-only boundaries: `\b` never fires between Japanese text and a service
+        # name ("S3とは"), and service names themselves are ASCII or katakana.
+        self._pattern = re.compile(
+            r"(?<![a-z0-9])(?:" + "|".join(alternatives) + r")(?![a-z0-9])",
+            re.IGNORECASE,
+        )
+
+    def route(self, query: str) -> Route:
+        text = unicodedata.normalize("NFKC", query)
+
+        scores: dict[str, float] = {}
+        matched: dict[str, str] = {}
+        for match in self._pattern.finditer(text):
+            group = match.lastgroup
+            if group in matched:
+                continue
+            matched[group] = match.group(group)
+            domain, weight = self._terms[group]
+            scores[domain] = scores.get(domain, 0) + weight
+
+        if not scores:
+            return Route(None, 0.0)
+
+        best = max(scores, key=scores.__getitem__)
+        confidence = scores[best] / sum(scores.values())
+        direct = scores[best] >= self.min_score and confidence >= self.confidence_threshold
+
+        return Route(best if direct else None, confidence, scores, tuple(matched.values()))
+
+
+query_router = Router()
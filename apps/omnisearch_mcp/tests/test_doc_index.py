@@ -0,0 +1,48 @@
+from src.doc_index import DocumentIndex
+
+PAGE = """# Amazon S3 Vectors
+
+Amazon S3 Vectors is a durable vector storage service. Vector buckets hold vector indexes,
+and each vector index stores embeddings that can be queried with similarity search.
+
+# Lambda cold starts
+
+Provisioned concurrency keeps execution environments initialized so functions respond without a cold start.
+"""
+
+
+def index_with_page(tmp_path) -> DocumentIndex:
+    index = DocumentIndex(str(tmp_path), passage_tokens=40)
+    index.ingest("https://docs.aws.amazon.com/s3/vectors", PAGE, "aws")
+    return index
+
+
+def test_search_finds_the_passage_that_answers(tmp_path):
+    index = index_with_page(tmp_path)
+    [best, *_] = index.search("S3 vector buckets and vector indexes", "aws")
+    assert "vector buckets" in best.text.lower()
+    assert best.coverage == 1.0
+    assert index.search("S3 vector buckets", "microsoft") == []
+    index.close()
+
+
+def test_answer_only_when_confident(tmp_path):
+    index = index_with_page(tmp_path)
+    query = "What are S3 vector buckets and vector indexes?"
+    answer = index.answer(query, "aws", min_relevance=0.3, min_coverage=0.5)
+    assert answer is not None
+    assert "https://docs.aws.amazon.com/s3/vectors" in answer
+    assert index.answer(query, "aws", min_relevance=0.9, min_coverage=0.5) is None
+    # Matching "s3" alone covers too little of the query.
+    assert index.answer("How do I replicate S3 objects across DynamoDB global tables?", "aws") is None
+    index.close()
+
+
+def test_reingesting_a_page_replaces_it_and_survives_compaction(tmp_path):
+    index = index_with_page(tmp_path)
+    index.ingest("https://docs.aws.amazon.com/s3/vectors", "# Replaced\n\nOnly quantum widgets remain here.", "aws")
+    index.compact()
+    assert index.search("vector buckets", "aws") == []
+    assert index.search("quantum widgets", "aws")
+    index.close()
+
@@ -0,0 +1,113 @@
+import asyncio
+import json
+import zlib
+
+import httpx
+
+from src.document_cache import DocumentCache
+
+TOOL = "aws___read_documentation"
+
+
+class Page:
+    """A documentation page served both through an MCP tool and over HTTP."""
+
+    def __init__(self, text: str, etag: str = '"v1"'):
+        self.text = text
+        self.etag = etag
+        self.fetches = 0
+        self.heads: list[dict[str, str]] = []
+
+    async def call_tool(self) -> dict:
+        self.fetches += 1
+        return {"status": "success", "content": [{"text": self.text}]}
+
+    def handle(self, request: httpx.Request) -> httpx.Response:
+        self.heads.append(dict(request.headers))
+        if request.headers.get("if-none-match") == self.etag:
+            return httpx.Response(304, headers={"ETag": self.etag})
+        return httpx.Response(200, headers={"ETag": self.etag})
+
+
+def make_cache(pages: dict[str, Page], **kwargs) -> DocumentCache:
+    cache = DocumentCache(**kwargs)
+    transport = httpx.MockTransport(lambda request: pages[str(request.url)].handle(request))
+    cache._http = httpx.AsyncClient(transport=transport)
+    return cache
+
+
+def read(cache: DocumentCache, url: str, page: Page) -> dict:
+    return asyncio.run(cache.call(TOOL, {"url": url}, page.call_tool))
+
+
+def body_size(text: str) -> int:
+    return len(zlib.compress(json.dumps([{"text": text}], ensure_ascii=False).encode()))
+
+
+def test_first_fetch_reads_validators_so_expiry_revalidates_conditionally():
+    page = Page("S3 Vectors stores vector embeddings.")
+    url = "https://docs.aws.amazon.com/s3/vectors"
+    cache = make_cache({url: page}, ttl=0)
+
+    first = read(cache, url, page)
+    assert page.heads and "if-none-match" not in page.heads[0]  # read alongside the fetch
+
+    # Expired at once (ttl=0): the stored ETag makes the HEAD conditional, and 304 keeps the body.
+    assert read(cache, url, page) == first
+    assert page.heads[-1]["if-none-match"] == '"v1"'
+    assert page.fetches == 1
+    assert cache.stats()["revalidated"] == 1
+
+
+def test_changed_pages_are_fetched_again():
+    page = Page("old text")
+    url = "https://docs.aws.amazon.com/s3/vectors"
+    cache = make_cache({url: page}, ttl=0)
+    read(cache, url, page)
+
+    page.text, page.etag = "new text", '"v2"'
+    assert read(cache, url, page)["content"] == [{"text": "new text"}]
+    assert page.fetches == 2
+    # The changed page was stored with the validators its revalidation read.
+    assert read(cache, url, page)["content"] == [{"text": "new text"}]
+    assert page.fetches == 2
+
+
+def test_least_recently_used_pages_are_evicted_beyond_the_size_bound():
+    # Numbers in a scrambled order, so the pages do not compress to almost nothing.
+    texts = {
+        f"https://example.com/{name}": name + " ".join(str(i * 7919 % 10007) for i in range(200)) for name in "abc"
+    }
+    pages = {url: Page(text) for url, text in texts.items()}
+    sizes = [body_size(text) for text in texts.values()]
+    cache = make_cache(pages, max_bytes=sizes[0] + sizes[1] + sizes[2] // 2)
+    a, b, c = pages
+
+    read(cache, a, pages[a])
+    read(cache, b, pages[b])
+    read(cache, a, pages[a])  # b is now the least recently used
+    read(cache, c, pages[c])
+
+    assert cache.stats()["documents"] == 2
+    assert cache.size <= cache.max_bytes
+    read(cache, a, pages[a])
+    read(cache, b, pages[b])
+    assert [page.fetches for page in pages.values()] == [1, 2, 1]
+
+
+def test_bodies_are_shared_by_aliases_and_oversized_ones_are_not_kept():
+    text = "Provisioned concurrency keeps functions initialized."
+    pages = {url: Page(text) for url in ("https://example.com/a", "https://example.com/a/")}
+    cache = make_cache(pages)
+    for url, page in pages.items():
+        read(cache, url, page)
+    assert cache.stats()["documents"] == 2
+    assert cache.stats()["bodies"] == 1
+    assert cache.size == body_size(text)
+
+    small = make_cache(pages, max_bytes=body_size(text) - 1)
+    url, page = next(iter(pages.items()))
+    read(small, url, page)
+    read(small, url, page)
+    assert page.fetches == 3
+    assert small.stats()["documents"] == 0
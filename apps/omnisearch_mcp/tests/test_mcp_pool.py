@@ -0,0 +1,133 @@
+import asyncio
+import time
+
+from mcp.types import Tool
+
+from omnisearch_common.deadline import deadline_scope
+from src.mcp_pool import MCPSessionPool, PooledMCPTool
+
+
+class ToolPage(list):
+    pagination_token = None
+
+
+class FakeMCPClient:
+    """Stands in for strands' MCPClient: a session that answers until it dies."""
+
+    def __init__(self, dies_during_call: bool = False):
+        self.alive = True
+        self.dies_during_call = dies_during_call
+        self.calls = 0
+        self.read_timeouts = []
+        self.stopped = False
+
+    def list_tools_sync(self, pagination_token=None) -> ToolPage:
+        if not self.alive:
+            raise ConnectionError("session is closed")
+        return ToolPage()
+
+    async def call_tool_async(self, tool_use_id, name, arguments=None, read_timeout_seconds=None):
+        self.calls += 1
+        self.read_timeouts.append(read_timeout_seconds)
+        if self.dies_during_call:
+            self.alive = False
+        if not self.alive:
+            return {"toolUseId": tool_use_id, "status": "error", "content": [{"text": "connection lost"}]}
+        return {"toolUseId": tool_use_id, "status": "success", "content": [{"text": f"{name} answered"}]}
+
+    def stop(self, *exc_info) -> None:
+        self.alive = False
+        self.stopped = True
+
+
+class FakePool(MCPSessionPool):
+    """Connects the given clients in order, then fresh healthy ones."""
+
+    def __init__(self, clients: list[FakeMCPClient], **kwargs):
+        self.pending = list(clients)
+        self.connected: list[FakeMCPClient] = []
+        super().__init__("fake", "http://mcp.invalid/fake", **kwargs)
+
+    def _connect(self) -> FakeMCPClient:
+        client = self.pending.pop(0) if self.pending else FakeMCPClient()
+        self.connected.append(client)
+        return client
+
+
+def test_call_is_retried_once_on_a_new_session_when_the_session_died():
+    dying = FakeMCPClient(dies_during_call=True)
+    pool = FakePool([dying], size=1, health_check_interval=60)
+
+    result = asyncio.run(pool.call_tool("tool-1", "search_documentation", {"search_phrase": "s3"}))
+    pool.stop()
+
+    assert result["status"] == "success"
+    assert dying.calls == 1
+    assert dying.stopped
+    assert len(pool.connected) == 2
+
+
+def test_tool_errors_on_a_live_session_are_not_retried():
+    client = FakeMCPClient()
+    pool = FakePool([client], size=1, health_check_interval=60)
+
+    async def failing_call(tool_use_id, name, arguments=None, read_timeout_seconds=None):
+        client.calls += 1
+        return {"toolUseId": tool_use_id, "status": "error", "content": [{"text": "no such page"}]}
+
+    client.call_tool_async = failing_call
+    result = asyncio.run(pool.call_tool("tool-1", "read_documentation", {"url": "https://example.com"}))
+    pool.stop()
+
+    assert result["status"] == "error"
+    assert client.calls == 1
+    assert len(pool.connected) == 1
+
+
+def test_health_check_replaces_dead_sessions():
+    pool = FakePool([], size=2, health_check_interval=0.01).start()
+    dead = pool.connected[0]
+    dead.alive = False
+
+    deadline = time.monotonic() + 2
+    while len(pool.connected) < 3 and time.monotonic() < deadline:
+        time.sleep(0.01)
+    replacement = pool._clients[0]
+    pool.stop()
+
+    assert dead.stopped
+    assert replacement is pool.connected[2]
+    assert len(pool.connected) == 3  # the healthy session was kept
+
+
+def test_pooled_tool_calls_through_the_least_busy_session():
+    pool = FakePool([], size=2, health_check_interval=60)
+    tool = PooledMCPTool(Tool(name="search_documentation", inputSchema={"type": "object"}), pool)
+    tool_use = {"toolUseId": "tool-1", "name": "search_documentation", "input": {"search_phrase": "s3"}}
+
+    async def main():
+        return [event async for event in tool.stream(tool_use, {})]
+
+    [result] = asyncio.run(main())
+    pool.stop()
+
+    assert result["status"] == "success"
+    assert result["toolUseId"] == "tool-1"
+    assert [client.calls for client in pool.connected] == [1, 0]
+
+
+def test_calls_are_not_waited_for_past_the_request_deadline():
+    client = FakeMCPClient()
+    pool = FakePool([client], size=1, health_check_interval=60)
+
+    async def main():
+        with deadline_scope(5):
+            await pool.call_tool("tool-1", "search_documentation", {"search_phrase": "s3"})
+        await pool.call_tool("tool-2", "search_documentation", {"search_phrase": "s3"})
+
+    asyncio.run(main())
+    pool.stop()
+
+    [bounded, unbounded] = client.read_timeouts
+    assert 4 < bounded.total_seconds() <= 5
+    assert unbounded is None
@@ -0,0 +1,9 @@
+from src.router import Router
+
+
+def test_router_routes_clear_single_domain_queries():
+    router = Router()
+    assert router.route("What is Amazon S3 Vectors?").specialist == "aws"
+    assert router.route("Azure Functions の Python バインディング").specialist == "microsoft"
+    assert router.route("Compare Azure Cosmos DB and Amazon DynamoDB").specialist is None
+    assert router.route("What is Kubernetes?").specialist is None
@@ -0,0 +1 @@
+"""Modules shared by the omnisearch agents; see README.md."""
@@ -0,0 +1,302 @@
+import asyncio
+import logging
+import os
+from contextlib import nullcontext
+from typing import AsyncContextManager, AsyncIterator, Callable
+from uuid import uuid4
+
+import httpx
+from a2a.client import Client, ClientConfig, ClientFactory, create_text_message_object
+from a2a.server.agent_execution import RequestContext
+from a2a.server.context import ServerCallContext
+from a2a.server.request_handlers import DefaultRequestHandler
+from a2a.server.tasks import TaskUpdater
+from a2a.types import (
+    AgentCard,
+    Message,
+    MessageSendParams,
+    Part,
+    TaskArtifactUpdateEvent,
+    TaskState,
+    TaskStatusUpdateEvent,
+    TextPart,
+)
+from a2a.utils import new_agent_text_message
+from opentelemetry import trace
+from opentelemetry.trace import Span, SpanKind, Status, StatusCode
+from strands import Agent
+from strands.multiagent.a2a.executor import StrandsA2AExecutor
+from strands.types.content import ContentBlock
+
+from omnisearch_common.agent_cards import agent_card_registry
+from omnisearch_common.deadline import enforce_deadline, extract_deadline, inject_deadline
+from omnisearch_common.http_transport import pooled_http_client
+from omnisearch_common.prompt_cache import RequestUsage, request_usage
+from omnisearch_common.tracing import TRACE_CONTEXT_KEY, extract_trace_context, inject_trace_context, tracer
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_STREAM_TIMEOUT = float(os.environ.get("A2A_STREAM_TIMEOUT", "300"))  # [sec]
+DEFAULT_TASK_TIMEOUT = float(os.environ.get("A2A_TASK_TIMEOUT", "300"))  # [sec], unless the caller sends its own
+
+RESPONSE_ARTIFACT_NAME = "agent_response"
+
+# Status updates whose metadata carries this key report progress from another
+# agent (e.g. a specialist's output relayed by the orchestrator), not the answer.
+PROGRESS_SOURCE_KEY = "source"
+
+# Metadata key of the final status update under which a server reports the token
+# usage of the request, by layer (`RequestUsage.to_dict()`), to its caller.
+USAGE_KEY = "usage"
+
+FAILED_STATES = {TaskState.failed, TaskState.rejected, TaskState.canceled}
+
+
+class StreamingA2AExecutor(StrandsA2AExecutor):
+    """Streams the agent's answer to A2A clients as `TaskArtifactUpdateEvent` chunks.
+
+    The stock executor reports text deltas as `working` status messages and sends the
+    whole answer again as a single artifact once the agent is done. Here every delta is
+    appended to the response artifact as soon as it is generated and the artifact is
+    closed with `last_chunk`, so a streaming client can relay the answer while it is
+    still being written and a non-streaming client still receives one artifact. The
+    final status update carries the request's token usage under USAGE_KEY.
+
+    With `checkout` (e.g. `AgentPool.agent`) every task runs on an agent of its own;
+    otherwise all tasks share `agent`. Subclasses decide what the answer is by
+    overriding `answer()`.
+
+    A task has to finish within the budget its caller sent in the message metadata
+    (`omnisearch_common.deadline`), or within `timeout`; past it, the task fails and everything it
+    started is cancelled. `abort()` cancels a running task the same way.
+    """
+
+    def __init__(
+        self,
+        agent: Agent,
+        checkout: Callable[[], AsyncContextManager[Agent]] | None = None,
+        timeout: float = DEFAULT_TASK_TIMEOUT,
+    ):
+        super().__init__(agent)
+        self.checkout = checkout or (lambda: nullcontext(self.agent))
+        self.timeout = timeout
+        self._running: dict[str, asyncio.Task] = {}
+
+    def abort(self, task_id: str) -> None:
+        """Cancel the task's execution, e.g. because its client disconnected; it ends as `canceled`."""
+        if (running := self._running.get(task_id)) is not None:
+            logger.info(f"Cancelling task {task_id}")
+            running.cancel()
+
+    async def _execute_streaming(self, context: RequestContext, updater: TaskUpdater) -> None:
+        # Continue the caller's trace from the message metadata; without it, from the
+        # request's traceparent header (TraceContextMiddleware).
+        metadata = context.message.metadata if context.message else None
+        parent = extract_trace_context(metadata)
+        with tracer.start_as_current_span(
+            "a2a.execute", context=parent, kind=SpanKind.SERVER, attributes={"a2a.task_id": context.task_id or ""}
+        ) as span:
+            timeout = extract_deadline(metadata)
+            timeout = self.timeout if timeout is None else timeout
+            span.set_attribute("a2a.timeout", timeout)
+
+            # Run in a task of its own so abort() can cancel it without cancelling the
+            # SDK's producer task, which still has to close the event queue.
+            running = asyncio.create_task(self._stream_answer_within(timeout, context, updater))
+            self._running[updater.task_id] = running
+            try:
+                await running
+            except asyncio.CancelledError:
+                if asyncio.current_task().cancelling():
+                    raise
+                span.add_event("cancelled")
+                await updater.cancel()
+            except TimeoutError:
+                logger.warning(f"Task {updater.task_id} missed its {timeout:.1f}s deadline")
+                span.set_status(Status(StatusCode.ERROR, "deadline exceeded"))
+                await updater.failed(
+                    new_agent_text_message(
+                        f"Deadline exceeded after {timeout:.1f}s", updater.context_id, updater.task_id
+                    )
+                )
+            finally:
+                self._running.pop(updater.task_id, None)
+
+    async def _stream_answer_within(self, timeout: float, context: RequestContext, updater: TaskUpdater) -> None:
+        async with enforce_deadline(timeout):
+            await self._stream_answer(context, updater)
+
+    async def _stream_answer(self, context: RequestContext, updater: TaskUpdater) -> None:
+        usage = RequestUsage()
+        request_usage.set(usage)  # local to this request's task
+
+        content_blocks = self._convert_a2a_parts_to_content_blocks(context.message.parts) if context.message else []
+        if not content_blocks:
+            raise ValueError("No content blocks available")
+
+        artifact_id = uuid4().hex
+        streamed = False
+
+        try:
+            async with self.checkout() as agent:
+                async for text in self.answer(agent, content_blocks):
+                    if text:
+                        if not streamed:
+                            trace.get_current_span().add_event("first_chunk")
+                        await updater.add_artifact(
+                            [Part(root=TextPart(text=text))],
+                            artifact_id=artifact_id,
+                            name=RESPONSE_ARTIFACT_NAME,
+                            append=streamed,
+                            last_chunk=False,
+                        )
+                        streamed = True
+        except Exception:
+            logger.exception("Error in streaming execution")
+            raise
+
+        if streamed:
+            await updater.add_artifact(
+                [Part(root=TextPart(text=""))],
+                artifact_id=artifact_id,
+                name=RESPONSE_ARTIFACT_NAME,
+                append=True,
+                last_chunk=True,
+            )
+
+        total = usage.total
+        input_tokens = total.input_tokens + total.cache_read_input_tokens + total.cache_write_input_tokens
+        logger.info(
+            f"Task {context.task_id} used {input_tokens} input / "
+            f"{total.output_tokens} output tokens in {total.model_calls} model calls "
+            f"(~${total.cost_usd:.4f}) across {', '.join(usage.layers) or 'no agents'}"
+        )
+        await updater.update_status(TaskState.completed, final=True, metadata={USAGE_KEY: usage.to_dict()})
+
+    async def answer(self, agent: Agent, content_blocks: list[ContentBlock]) -> AsyncIterator[str]:
+        """Yield `agent`'s answer text: its text deltas, or its final message if it streamed none."""
+        streamed = False
+        async for event in agent.stream_async(content_blocks):
+            if text := event.get("data"):
+                streamed = True
+                yield text
+            elif "result" in event and not streamed:
+                yield str(event["result"])
+
+    async def report_progress(self, updater: TaskUpdater, text: str, source: str) -> None:
+        """Send `text` from `source` as a `working` status message, outside the answer artifact."""
+        await updater.update_status(
+            TaskState.working,
+            new_agent_text_message(text, updater.context_id, updater.task_id),
+            metadata={PROGRESS_SOURCE_KEY: source},
+        )
+
+
+class CancelOnDisconnectRequestHandler(DefaultRequestHandler):
+    """Request handler that cancels a streamed task once its client disconnects.
+
+    The default handler finishes such tasks in the background although nobody will
+    read the answer. Its executor must be a `StreamingA2AExecutor`.
+    """
+
+    async def on_message_send_stream(self, params: MessageSendParams, context: ServerCallContext | None = None):
+        task_id = None
+        try:
+            async for event in super().on_message_send_stream(params, context):
+                task_id = task_id or getattr(event, "task_id", None) or getattr(event, "id", None)
+                yield event
+        except (asyncio.CancelledError, GeneratorExit):
+            if task_id is not None:
+                self.agent_executor.abort(task_id)
+            raise
+
+
+class A2AStreamingClient:
+    """A2A client that yields a remote agent's answer text as it arrives.
+
+    Messages are sent with streaming enabled. Answer text is taken from artifact chunks
+    (`StreamingA2AExecutor`) or, for servers running the stock executor, from `working`
+    status messages, in which case the final whole-answer artifact is skipped. Agents
+    that do not support streaming are answered in one piece. Token usage the server
+    reports is merged into the caller's `request_usage`. Agent cards come from the
+    shared `agent_card_registry`; requests go over the shared connection pool
+    (`omnisearch_common.http_transport`).
+    """
+
+    def __init__(self, timeout: float = DEFAULT_STREAM_TIMEOUT):
+        self.timeout = timeout
+        self._httpx_client: httpx.AsyncClient | None = None
+        self._clients: dict[str, tuple[AgentCard, Client]] = {}
+
+    async def stream(self, url: str, text: str) -> AsyncIterator[str]:
+        span = tracer.start_span("a2a.send_message", kind=SpanKind.CLIENT, attributes={"a2a.url": url})
+        try:
+            async for text in self._stream(span, url, text):
+                yield text
+        except Exception as e:
+            span.record_exception(e)
+            span.set_status(Status(StatusCode.ERROR, str(e)))
+            raise
+        finally:
+            span.end()
+
+    async def _stream(self, span: Span, url: str, text: str) -> AsyncIterator[str]:
+        with trace.use_span(span):
+            client = await self._client(url)
+        message = create_text_message_object(content=text)
+        message.metadata = inject_deadline({TRACE_CONTEXT_KEY: inject_trace_context(trace.set_span_in_context(span))})
+
+        from_status = False
+        streamed = False
+        task = None
+        events = client.send_message(message)
+        while True:
+            # The span is current only while the client works, never across a yield.
+            with trace.use_span(span):
+                event = await anext(events, None)
+            if event is None:
+                break
+
+            if isinstance(event, Message):
+                text = _text(event.parts)
+            else:
+                task, update = event
+                text = ""
+                if isinstance(update, TaskStatusUpdateEvent):
+                    if USAGE_KEY in (update.metadata or {}) and (usage := request_usage.get()) is not None:
+                        usage.merge(update.metadata[USAGE_KEY])
+                    status_message = update.status.message
+                    is_progress = PROGRESS_SOURCE_KEY in (update.metadata or {})
+                    if status_message and update.status.state == TaskState.working and not is_progress:
+                        from_status = True
+                        text = _text(status_message.parts)
+                elif isinstance(update, TaskArtifactUpdateEvent):
+                    if update.append or not from_status:
+                        text = _text(update.artifact.parts)
+                elif update is None:  # the task as first created, or whole if the agent does not stream
+                    text = "".join(_text(artifact.parts) for artifact in task.artifacts or [])
+
+            if text:
+                if not streamed:
+                    span.add_event("first_chunk")
+                    streamed = True
+                yield text
+
+        if task is not None and task.status.state in FAILED_STATES:
+            detail = _text(task.status.message.parts) if task.status.message else task.status.state.value
+            raise RuntimeError(f"A2A task {task.id} at {url} ended as {task.status.state.value}: {detail}")
+
+    async def _client(self, url: str) -> Client:
+        card = await agent_card_registry.get(url)
+        cached = self._clients.get(url)
+        if cached is None or cached[0] is not card:  # new agent, or its card changed
+            if self._httpx_client is None:
+                self._httpx_client = pooled_http_client(self.timeout)
+            config = ClientConfig(httpx_client=self._httpx_client, streaming=True)
+            cached = self._clients[url] = (card, ClientFactory(config).create(card))
+            logger.info(f"Created A2A client for '{card.name}' at {url} (streaming={card.capabilities.streaming})")
+        return cached[1]
+
+
+def _text(parts: list[Part]) -> str:
+    return "".join(part.root.text for part in parts if isinstance(part.root, TextPart))
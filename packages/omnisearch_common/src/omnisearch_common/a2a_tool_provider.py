@@ -0,0 +1,22 @@
+import httpx
+from a2a.types import AgentCard
+from strands_tools.a2a_client import A2AClientToolProvider
+
+from omnisearch_common.agent_cards import agent_card_registry
+from omnisearch_common.http_transport import pooled_http_client
+
+
+class PooledA2AClientToolProvider(A2AClientToolProvider):
+    """`A2AClientToolProvider` backed by the shared agent card registry and connection pool."""
+
+    async def _ensure_httpx_client(self) -> httpx.AsyncClient:
+        if self._httpx_client is None:
+            self._httpx_client = pooled_http_client(self.timeout)
+        return self._httpx_client
+
+    async def _discover_agent_card(self, url: str) -> AgentCard:
+        # Always ask the registry, which revalidates cards in the background, so a
+        # redeployed agent's new card replaces the one this provider saw first.
+        card = await agent_card_registry.get(url)
+        self._discovered_agents[url] = card
+        return card
@@ -0,0 +1,235 @@
+import asyncio
+import json
+import logging
+import math
+import os
+import time
+from dataclasses import asdict, dataclass
+from typing import Any
+
+from starlette.responses import JSONResponse
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from omnisearch_common.deadline import DEADLINE_KEY, extract_deadline
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_MAX_IN_FLIGHT = int(os.environ.get("A2A_MAX_IN_FLIGHT", "4"))  # concurrent agent runs
+DEFAULT_MAX_QUEUE = int(os.environ.get("A2A_MAX_QUEUE", "16"))
+DEFAULT_MAX_QUEUE_WAIT = float(os.environ.get("A2A_MAX_QUEUE_WAIT", "30"))  # [sec]
+
+SERVICE_TIME_SMOOTHING = 0.2  # weight of the latest run in the moving average
+
+# A2A JSON-RPC methods that start an agent run; tasks/get, tasks/cancel and the like are cheap.
+AGENT_RUN_METHODS = frozenset({"message/send", "message/stream"})
+
+
+@dataclass
+class AdmissionMetrics:
+    admitted: int = 0
+    queued: int = 0  # admitted after waiting
+    rejected_queue_full: int = 0  # 429
+    rejected_deadline: int = 0  # 503: the predicted wait exceeds the wait budget
+    timed_out: int = 0  # 503: waited the whole budget
+    queue_seconds: float = 0.0
+    max_queue_depth: int = 0
+
+
+class Rejected(Exception):
+    def __init__(self, status_code: int, retry_after: float, reason: str):
+        super().__init__(reason)
+        self.status_code = status_code
+        self.retry_after = retry_after
+
+
+class AdmissionControl:
+    """Bounds concurrent agent runs and sheds load early instead of queueing without limit.
+
+    Up to `max_in_flight` runs execute at once; up to `max_queue` more wait in FIFO
+    order for at most `max_queue_wait`, or for what is left of the caller's deadline
+    if that is sooner. A request is rejected right away with 429 when the queue is
+    full, or with 503 when the wait predicted from its queue position and the recent
+    run time already exceeds that wait budget, so callers retry elsewhere or later
+    (per Retry-After) rather than time out in the queue.
+    """
+
+    def __init__(
+        self,
+        max_in_flight: int = DEFAULT_MAX_IN_FLIGHT,
+        max_queue: int = DEFAULT_MAX_QUEUE,
+        max_queue_wait: float = DEFAULT_MAX_QUEUE_WAIT,
+    ):
+        self.max_in_flight = max_in_flight
+        self.max_queue = max_queue
+        self.max_queue_wait = max_queue_wait
+        self.metrics = AdmissionMetrics()
+
+        self.in_flight = 0
+        self.queue_depth = 0
+        self.service_seconds: float | None = None  # moving average of a run's duration
+        self._slots = asyncio.Semaphore(max_in_flight)
+
+    @property
+    def busy(self) -> bool:
+        return self.in_flight >= self.max_in_flight
+
+    def predicted_wait(self, position: int) -> float:
+        """Seconds until the request at queue `position` (1-based) is expected to start."""
+        if self.service_seconds is None:
+            return 0.0
+        return math.ceil(position / self.max_in_flight) * self.service_seconds
+
+    async def acquire(self, timeout: float | None = None) -> None:
+        """Wait for a slot; `timeout` is the seconds the caller has left, if it sent a deadline."""
+        if not self.busy and self.queue_depth == 0:
+            await self._slots.acquire()
+            self._admit()
+            return
+
+        if self.queue_depth >= self.max_queue:
+            self.metrics.rejected_queue_full += 1
+            raise Rejected(429, self.predicted_wait(self.queue_depth + 1), "admission queue is full")
+
+        budget = self.max_queue_wait if timeout is None else min(self.max_queue_wait, timeout)
+        predicted = self.predicted_wait(self.queue_depth + 1)
+        if predicted > budget:
+            self.metrics.rejected_deadline += 1
+            raise Rejected(503, predicted, f"predicted queue wait {predicted:.1f}s exceeds {budget:.1f}s")
+
+        self.queue_depth += 1
+        self.metrics.max_queue_depth = max(self.metrics.max_queue_depth, self.queue_depth)
+        started = time.monotonic()
+        try:
+            await asyncio.wait_for(self._slots.acquire(), budget)
+        except TimeoutError:
+            self.metrics.timed_out += 1
+            raise Rejected(503, self.predicted_wait(self.queue_depth), "timed out in the admission queue") from None
+        finally:
+            self.queue_depth -= 1
+            self.metrics.queue_seconds += time.monotonic() - started
+
+        self.metrics.queued += 1
+        self._admit()
+
+    def release(self, elapsed: float) -> None:
+        self.in_flight -= 1
+        self._slots.release()
+        if self.service_seconds is None:
+            self.service_seconds = elapsed
+        else:
+            self.service_seconds += SERVICE_TIME_SMOOTHING * (elapsed - self.service_seconds)
+
+    def stats(self) -> dict[str, Any]:
+        return {
+            **asdict(self.metrics),
+            "in_flight": self.in_flight,
+            "queue_depth": self.queue_depth,
+            "max_in_flight": self.max_in_flight,
+            "max_queue": self.max_queue,
+            "service_seconds": round(self.service_seconds or 0.0, 3),
+        }
+
+    def _admit(self) -> None:
+        self.in_flight += 1
+        self.metrics.admitted += 1
+
+
+class AdmissionMiddleware:
+    """ASGI middleware that runs A2A calls starting an agent run under an `AdmissionControl`.
+
+    Only the JSON-RPC methods in `AGENT_RUN_METHODS` are queued; a streamed response
+    keeps its slot until the stream ends. Task control calls (`tasks/cancel` must get
+    through when the agent is saturated), agent cards, health checks and other GETs
+    are never queued. A deadline in the message metadata bounds the queue wait, and
+    the time spent queueing is taken off it before the app sees the request.
+    """
+
+    def __init__(self, app: ASGIApp, control: "AdmissionControl"):
+        self.app = app
+        self.control = control
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http" or scope["method"] != "POST":
+            await self.app(scope, receive, send)
+            return
+
+        # The method is in the body, so read it here and hand it to the app again.
+        body = await _read_body(receive)
+        if body is None:
+            return
+        request = _json_rpc_request(body)
+        if request.get("method") not in AGENT_RUN_METHODS:
+            await self.app(scope, _replay(body, receive), send)
+            return
+
+        metadata = _message_metadata(request)
+        timeout = extract_deadline(metadata)
+        queued = time.monotonic()
+        try:
+            await self.control.acquire(timeout)
+        except Rejected as rejected:
+            logger.warning(f"Rejected {scope['path']} with {rejected.status_code}: {rejected} ({self.control.stats()})")
+            response = JSONResponse(
+                {"error": str(rejected)},
+                status_code=rejected.status_code,
+                headers={"Retry-After": str(max(1, math.ceil(rejected.retry_after)))},
+            )
+            await response(scope, receive, send)
+            return
+
+        started = time.monotonic()
+        if timeout is not None:  # pass on what is left of the caller's budget after queueing
+            metadata[DEADLINE_KEY] = round(max(0.0, timeout - (started - queued)), 3)
+            body = json.dumps(request).encode()
+            headers = [(name, value) for name, value in scope["headers"] if name != b"content-length"]
+            scope = {**scope, "headers": headers + [(b"content-length", str(len(body)).encode())]}
+        receive = _replay(body, receive)
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            self.control.release(time.monotonic() - started)
+
+
+async def _read_body(receive: Receive) -> bytes | None:
+    """The request body, or None when the client disconnects before sending all of it."""
+    chunks = []
+    while True:
+        message = await receive()
+        if message["type"] != "http.request":
+            return None
+        chunks.append(message.get("body", b""))
+        if not message.get("more_body", False):
+            return b"".join(chunks)
+
+
+def _replay(body: bytes, receive: Receive) -> Receive:
+    replayed = False
+
+    async def replay() -> Message:
+        nonlocal replayed
+        if replayed:
+            # Later receives report the disconnect, which cancels the run.
+            return await receive()
+        replayed = True
+        return {"type": "http.request", "body": body, "more_body": False}
+
+    return replay
+
+
+def _json_rpc_request(body: bytes) -> dict[str, Any]:
+    try:
+        request = json.loads(body)
+    except ValueError:
+        return {}
+    return request if isinstance(request, dict) else {}
+
+
+def _message_metadata(request: dict[str, Any]) -> dict[str, Any]:
+    """The metadata of the A2A message in a `message/send` or `message/stream` request."""
+    params = request.get("params")
+    message = params.get("message") if isinstance(params, dict) else None
+    metadata = message.get("metadata") if isinstance(message, dict) else None
+    return metadata if isinstance(metadata, dict) else {}
+
+
+admission_control = AdmissionControl()
@@ -0,0 +1,210 @@
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Awaitable, Callable
+
+import httpx
+from a2a.types import AgentCard
+from a2a.utils.constants import AGENT_CARD_WELL_KNOWN_PATH, PREV_AGENT_CARD_WELL_KNOWN_PATH
+from starlette.requests import Request
+from starlette.responses import Response
+
+from omnisearch_common.http_transport import pooled_http_client
+from omnisearch_common.tracing import tracer
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CACHE_PATH = os.environ.get("AGENT_CARD_CACHE_PATH")  # JSON file; unset keeps cards in memory only
+DEFAULT_TTL = float(os.environ.get("AGENT_CARD_TTL", "300"))  # [sec]
+DEFAULT_TIMEOUT = float(os.environ.get("AGENT_CARD_TIMEOUT", "10"))  # [sec]
+DEFAULT_RETRY_AFTER = float(os.environ.get("AGENT_CARD_RETRY_AFTER", "30"))  # [sec] after a failed revalidation
+
+# Where agents serve their card: the current well-known path first, then the one older SDKs use.
+CARD_PATHS = (AGENT_CARD_WELL_KNOWN_PATH, PREV_AGENT_CARD_WELL_KNOWN_PATH)
+
+
+@dataclass
+class _CachedCard:
+    card: AgentCard
+    etag: str | None
+    last_modified: str | None
+    validated_at: float  # time.time(), so entries stay comparable across restarts
+
+
+class AgentCardRegistry:
+    """Agent cards of remote A2A agents by base URL, shared by every client in the process.
+
+    Cards are kept in memory and, when `cache_path` is set, in a JSON file that is
+    loaded on start, so a restarted process serves its first request without
+    waiting on discovery. A card older than `ttl` is still returned at once while
+    a background task revalidates it with If-None-Match / If-Modified-Since; only
+    a changed card is downloaded again. When revalidation fails the cached card
+    is kept and tried again after `retry_after`, not on every lookup. `prefetch`
+    discovers many agents concurrently in the background.
+    """
+
+    def __init__(
+        self,
+        cache_path: str | None = DEFAULT_CACHE_PATH,
+        ttl: float = DEFAULT_TTL,
+        timeout: float = DEFAULT_TIMEOUT,
+        retry_after: float = DEFAULT_RETRY_AFTER,
+    ):
+        self.cache_path = Path(cache_path) if cache_path else None
+        self.ttl = ttl
+        self.timeout = timeout
+        self.retry_after = retry_after
+        self.fetched = 0
+        self.revalidated = 0
+        self.failed_revalidations = 0
+
+        self._cards: dict[str, _CachedCard] = {}
+        self._fetching: dict[str, asyncio.Task] = {}
+        self._http: httpx.AsyncClient | None = None
+        self._save_lock = threading.Lock()
+        self._generation = 0  # of the entries last handed to _write
+        self._written = 0  # generation on disk
+        self._load()
+
+    async def get(self, url: str) -> AgentCard:
+        url = url.rstrip("/")
+        cached = self._cards.get(url)
+        if cached is None:
+            return await self._fetch_once(url)
+        if time.time() - cached.validated_at > self.ttl:
+            self._fetch_once(url)  # stale-while-revalidate
+        return cached.card
+
+    def prefetch(self, urls: list[str]) -> asyncio.Task:
+        """Discover every agent in `urls` concurrently without waiting; failures are logged."""
+        return asyncio.create_task(self.discover(urls))
+
+    async def discover(self, urls: list[str]) -> dict[str, AgentCard | BaseException]:
+        cards = await asyncio.gather(*(self.get(url) for url in urls), return_exceptions=True)
+        for url, card in zip(urls, cards):
+            if isinstance(card, BaseException):
+                logger.warning(f"Failed to discover agent at {url}: {card}")
+        return dict(zip(urls, cards))
+
+    def stats(self) -> dict[str, int]:
+        return {
+            "cards": len(self._cards),
+            "fetched": self.fetched,
+            "revalidated": self.revalidated,
+            "failed_revalidations": self.failed_revalidations,
+        }
+
+    def _fetch_once(self, url: str) -> asyncio.Task:
+        # Concurrent lookups of the same agent share one request.
+        task = self._fetching.get(url)
+        if task is None or task.done() or task.get_loop() is not asyncio.get_running_loop():
+            task = self._fetching[url] = asyncio.create_task(self._fetch(url))
+            task.add_done_callback(lambda done: done.cancelled() or done.exception())
+        return task
+
+    async def _fetch(self, url: str) -> AgentCard:
+        attributes = {"a2a.url": url, "a2a.revalidate": url in self._cards}
+        with tracer.start_as_current_span("a2a.discover_card", attributes=attributes):
+            return await self._download(url)
+
+    async def _download(self, url: str) -> AgentCard:
+        cached = self._cards.get(url)
+        headers = {}
+        if cached is not None and cached.etag:
+            headers["If-None-Match"] = cached.etag
+        if cached is not None and cached.last_modified:
+            headers["If-Modified-Since"] = cached.last_modified
+
+        try:
+            for path in CARD_PATHS:
+                response = await self._client().get(f"{url}{path}", headers=headers)
+                if response.status_code != 404:
+                    break
+            if cached is not None and response.status_code == 304:
+                self.revalidated += 1
+                cached.validated_at = time.time()
+                await self._save()
+                return cached.card
+            response.raise_for_status()
+            card = AgentCard.model_validate(response.json())
+        except Exception as e:
+            if cached is not None:
+                logger.warning(f"Revalidating the agent card of {url} failed, keeping the cached one: {e}")
+                self.failed_revalidations += 1
+                # Stale again in `retry_after`; not saved, the card was not validated.
+                cached.validated_at = time.time() - max(0.0, self.ttl - self.retry_after)
+                return cached.card
+            raise
+
+        self.fetched += 1
+        self._cards[url] = _CachedCard(
+            card, response.headers.get("etag"), response.headers.get("last-modified"), time.time()
+        )
+        await self._save()
+        logger.info(f"Discovered agent card '{card.name}' at {url}")
+        return card
+
+    def _client(self) -> httpx.AsyncClient:
+        if self._http is None:
+            self._http = pooled_http_client(self.timeout)
+        return self._http
+
+    def _load(self) -> None:
+        if self.cache_path is None or not self.cache_path.exists():
+            return
+        try:
+            entries = json.loads(self.cache_path.read_text())
+            for url, entry in entries.items():
+                card = AgentCard.model_validate(entry["card"])
+                self._cards[url] = _CachedCard(card, entry["etag"], entry["last_modified"], entry["validated_at"])
+        except (OSError, ValueError, KeyError) as e:
+            logger.warning(f"Ignoring unreadable agent card cache {self.cache_path}: {e}")
+            self._cards.clear()
+        logger.info(f"Loaded {len(self._cards)} agent cards from {self.cache_path}")
+
+    async def _save(self) -> None:
+        if self.cache_path is None:
+            return
+        self._generation += 1
+        entries = {
+            url: {
+                "card": cached.card.model_dump(mode="json", exclude_none=True),
+                "etag": cached.etag,
+                "last_modified": cached.last_modified,
+                "validated_at": cached.validated_at,
+            }
+            for url, cached in self._cards.items()
+        }
+        await asyncio.to_thread(self._write, entries, self._generation)
+
+    def _write(self, entries: dict[str, dict], generation: int) -> None:
+        with self._save_lock:
+            if generation < self._written:  # a newer snapshot is on disk already
+                return
+            self._written = generation
+            self.cache_path.parent.mkdir(parents=True, exist_ok=True)
+            temporary = self.cache_path.with_suffix(".tmp")
+            temporary.write_text(json.dumps(entries, ensure_ascii=False))
+            os.replace(temporary, self.cache_path)
+
+
+agent_card_registry = AgentCardRegistry()
+
+
+async def agent_card_etag(request: Request, call_next: Callable[[Request], Awaitable[Response]]) -> Response:
+    """HTTP middleware that gives the served agent card an ETag and answers revalidation with 304."""
+    response = await call_next(request)
+    if request.method != "GET" or not request.url.path.endswith(CARD_PATHS) or response.status_code != 200:
+        return response
+
+    body = b"".join([chunk async for chunk in response.body_iterator])
+    etag = f'"{hashlib.sha256(body).hexdigest()[:32]}"'
+    if etag in request.headers.get("if-none-match", ""):
+        return Response(status_code=304, headers={"etag": etag})
+    return Response(body, status_code=200, headers={**response.headers, "etag": etag})
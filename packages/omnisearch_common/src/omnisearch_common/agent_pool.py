@@ -0,0 +1,111 @@
+import logging
+import os
+import threading
+import time
+from collections import deque
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator
+
+from strands import Agent
+
+from omnisearch_common.agent_template import AgentTemplate
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_POOL_SIZE = int(os.environ.get("AGENT_POOL_SIZE", "4"))  # agents kept ready
+DEFAULT_IDLE_TTL = float(os.environ.get("AGENT_POOL_IDLE_TTL", "300"))  # [sec]
+
+
+class AgentPool:
+    """Agents built from one `AgentTemplate`, each checked out by one task at a time.
+
+    `size` agents are created up front. They share the template's model client and
+    tools but each has its own message history, so concurrent tasks never contend
+    on one agent. When every agent is busy another one is created rather than
+    making the task wait, and agents beyond `size` that stay idle for `idle_ttl`
+    are dropped again: on checkout, on check-in, and by a background thread that
+    runs only while surplus agents are idle, so a pool that goes quiet after a
+    burst shrinks too. A returned agent is reset to the template's starting state.
+    """
+
+    def __init__(self, template: AgentTemplate, size: int = DEFAULT_POOL_SIZE, idle_ttl: float = DEFAULT_IDLE_TTL):
+        self.template = template
+        self.size = size
+        self.idle_ttl = idle_ttl
+        self.created = 0
+        self.dropped = 0
+        self.in_use = 0
+        self.peak_in_use = 0
+
+        self._idle: deque[tuple[Agent, float]] = deque()  # (agent, returned at), oldest first
+        self._lock = threading.Lock()
+        self._trimmer: threading.Thread | None = None
+        for _ in range(size):
+            self._idle.append((self._create(), time.monotonic()))
+
+    @asynccontextmanager
+    async def agent(self) -> AsyncIterator[Agent]:
+        """Check out an agent for the duration of the block."""
+        agent = self._checkout()
+        try:
+            yield agent
+        finally:
+            self._checkin(agent)
+
+    def stats(self) -> dict[str, Any]:
+        return {
+            "idle": len(self._idle),
+            "in_use": self.in_use,
+            "peak_in_use": self.peak_in_use,
+            "created": self.created,
+            "dropped": self.dropped,
+        }
+
+    def _checkout(self) -> Agent:
+        with self._lock:
+            # Most recently returned first, so surplus agents stay idle long enough to expire.
+            agent = self._idle.pop()[0] if self._idle else None
+            self._trim(time.monotonic())
+            self.in_use += 1
+            self.peak_in_use = max(self.peak_in_use, self.in_use)
+        if agent is None:
+            agent = self._create()
+            logger.info(f"All {self.in_use - 1} '{self.template.name}' agents are busy, created another")
+        return agent
+
+    def _checkin(self, agent: Agent) -> None:
+        self.template.reset(agent)
+        now = time.monotonic()
+        with self._lock:
+            self.in_use -= 1
+            self._idle.append((agent, now))
+            self._trim(now)
+            if len(self._idle) > self.size and self._trimmer is None:
+                self._trimmer = threading.Thread(
+                    target=self._trim_loop, name=f"{self.template.name}-agent-pool-trim", daemon=True
+                )
+                self._trimmer.start()
+
+    def _trim(self, now: float) -> None:
+        # Caller holds self._lock. The oldest idle agents are dropped first.
+        while len(self._idle) > self.size and now - self._idle[0][1] > self.idle_ttl:
+            self._idle.popleft()
+            self.dropped += 1
+
+    def _trim_loop(self) -> None:
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._trim(now)
+                if len(self._idle) <= self.size:
+                    self._trimmer = None
+                    return
+                delay = self.idle_ttl - (now - self._idle[0][1])
+            # Woken when the oldest surplus agent expires.
+            time.sleep(max(delay, 0) + 0.01)
+
+    def _create(self) -> Agent:
+        agent = self.template.create()
+        with self._lock:
+            self.created += 1
+        return agent
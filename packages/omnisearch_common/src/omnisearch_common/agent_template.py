@@ -0,0 +1,83 @@
+import logging
+import os
+import threading
+from collections import deque
+
+from strands import Agent
+from strands.agent.state import AgentState
+from strands.telemetry.metrics import EventLoopMetrics
+from strands.types.content import Messages
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_HISTORY_TURNS = int(os.environ.get("OMNISEARCH_HISTORY_TURNS", "0"))
+
+
+class AgentTemplate:
+    """Builds a fresh Agent per request from a configuration validated once.
+
+    The template agent is constructed at import time so that tool specs and model
+    configuration are checked up front. `create()` then hands out new agents that
+    share the model client and tool instances but own their message history, so
+    concurrent requests never interleave and no request pays for earlier ones.
+
+    With `history_turns > 0` the last N (query, answer) pairs are replayed into each
+    new agent, giving a bounded shared memory instead of an ever-growing one.
+    """
+
+    def __init__(self, *, history_turns: int = DEFAULT_HISTORY_TURNS, **agent_kwargs):
+        self._agent_kwargs = {"callback_handler": None, **agent_kwargs}
+        self._template = Agent(**self._agent_kwargs)
+        self._tools = list(self._template.tool_registry.registry.values())
+
+        self.history_turns = history_turns
+        self._history: deque[tuple[str, str]] = deque(maxlen=max(history_turns, 1))
+        self._lock = threading.Lock()
+
+    @property
+    def name(self) -> str:
+        return self._template.name
+
+    @property
+    def description(self) -> str | None:
+        return self._template.description
+
+    @property
+    def agent(self) -> Agent:
+        """The validated template agent, e.g. to describe in an A2A agent card. Never invoke it."""
+        return self._template
+
+    def create(self) -> Agent:
+        return Agent(
+            **{
+                **self._agent_kwargs,
+                "model": self._template.model,
+                "tools": self._tools,
+                "messages": self._history_messages(),
+            }
+        )
+
+    def reset(self, agent: Agent) -> None:
+        """Return an agent this template created to the state `create()` hands out, for reuse."""
+        agent.messages = self._history_messages()
+        agent.state = AgentState()
+        agent.event_loop_metrics = EventLoopMetrics()  # its per-cycle traces would grow without bound
+
+    def remember(self, query: str, answer: str) -> None:
+        if self.history_turns <= 0 or not answer:
+            return
+        with self._lock:
+            self._history.append((query, answer))
+
+    def _history_messages(self) -> Messages:
+        if self.history_turns <= 0:
+            return []
+
+        with self._lock:
+            turns = list(self._history)
+
+        messages: Messages = []
+        for query, answer in turns:
+            messages.append({"role": "user", "content": [{"text": query}]})
+            messages.append({"role": "assistant", "content": [{"text": answer}]})
+        return messages
@@ -0,0 +1,362 @@
+import asyncio
+import logging
+import os
+import random
+import threading
+import time
+from collections import deque
+from contextvars import ContextVar
+from typing import Any, AsyncGenerator, AsyncIterator, Callable, Type, TypeVar
+
+from botocore.eventstream import EventStream
+from botocore.exceptions import ClientError, ConnectionError, ReadTimeoutError
+from opentelemetry.trace import Span, Status, StatusCode
+from pydantic import BaseModel
+from strands.event_loop import streaming
+from strands.models import BedrockModel, Model
+from strands.tools import convert_pydantic_to_tool_spec
+from strands.types.content import Messages
+from strands.types.exceptions import ModelThrottledException
+from strands.types.streaming import StreamEvent
+from strands.types.tools import ToolSpec
+
+from omnisearch_common.prompt_cache import cached_bedrock_model, record_model_usage
+from omnisearch_common.tracing import tracer
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T", bound=BaseModel)
+
+DEFAULT_MAX_ATTEMPTS = int(os.environ.get("BEDROCK_MAX_ATTEMPTS", "4"))  # per model in the chain
+DEFAULT_BASE_DELAY = float(os.environ.get("BEDROCK_RETRY_BASE_DELAY", "0.5"))  # [sec]
+DEFAULT_MAX_DELAY = float(os.environ.get("BEDROCK_RETRY_MAX_DELAY", "8"))  # [sec]
+DEFAULT_REQUESTS_PER_MINUTE = float(os.environ.get("BEDROCK_REQUESTS_PER_MINUTE", "200"))  # per model ID; 0 disables
+DEFAULT_BURST = int(os.environ.get("BEDROCK_BURST", "20"))
+
+# Set to e.g. 0.95 to send a second, hedged request when the first has not produced
+# its first event within that percentile of recent time-to-first-event.
+DEFAULT_HEDGE_PERCENTILE = float(os.environ.get("BEDROCK_HEDGE_PERCENTILE", "0"))
+HEDGE_MIN_SAMPLES = 20
+LATENCY_WINDOW = 200  # recent time-to-first-event samples kept per model ID
+
+# Models the specialists fall back to, in order, once their own model keeps failing.
+# A specialist's own model is skipped, so the Nova Lite specialist falls back to Nova Micro.
+SPECIALIST_FALLBACK_MODELS = [
+    model_id
+    for model_id in os.environ.get(
+        "BEDROCK_SPECIALIST_FALLBACK_MODELS", "apac.amazon.nova-lite-v1:0,apac.amazon.nova-micro-v1:0"
+    ).split(",")
+    if model_id
+]
+
+RETRYABLE_ERROR_CODES = {
+    "ServiceUnavailableException",
+    "InternalServerException",
+    "ModelNotReadyException",
+    "ModelTimeoutException",
+}
+
+
+class TokenBucket:
+    """Request-rate limiter: `rate` requests per second on average, bursts of up to `capacity`."""
+
+    def __init__(self, rate: float, capacity: int):
+        self.rate = rate
+        self.capacity = capacity
+        self._tokens = float(capacity)
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()  # buckets are shared by agents running on other threads' loops
+
+    async def acquire(self) -> float:
+        """Take one token, waiting for it if the bucket is empty; returns the seconds waited."""
+        if self.rate <= 0:
+            return 0.0
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            self._tokens -= 1  # may go negative: later callers queue behind this one
+            wait = -self._tokens / self.rate if self._tokens < 0 else 0.0
+        if wait:
+            await asyncio.sleep(wait)
+        return wait
+
+
+_buckets: dict[str, TokenBucket] = {}
+_latencies: dict[str, deque[float]] = {}
+
+
+def rate_limiter(model_id: str) -> TokenBucket:
+    if model_id not in _buckets:
+        _buckets[model_id] = TokenBucket(DEFAULT_REQUESTS_PER_MINUTE / 60, DEFAULT_BURST)
+    return _buckets[model_id]
+
+
+def is_retryable(error: BaseException) -> bool:
+    if isinstance(error, (ModelThrottledException, ConnectionError, ReadTimeoutError)):
+        return True
+    return isinstance(error, ClientError) and error.response["Error"]["Code"] in RETRYABLE_ERROR_CODES
+
+
+class StreamAbandoned(Exception):
+    """Raised on a model's reader thread to stop reading a stream nobody consumes anymore."""
+
+
+class ModelChainExhausted(Exception):
+    """Every model of a `ResilientModel` chain failed with retryable errors, each `max_attempts` times.
+
+    Deliberately not a `ModelThrottledException`: the strands event loop would retry
+    the whole chain again up to six times, backing off for minutes.
+    """
+
+
+# Set by CancellableBedrockModel.stream for the reader thread, which runs in a copy of the context.
+_abandoned: ContextVar[threading.Event | None] = ContextVar("bedrock_stream_abandoned", default=None)
+# Set by CancellableBedrockModel._stream on the reader thread: the response streams its call opened.
+_response_streams: ContextVar[list[EventStream] | None] = ContextVar("bedrock_response_streams", default=None)
+
+
+def _capture_response_stream(parsed: dict[str, Any], **kwargs: Any) -> None:
+    streams = _response_streams.get()
+    if streams is not None and isinstance(parsed.get("stream"), EventStream):
+        streams.append(parsed["stream"])
+
+
+class CancellableBedrockModel(BedrockModel):
+    """BedrockModel that stops generating as soon as its stream is abandoned.
+
+    BedrockModel reads the response stream on a worker thread that keeps reading,
+    and Bedrock keeps generating and billing, after the consumer was cancelled, e.g.
+    because the request's deadline passed or its client disconnected. Here the thread
+    gives up at the next event and closes the response stream, dropping the
+    connection so that Bedrock stops generating.
+    """
+
+    def __init__(self, *args: Any, **kwargs: Any):
+        super().__init__(*args, **kwargs)
+        # Runs on the reader thread inside converse_stream, so it sees that thread's context.
+        self.client.meta.events.register(
+            "after-call.bedrock-runtime.ConverseStream",
+            _capture_response_stream,
+            unique_id="omnisearch-capture-response-stream",
+        )
+
+    async def stream(self, *args: Any, **kwargs: Any) -> AsyncGenerator[StreamEvent, None]:
+        abandoned = threading.Event()
+        _abandoned.set(abandoned)
+        completed = False
+        try:
+            async for event in super().stream(*args, **kwargs):
+                yield event
+            completed = True
+        finally:
+            if not completed:
+                abandoned.set()
+
+    def _stream(self, callback: Callable[..., None], *args: Any, **kwargs: Any) -> None:
+        abandoned = _abandoned.get()
+
+        def guarded_callback(event: StreamEvent | None = None) -> None:
+            if event is not None and abandoned is not None and abandoned.is_set():
+                raise StreamAbandoned()
+            callback(event)
+
+        streams: list[EventStream] = []
+        _response_streams.set(streams)
+        try:
+            super()._stream(guarded_callback, *args, **kwargs)
+        except StreamAbandoned:
+            for stream in streams:
+                stream.close()
+            logger.info(f"Abandoned a {self.config['model_id']} stream")
+
+
+class ResilientModel(Model):
+    """Drop-in model over a chain of Bedrock models that rides out throttling and stalls.
+
+    Each model ID has its own token bucket. A request that fails with a throttling
+    or transient error before producing any output is retried with jittered
+    exponential backoff; once `max_attempts` are used up it moves on to the next
+    model of the chain, and when the last one fails too, `ModelChainExhausted` is
+    raised so callers do not retry on top. Output that has started streaming is
+    never retried. With `hedge_percentile` set, a second request is raised when the
+    first is slower to start than that percentile of recent requests, and whichever
+    starts first wins.
+    """
+
+    def __init__(
+        self,
+        models: list[BedrockModel],
+        max_attempts: int = DEFAULT_MAX_ATTEMPTS,
+        base_delay: float = DEFAULT_BASE_DELAY,
+        max_delay: float = DEFAULT_MAX_DELAY,
+        hedge_percentile: float = DEFAULT_HEDGE_PERCENTILE,
+    ):
+        self.models = models
+        self.max_attempts = max_attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.hedge_percentile = hedge_percentile
+
+    @property
+    def config(self) -> dict[str, Any]:
+        return self.models[0].config
+
+    def update_config(self, **model_config: Any) -> None:
+        self.models[0].update_config(**model_config)
+
+    def get_config(self) -> Any:
+        return self.models[0].get_config()
+
+    async def stream(
+        self,
+        messages: Messages,
+        tool_specs: list[ToolSpec] | None = None,
+        system_prompt: str | None = None,
+        **kwargs: Any,
+    ) -> AsyncGenerator[StreamEvent, None]:
+        # Not made current: the caller's code runs between the yields of this generator.
+        span = tracer.start_span("bedrock.stream", attributes={"gen_ai.request.model": self.config["model_id"]})
+        started = time.perf_counter()
+        first_token = False
+        try:
+            async for event in self._stream(span, messages, tool_specs, system_prompt, kwargs):
+                if not first_token and "contentBlockDelta" in event:
+                    first_token = True
+                    span.set_attribute("bedrock.time_to_first_token_ms", round((time.perf_counter() - started) * 1000))
+                yield event
+        except Exception as e:
+            span.record_exception(e)
+            span.set_status(Status(StatusCode.ERROR, str(e)))
+            raise
+        finally:
+            span.set_attribute("bedrock.generation_ms", round((time.perf_counter() - started) * 1000))
+            span.end()
+
+    async def _stream(
+        self,
+        span: Span,
+        messages: Messages,
+        tool_specs: list[ToolSpec] | None,
+        system_prompt: str | None,
+        kwargs: dict[str, Any],
+    ) -> AsyncGenerator[StreamEvent, None]:
+        error: BaseException | None = None
+        attempts = 0
+        for model in self.models:
+            model_id = model.config["model_id"]
+            for attempt in range(self.max_attempts):
+                await rate_limiter(model_id).acquire()
+                attempts += 1
+                span.set_attribute("bedrock.attempts", attempts)
+                try:
+                    events, first = await self._start(span, model, messages, tool_specs, system_prompt, kwargs)
+                except Exception as e:
+                    if not is_retryable(e):
+                        raise
+                    error = e
+                    if attempt + 1 < self.max_attempts:
+                        delay = random.uniform(0, min(self.max_delay, self.base_delay * 2**attempt))
+                        logger.warning(f"{model_id} failed ({type(e).__name__}), retrying in {delay:.2f}s: {e}")
+                        await asyncio.sleep(delay)
+                    continue
+
+                span.set_attribute("gen_ai.response.model", model_id)
+                if model is not self.models[0]:
+                    logger.warning(f"Answered by fallback model {model_id}")
+                if first is None:  # empty stream
+                    return
+                yield first  # messageStart; usage comes in the closing metadata event
+                async for event in events:
+                    if "metadata" in event:  # so the call is priced as the model that answered it
+                        record_model_usage(model_id, event["metadata"]["usage"])
+                    yield event
+                return
+
+            if model is not self.models[-1]:
+                logger.warning(f"{model_id} failed {self.max_attempts} times, falling back to the next model")
+        raise ModelChainExhausted(f"{len(self.models)} models failed {attempts} attempts, last: {error}") from error
+
+    async def structured_output(
+        self, output_model: Type[T], prompt: Messages, system_prompt: str | None = None, **kwargs: Any
+    ) -> AsyncGenerator[dict[str, T | Any], None]:
+        # Same as BedrockModel.structured_output, on top of the resilient stream.
+        tool_spec = convert_pydantic_to_tool_spec(output_model)
+        response = self.stream(prompt, [tool_spec], system_prompt, tool_choice={"any": {}}, **kwargs)
+        async for event in streaming.process_stream(response):
+            yield event
+
+        stop_reason, messages, _, _ = event["stop"]
+        if stop_reason != "tool_use":
+            raise ValueError(f'Model returned stop_reason: {stop_reason} instead of "tool_use".')
+        for block in messages["content"]:
+            if block.get("toolUse") and block["toolUse"]["name"] == tool_spec["name"]:
+                yield {"output": output_model(**block["toolUse"]["input"])}
+                return
+        raise ValueError("No valid tool use or tool use input was found in the Bedrock response.")
+
+    async def _start(
+        self,
+        span: Span,
+        model: BedrockModel,
+        messages: Messages,
+        tool_specs: list[ToolSpec] | None,
+        system_prompt: str | None,
+        kwargs: dict[str, Any],
+    ) -> tuple[AsyncIterator[StreamEvent], StreamEvent | None]:
+        """Open a stream and wait for its first event, hedging a slow start if enabled."""
+        model_id = model.config["model_id"]
+
+        async def first_event() -> tuple[AsyncIterator[StreamEvent], StreamEvent | None, float]:
+            started = time.monotonic()
+            events = model.stream(messages, tool_specs, system_prompt, **kwargs)
+            first = await anext(events, None)
+            return events, first, time.monotonic() - started
+
+        primary = asyncio.create_task(first_event())
+        threshold = self._hedge_threshold(model_id)
+        tasks = {primary}
+        done: set[asyncio.Task] = set()
+        if threshold is not None:
+            done, _ = await asyncio.wait(tasks, timeout=threshold)
+            if not done:
+                await rate_limiter(model_id).acquire()
+                logger.info(f"{model_id} has not started after {threshold:.2f}s, sending a hedged request")
+                span.add_event("hedged_request", {"bedrock.hedge_threshold_ms": round(threshold * 1000)})
+                tasks.add(asyncio.create_task(first_event()))
+
+        try:
+            while True:
+                done, pending = await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
+                winner = next((task for task in done if task.exception() is None), None)
+                if winner is not None or not pending:
+                    break
+                tasks = pending  # the other request failed; keep waiting for the hedge
+        finally:
+            for task in tasks - done:
+                task.cancel()
+
+        if winner is None:
+            raise next(iter(done)).exception()
+        for task in done - {winner}:
+            if task.exception() is None:
+                await task.result()[0].aclose()
+
+        events, first, latency = winner.result()
+        _latencies.setdefault(model_id, deque(maxlen=LATENCY_WINDOW)).append(latency)
+        return events, first
+
+    def _hedge_threshold(self, model_id: str) -> float | None:
+        samples = _latencies.get(model_id)
+        if not self.hedge_percentile or samples is None or len(samples) < HEDGE_MIN_SAMPLES:
+            return None
+        ordered = sorted(samples)
+        return ordered[min(len(ordered) - 1, int(len(ordered) * self.hedge_percentile))]
+
+
+def resilient_bedrock_model(model_id: str, fallbacks: list[str] | None = None, **model_config) -> ResilientModel:
+    """A `ResilientModel` over `model_id` and then each of `fallbacks`, prompt-cached and cancellable."""
+    chain = [model_id] + [fallback for fallback in fallbacks or [] if fallback != model_id]
+    return ResilientModel(
+        [cached_bedrock_model(chain_id, CancellableBedrockModel, **model_config) for chain_id in chain]
+    )
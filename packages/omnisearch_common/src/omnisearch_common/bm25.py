@@ -0,0 +1,73 @@
+import math
+import re
+import unicodedata
+from collections import Counter
+
+K1 = 1.2
+B = 0.75
+
+# Japanese and Chinese are written without spaces. A katakana run is usually one loanword;
+# kanji and hiragana runs are split into overlapping bigrams. Everything else is split into words.
+TERM = re.compile(r"[\u30a0-\u30ff]+|(?P<bigrams>[\u3400-\u4dbf\u4e00-\u9fff\uf900-\ufaff]+|[\u3040-\u309f]+)|\w+")
+HIRAGANA = re.compile(r"[\u3040-\u309f]+")
+
+# Function words that say how a question is asked rather than what it is about.
+STOPWORDS = frozenset(
+    """
+    a about all also an and any are as at be been but by can could do does doing for from get had has have how
+    i if in into is it its me more my no not of on or our should so some such than that the their them then there
+    these they this those to use used using was we what when where which while who why will with would you your
+    """.split()
+)
+
+
+def tokenize(text: str) -> list[str]:
+    terms = []
+    for match in TERM.finditer(unicodedata.normalize("NFKC", text).casefold()):
+        run = match.group()
+        if match.lastgroup == "bigrams" and len(run) > 1:
+            terms.extend(run[i : i + 2] for i in range(len(run) - 1))
+        else:
+            terms.append(run)
+    return terms
+
+
+def is_stopword(term: str) -> bool:
+    # Hiragana-only terms are particles and inflections (の, です, ください).
+    return term in STOPWORDS or HIRAGANA.fullmatch(term) is not None
+
+
+def content_terms(terms: list[str]) -> list[str]:
+    """`terms` without stopwords, or all of them when nothing else is left."""
+    return [term for term in terms if not is_stopword(term)] or terms
+
+
+def idf(document_count: int, document_frequency: int) -> float:
+    return math.log(1 + (document_count - document_frequency + 0.5) / (document_frequency + 0.5))
+
+
+def term_score(term_frequency: int, document_length: int, average_length: float, term_idf: float) -> float:
+    norm = K1 * (1 - B + B * document_length / average_length) if average_length else K1
+    return term_idf * term_frequency * (K1 + 1) / (term_frequency + norm)
+
+
+class BM25:
+    """Okapi BM25 over a small in-memory corpus of tokenized documents."""
+
+    def __init__(self, documents: list[list[str]]):
+        self.term_frequencies = [Counter(document) for document in documents]
+        self.lengths = [len(document) for document in documents]
+        self.average_length = sum(self.lengths) / len(documents) if documents else 0.0
+        self.document_frequencies = Counter(term for counts in self.term_frequencies for term in counts)
+
+    def scores(self, query_terms: list[str]) -> list[float]:
+        terms = set(query_terms)
+        idfs = {term: idf(len(self.lengths), self.document_frequencies[term]) for term in terms}
+        return [
+            sum(
+                term_score(counts[term], length, self.average_length, idfs[term])
+                for term in terms
+                if term in counts
+            )
+            for counts, length in zip(self.term_frequencies, self.lengths)
+        ]
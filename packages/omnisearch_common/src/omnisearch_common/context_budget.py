@@ -0,0 +1,146 @@
+import logging
+import os
+import re
+from dataclasses import dataclass
+from itertools import pairwise
+
+from strands.hooks import AfterToolCallEvent, HookProvider, HookRegistry
+
+from omnisearch_common.bm25 import BM25, tokenize
+
+logger = logging.getLogger(__name__)
+
+# MCP tools whose result is the (markdown) content of a documentation page.
+DOCUMENT_TOOLS = {"aws___read_documentation", "microsoft_docs_fetch"}
+
+DEFAULT_BUDGET_TOKENS = int(os.environ.get("CONTEXT_BUDGET_TOKENS", "4000"))
+DEFAULT_SECTION_TOKENS = int(os.environ.get("CONTEXT_SECTION_TOKENS", "600"))
+CHARS_PER_TOKEN = 4  # rough estimate, good enough to size a budget
+
+HEADING = re.compile(r"^#{1,6}\s")
+FENCE = re.compile(r"^\s*(```|~~~)")
+
+
+@dataclass
+class Section:
+    start: int
+    end: int
+
+
+def split_sections(text: str, max_chars: int) -> list[Section]:
+    """Split markdown at headings (outside code fences), then oversized sections at paragraph breaks."""
+    boundaries = [0]
+    offset = 0
+    in_fence = False
+    for line in text.splitlines(keepends=True):
+        if FENCE.match(line):
+            in_fence = not in_fence
+        elif not in_fence and offset > 0 and HEADING.match(line):
+            boundaries.append(offset)
+        offset += len(line)
+    boundaries.append(len(text))
+
+    sections = []
+    for start, end in pairwise(boundaries):
+        while end - start > max_chars:
+            cut = text.rfind("\n\n", start + 1, start + max_chars)
+            cut = cut + 2 if cut > start else start + max_chars
+            sections.append(Section(start, cut))
+            start = cut
+        if end > start:
+            sections.append(Section(start, end))
+    return sections
+
+
+class ContextBudget(HookProvider):
+    """Trims fetched documentation pages to the sections most relevant to the query.
+
+    Runs after each document tool call, before the result reaches the model. Pages
+    over `budget_tokens` are split into sections and ranked with BM25 against the
+    request and the search phrases the agent has used so far; the best sections are
+    kept up to the budget and forwarded in page order, each marked with its
+    character offsets in the page so quotes stay verbatim and the rest can be read
+    with `start_index`.
+    """
+
+    def __init__(self, budget_tokens: int = DEFAULT_BUDGET_TOKENS, section_tokens: int = DEFAULT_SECTION_TOKENS):
+        self.budget_chars = budget_tokens * CHARS_PER_TOKEN
+        self.section_chars = min(section_tokens * CHARS_PER_TOKEN, self.budget_chars)
+
+    def register_hooks(self, registry: HookRegistry, **kwargs) -> None:
+        registry.add_callback(AfterToolCallEvent, self._after_tool_call)
+
+    def trim(self, text: str, query: str, base_offset: int = 0) -> str:
+        if len(text) <= self.budget_chars:
+            return text
+
+        sections = split_sections(text, self.section_chars)
+        scores = BM25([tokenize(text[section.start : section.end]) for section in sections]).scores(tokenize(query))
+
+        ranked = sorted((i for i, score in enumerate(scores) if score > 0), key=lambda i: -scores[i])
+        if not ranked:  # nothing matches (e.g. the query is in another language): keep the beginning
+            ranked = list(range(len(sections)))
+
+        selected = []
+        used = 0
+        for i in ranked:
+            size = sections[i].end - sections[i].start
+            if used + size <= self.budget_chars:
+                selected.append(i)
+                used += size
+        selected.sort()
+
+        parts = [
+            f"[Showing {len(selected)} of {len(sections)} sections ({used} of {len(text)} characters) "
+            f"most relevant to the query. Offsets are character positions in the page; "
+            f"read from start_index to see more.]"
+        ]
+        for i in selected:
+            section = sections[i]
+            parts.append(
+                f"<!-- characters {base_offset + section.start}-{base_offset + section.end} -->\n"
+                + text[section.start : section.end].strip("\n")
+            )
+        return "\n\n".join(parts)
+
+    def _after_tool_call(self, event: AfterToolCallEvent) -> None:
+        name = event.tool_use["name"]
+        if name not in DOCUMENT_TOOLS or event.result.get("status") != "success":
+            return
+
+        query = _query_text(event.agent.messages)
+        base_offset = event.tool_use["input"].get("start_index") or 0
+
+        content = []
+        for block in event.result["content"]:
+            if "text" in block:
+                trimmed = self.trim(block["text"], query, base_offset)
+                if len(trimmed) < len(block["text"]):
+                    logger.info(f"Trimmed {name} result from {len(block['text'])} to {len(trimmed)} characters")
+                block = {**block, "text": trimmed}
+            content.append(block)
+        event.result = {**event.result, "content": content}
+
+
+def _query_text(messages: list) -> str:
+    # The current request is the last user message with text (tool results are
+    # user messages too); every string argument of the tool calls made since then,
+    # e.g. search phrases, sharpens the query, which helps when the request is in
+    # another language than the documentation.
+    parts = []
+    for message in reversed(messages):
+        for block in message["content"]:
+            if "toolUse" in block:
+                parts.extend(
+                    value
+                    for value in block["toolUse"]["input"].values()
+                    if isinstance(value, str) and "://" not in value
+                )
+        texts = [block["text"] for block in message["content"] if "text" in block]
+        if message["role"] == "user" and texts:
+            parts.extend(texts)
+            break
+    return "\n".join(parts)
+
+
+context_budget = ContextBudget()
@@ -0,0 +1,60 @@
+import asyncio
+import time
+from contextlib import asynccontextmanager, contextmanager
+from contextvars import ContextVar
+from typing import Any, Mapping
+
+# Key of A2A message metadata and MCP request `_meta` under which a caller sends the
+# seconds it has left. The budget is relative so hosts need not agree on the time;
+# every layer passes on what remains after its own elapsed time.
+DEADLINE_KEY = "timeout"
+
+# time.monotonic() by which the current request has to be answered, if it has a deadline.
+request_deadline: ContextVar[float | None] = ContextVar("request_deadline", default=None)
+
+
+def remaining() -> float | None:
+    """Seconds left until the current request's deadline, or None without one."""
+    deadline = request_deadline.get()
+    return None if deadline is None else max(0.0, deadline - time.monotonic())
+
+
+@contextmanager
+def deadline_scope(timeout: float | None):
+    """Bring the current deadline forward to `timeout` seconds from now, if that is sooner."""
+    deadline = request_deadline.get()
+    if timeout is not None:
+        deadline = min(deadline or float("inf"), time.monotonic() + timeout)
+    token = request_deadline.set(deadline)
+    try:
+        yield
+    finally:
+        request_deadline.reset(token)
+
+
+@asynccontextmanager
+async def enforce_deadline(timeout: float | None):
+    """Apply `deadline_scope(timeout)` and cancel the block with TimeoutError once it runs out.
+
+    Cancelling the block cancels whatever it awaits: downstream A2A streams, MCP
+    calls and model streams stop instead of running on for a caller that is gone.
+    """
+    with deadline_scope(timeout):
+        async with asyncio.timeout(remaining()):
+            yield
+
+
+def inject_deadline(metadata: dict[str, Any]) -> dict[str, Any]:
+    """Add the current request's remaining budget to outgoing `metadata`, if it has a deadline."""
+    if (left := remaining()) is not None:
+        metadata[DEADLINE_KEY] = round(left, 3)
+    return metadata
+
+
+def extract_deadline(metadata: Mapping[str, Any] | None) -> float | None:
+    """The budget in seconds a caller sent in `metadata`, or None if it sent none."""
+    try:
+        timeout = float((metadata or {})[DEADLINE_KEY])
+    except (KeyError, TypeError, ValueError):
+        return None
+    return max(0.0, timeout)
@@ -0,0 +1,127 @@
+import hashlib
+import os
+import random
+import re
+import unicodedata
+from dataclasses import dataclass, field
+
+DEFAULT_THRESHOLD = float(os.environ.get("NEAR_DUPLICATE_THRESHOLD", "0.8"))  # Jaccard similarity
+DEFAULT_SHINGLE_SIZE = int(os.environ.get("NEAR_DUPLICATE_SHINGLE_SIZE", "5"))  # [tokens]
+DEFAULT_NUM_PERM = int(os.environ.get("NEAR_DUPLICATE_NUM_PERM", "64"))
+
+CHARS_PER_TOKEN = 4  # rough estimate used for reporting savings
+
+# CJK characters are tokens on their own; everything else is split into words.
+TOKEN = re.compile(r"[\u3040-\u30ff\u3400-\u4dbf\u4e00-\u9fff\uf900-\ufaff]|\w+")
+
+
+@dataclass
+class NearDuplicates:
+    blocks: int
+    originals: dict[int, int] = field(default_factory=dict)  # duplicate index -> index of the block kept
+    tokens_saved: int = 0
+
+
+class NearDuplicateDetector:
+    """Finds near-identical text blocks with MinHash signatures and LSH banding.
+
+    Each block is reduced to its set of `shingle_size`-token shingles and a MinHash
+    signature of `num_perm` values. Signatures are split into bands and hashed into
+    buckets, so only blocks sharing a bucket are compared; a candidate is a duplicate
+    when the exact Jaccard similarity of the shingle sets reaches `threshold`. The
+    whole pass is roughly linear in the number of blocks.
+    """
+
+    def __init__(
+        self,
+        threshold: float = DEFAULT_THRESHOLD,
+        shingle_size: int = DEFAULT_SHINGLE_SIZE,
+        num_perm: int = DEFAULT_NUM_PERM,
+        seed: int = 1,
+    ):
+        self.threshold = threshold
+        self.shingle_size = shingle_size
+        self.bands, self.rows = _lsh_parameters(threshold, num_perm)
+
+        rng = random.Random(seed)
+        self._masks = [rng.getrandbits(64) for _ in range(num_perm)]
+
+        self.blocks_seen = 0
+        self.duplicates_found = 0
+        self.tokens_saved = 0
+
+    def find(self, texts: list[str]) -> NearDuplicates:
+        """Map every text that nearly repeats an earlier one to the index of that earlier text."""
+        found = NearDuplicates(len(texts))
+        buckets: dict[tuple[int, tuple[int, ...]], list[int]] = {}
+        shingle_sets: list[set[int]] = []
+
+        for index, text in enumerate(texts):
+            shingles = self.shingles(text)
+            shingle_sets.append(shingles)
+            if not shingles:
+                continue
+
+            signature = self.signature(shingles)
+            keys = [(band, signature[band * self.rows : (band + 1) * self.rows]) for band in range(self.bands)]
+
+            candidates = sorted({candidate for key in keys for candidate in buckets.get(key, ())})
+            original = next(
+                (c for c in candidates if _jaccard(shingles, shingle_sets[c]) >= self.threshold), None
+            )
+            if original is not None:
+                found.originals[index] = original
+                found.tokens_saved += -(-len(text) // CHARS_PER_TOKEN)
+                continue
+
+            for key in keys:
+                buckets.setdefault(key, []).append(index)
+
+        self.blocks_seen += found.blocks
+        self.duplicates_found += len(found.originals)
+        self.tokens_saved += found.tokens_saved
+        return found
+
+    def shingles(self, text: str) -> set[int]:
+        tokens = TOKEN.findall(unicodedata.normalize("NFKC", text).casefold())
+        if not tokens:
+            return set()
+
+        size = min(self.shingle_size, len(tokens))
+        return {
+            int.from_bytes(hashlib.blake2b(" ".join(tokens[i : i + size]).encode(), digest_size=8).digest())
+            for i in range(len(tokens) - size + 1)
+        }
+
+    def signature(self, shingles: set[int]) -> tuple[int, ...]:
+        # One random XOR mask per hash function stands in for a permutation of the
+        # 64-bit shingle hashes; `map` keeps the inner loop in C.
+        return tuple(min(map(mask.__xor__, shingles)) for mask in self._masks)
+
+    def stats(self) -> dict[str, int]:
+        return {
+            "blocks": self.blocks_seen,
+            "duplicates": self.duplicates_found,
+            "tokens_saved": self.tokens_saved,
+        }
+
+
+def _jaccard(a: set[int], b: set[int]) -> float:
+    return len(a & b) / len(a | b)
+
+
+def _lsh_parameters(threshold: float, num_perm: int) -> tuple[int, int]:
+    # Pick bands x rows so that the S-curve's midpoint (1/bands)^(1/rows), the
+    # similarity at which blocks start landing in a shared bucket, sits just
+    # below the threshold: candidates are verified exactly, so erring low only
+    # costs a few comparisons while erring high misses duplicates.
+    best = (num_perm, 1)
+    for rows in range(1, num_perm + 1):
+        bands = num_perm // rows
+        midpoint = (1 / bands) ** (1 / rows)
+        if midpoint <= threshold:
+            best = (bands, rows)
+    return best
+
+
+near_duplicate_detector = NearDuplicateDetector()
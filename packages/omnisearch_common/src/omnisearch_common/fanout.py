@@ -0,0 +1,175 @@
+import asyncio
+import logging
+import os
+import time
+from contextvars import ContextVar
+from dataclasses import dataclass
+from typing import AsyncIterator, Awaitable, Callable, Literal
+
+from omnisearch_common.deadline import enforce_deadline, request_deadline
+from omnisearch_common.result_cache import ResultCache, normalize_query
+from omnisearch_common.results import aggregate, cites_sources, format_markdown, parse_results
+from omnisearch_common.single_flight import SingleFlight
+from omnisearch_common.tracing import tracer
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_SPECIALIST_TIMEOUT = float(os.environ.get("SPECIALIST_TIMEOUT", "120"))  # [sec]
+
+
+@dataclass(frozen=True)
+class Specialist:
+    name: str
+    search: Callable[[str], Awaitable[str]]
+    timeout: float = DEFAULT_SPECIALIST_TIMEOUT
+    cache: ResultCache | None = None
+
+
+@dataclass
+class SpecialistResult:
+    specialist: str
+    status: Literal["ok", "timeout", "error"]
+    content: str = ""
+    elapsed: float = 0.0  # [sec]
+    error: str | None = None
+    cache: str | None = None
+
+
+# A request handler can set this to a list to collect every result fanned out
+# while serving it, e.g. to report per-specialist status in response metadata.
+collected_results: ContextVar[list[SpecialistResult] | None] = ContextVar("collected_results", default=None)
+
+# A request handler can set this to receive specialist output while it is still
+# being generated: `await sink(specialist_name, text)` for every chunk.
+stream_sink: ContextVar[Callable[[str, str], Awaitable[None]] | None] = ContextVar("stream_sink", default=None)
+_streaming_specialist: ContextVar[str] = ContextVar("_streaming_specialist", default="")
+
+# Identical concurrent searches of a specialist run once; see `_search_specialist`.
+specialist_flights: SingleFlight[str] = SingleFlight()
+
+
+async def as_completed(query: str, specialists: list[Specialist]) -> AsyncIterator[SpecialistResult]:
+    """Query every specialist concurrently and yield each result as soon as it lands.
+
+    Each specialist is bounded by its own timeout, and by the request's deadline, so a
+    slow or failing one turns into a `timeout`/`error` result instead of holding up
+    the others. Specialists still running when the caller stops iterating are cancelled.
+    """
+    tasks = [asyncio.create_task(_search(specialist, query)) for specialist in specialists]
+    try:
+        for next_done in asyncio.as_completed(tasks):
+            yield await next_done
+    finally:
+        for task in tasks:
+            task.cancel()
+
+
+async def fan_out(query: str, specialists: list[Specialist]) -> list[SpecialistResult]:
+    """Query every specialist concurrently; results are returned in `specialists` order."""
+    results = {result.specialist: result async for result in as_completed(query, specialists)}
+    ordered = [results[specialist.name] for specialist in specialists]
+
+    if (collected := collected_results.get()) is not None:
+        collected.extend(ordered)
+
+    return ordered
+
+
+async def stream_chunk(text: str) -> None:
+    """Forward a chunk of the running specialist's output to the request's `stream_sink`, if any."""
+    sink = stream_sink.get()
+    if sink is not None and text:
+        await sink(_streaming_specialist.get(), text)
+
+
+def format_results(results: list[SpecialistResult]) -> str:
+    """Merge the specialists' `# Result N` sections into one deduplicated, renumbered answer.
+
+    Runs in plain Python instead of an orchestrator model turn; content blocks are
+    copied verbatim from the specialists, never rewritten. Specialists that timed out
+    or failed are listed after the results, so a partial answer says it is partial.
+    """
+    return merge_results(results)[0]
+
+
+def merge_results(results: list[SpecialistResult]) -> tuple[str, int]:
+    """`format_results` plus the estimated tokens saved by collapsing near-duplicate quotes."""
+    parsed = [
+        record
+        for result in results
+        if result.status == "ok"
+        for record in parse_results(result.content, result.specialist)
+    ]
+    merged, tokens_saved = aggregate(parsed)
+    if merged:
+        answer = format_markdown(merged)
+        if unavailable := [f"{result.specialist} ({_failure(result)})" for result in results if result.status != "ok"]:
+            answer += "\n\nUnavailable specialists: " + ", ".join(unavailable)
+        return answer, tokens_saved
+
+    attempted = [
+        f"- {result.specialist}: No results" + (f" ({_failure(result)})" if result.status != "ok" else "")
+        for result in results
+    ]
+    answer = "\n\n".join(
+        [
+            "# Search Results",
+            "No relevant information found from available sources.",
+            "Attempted searches:\n" + "\n".join(attempted),
+        ]
+    )
+    return answer, 0
+
+
+def _failure(result: SpecialistResult) -> str:
+    if result.status == "timeout":
+        return f"timed out after {result.elapsed:.1f}s"
+    return result.error or "error"
+
+
+async def _search(specialist: Specialist, query: str) -> SpecialistResult:
+    with tracer.start_as_current_span(f"specialist {specialist.name}") as span:
+        result = await _search_specialist(specialist, query)
+        span.set_attributes({"specialist.status": result.status, "specialist.cache": result.cache or "none"})
+        return result
+
+
+async def _search_specialist(specialist: Specialist, query: str) -> SpecialistResult:
+    started = time.monotonic()
+    _streaming_specialist.set(specialist.name)  # local to this specialist's task
+
+    async def execute(query: str, publish: Callable[[str], Awaitable[None]]) -> str:
+        stream_sink.set(lambda _, text: publish(text))  # local to the shared execution's task
+        # Shared by callers with different deadlines, so bounded by the specialist's own
+        # timeout instead of the starting caller's deadline; it is cancelled (downstream
+        # too) once every caller has stopped waiting.
+        request_deadline.set(None)
+        async with enforce_deadline(specialist.timeout):
+            return await specialist.search(query)
+
+    async def search(query: str) -> str:
+        # A popular query asked by many callers at once is searched once: the others
+        # await the same execution and receive its output as it is streamed. Each
+        # caller waits until its own deadline only.
+        sink = stream_sink.get()
+        async with enforce_deadline(specialist.timeout):
+            return await specialist_flights.run(
+                f"{specialist.name}:{normalize_query(query)}",
+                lambda publish: execute(query, publish),
+                listener=(lambda text: sink(specialist.name, text)) if sink is not None else None,
+            )
+
+    try:
+        if specialist.cache is not None:
+            content, cache_status = await specialist.cache.get_or_fetch(
+                specialist.name, query, search, cacheable=cites_sources
+            )
+        else:
+            content, cache_status = await search(query), None
+        return SpecialistResult(specialist.name, "ok", content, time.monotonic() - started, cache=cache_status)
+    except TimeoutError:
+        logger.warning(f"Specialist '{specialist.name}' missed its deadline after {time.monotonic() - started:.1f}s")
+        return SpecialistResult(specialist.name, "timeout", elapsed=time.monotonic() - started)
+    except Exception as e:
+        logger.exception(f"Specialist '{specialist.name}' failed")
+        return SpecialistResult(specialist.name, "error", elapsed=time.monotonic() - started, error=str(e))
@@ -0,0 +1,200 @@
+import asyncio
+import importlib.util
+import logging
+import os
+import time
+import weakref
+from collections import Counter
+from dataclasses import asdict, dataclass
+from functools import partial
+from typing import Any, AsyncIterator, Callable
+
+import httpx
+from opentelemetry import propagate, trace
+from opentelemetry.trace import Span, SpanKind, Status, StatusCode
+
+from omnisearch_common.tracing import tracer
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_MAX_CONNECTIONS = int(os.environ.get("A2A_HTTP_MAX_CONNECTIONS", "100"))
+DEFAULT_MAX_KEEPALIVE_CONNECTIONS = int(os.environ.get("A2A_HTTP_MAX_KEEPALIVE_CONNECTIONS", "20"))
+DEFAULT_KEEPALIVE_EXPIRY = float(os.environ.get("A2A_HTTP_KEEPALIVE_EXPIRY", "120"))  # [sec]
+DEFAULT_PER_HOST_LIMIT = int(os.environ.get("A2A_HTTP_PER_HOST_LIMIT", "32"))  # concurrent requests
+DEFAULT_CONNECT_TIMEOUT = float(os.environ.get("A2A_HTTP_CONNECT_TIMEOUT", "10"))  # [sec]
+
+# HTTP/2 needs `h2`, installed with this package (`httpx[http2]`); without it connections stay HTTP/1.1.
+HTTP2 = os.environ.get("A2A_HTTP2", "1") == "1" and importlib.util.find_spec("h2") is not None
+
+
+@dataclass
+class TransportMetrics:
+    requests: int = 0
+    connections_opened: int = 0
+    tls_handshakes: int = 0
+    connect_seconds: float = 0.0  # spent in TCP connect and TLS handshakes
+    queued: int = 0  # requests that waited for a per-host slot
+    queued_seconds: float = 0.0
+
+    @property
+    def reused_ratio(self) -> float:
+        return 1 - self.connections_opened / self.requests if self.requests else 0.0
+
+    def to_dict(self) -> dict[str, Any]:
+        return {**asdict(self), "reused_ratio": round(self.reused_ratio, 3)}
+
+
+class PooledTransport(httpx.AsyncBaseTransport):
+    """Keep-alive connection pool shared by every A2A client in the process.
+
+    Wraps one `httpx.AsyncHTTPTransport` per event loop (pooled connections cannot
+    cross loops), negotiates HTTP/2 where available, and caps concurrent requests
+    per origin so one slow agent cannot take every connection. Connection setup is
+    observed through httpcore's trace hooks to report how often connections are
+    reused. Each request gets a client span, ended when the response headers
+    arrive, whose context is sent along in the `traceparent` header.
+    """
+
+    def __init__(
+        self,
+        max_connections: int = DEFAULT_MAX_CONNECTIONS,
+        max_keepalive_connections: int = DEFAULT_MAX_KEEPALIVE_CONNECTIONS,
+        keepalive_expiry: float = DEFAULT_KEEPALIVE_EXPIRY,
+        per_host_limit: int = DEFAULT_PER_HOST_LIMIT,
+        http2: bool = HTTP2,
+    ):
+        self.limits = httpx.Limits(
+            max_connections=max_connections,
+            max_keepalive_connections=max_keepalive_connections,
+            keepalive_expiry=keepalive_expiry,
+        )
+        self.per_host_limit = per_host_limit
+        self.http2 = http2
+        self.metrics = TransportMetrics()
+        self._in_flight: Counter[str] = Counter()
+
+        self._transports: weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, httpx.AsyncHTTPTransport] = (
+            weakref.WeakKeyDictionary()
+        )
+        self._slots: weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, dict[str, asyncio.Semaphore]] = (
+            weakref.WeakKeyDictionary()
+        )
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        loop = asyncio.get_running_loop()
+        transport = self._transports.get(loop)
+        if transport is None:
+            transport = self._transports[loop] = httpx.AsyncHTTPTransport(limits=self.limits, http2=self.http2)
+
+        origin = f"{request.url.scheme}://{request.url.netloc.decode()}"
+        span = tracer.start_span(
+            f"HTTP {request.method}",
+            kind=SpanKind.CLIENT,
+            attributes={"http.request.method": request.method, "url.full": str(request.url)},
+        )
+        propagate.inject(request.headers, context=trace.set_span_in_context(span))
+
+        slot = self._slots.setdefault(loop, {}).setdefault(origin, asyncio.Semaphore(self.per_host_limit))
+        release: Callable[[], None] | None = None
+        try:
+            # Waiting for a slot is part of the request, so a cancelled wait still ends the span.
+            if slot.locked():
+                self.metrics.queued += 1
+                started = time.perf_counter()
+                await slot.acquire()
+                waited = time.perf_counter() - started
+                self.metrics.queued_seconds += waited
+                span.set_attribute("http.queued_ms", round(waited * 1000, 3))
+            else:
+                await slot.acquire()
+
+            self.metrics.requests += 1
+            self._in_flight[origin] += 1
+            release = partial(self._release, origin, slot)
+
+            request.extensions = {
+                **request.extensions,
+                "trace": self._tracer(origin, span, request.extensions.get("trace")),
+            }
+            response = await transport.handle_async_request(request)
+        except BaseException as e:
+            if release is not None:
+                release()
+            span.record_exception(e)
+            span.set_status(Status(StatusCode.ERROR, str(e)))
+            span.end()
+            raise
+
+        span.set_attribute("http.response.status_code", response.status_code)
+        if response.status_code >= 500:
+            span.set_status(Status(StatusCode.ERROR))
+        span.end()
+
+        # The slot is held until the body is consumed, which for SSE is the whole stream.
+        response.stream = _ReleasingStream(response.stream, release)
+        return response
+
+    async def aclose(self) -> None:
+        # Shared by every client: closing one client must not close the pool.
+        pass
+
+    def stats(self) -> dict[str, Any]:
+        return {
+            **self.metrics.to_dict(),
+            "http2": self.http2,
+            "in_flight": {origin: count for origin, count in self._in_flight.items() if count},
+        }
+
+    def _release(self, origin: str, slot: asyncio.Semaphore) -> None:
+        self._in_flight[origin] -= 1
+        slot.release()
+
+    def _tracer(self, origin: str, span: Span, inner: Callable | None):
+        started: dict[str, float] = {}
+
+        async def trace(event_name: str, info: dict[str, Any]) -> None:
+            if event_name in ("connection.connect_tcp.started", "connection.start_tls.started"):
+                started[event_name] = time.perf_counter()
+                span.add_event(event_name)
+            elif event_name in ("connection.connect_tcp.complete", "connection.start_tls.complete"):
+                span.add_event(event_name)
+                began = started.pop(event_name.replace(".complete", ".started"), None)
+                if began is not None:
+                    self.metrics.connect_seconds += time.perf_counter() - began
+                if event_name == "connection.connect_tcp.complete":
+                    self.metrics.connections_opened += 1
+                    logger.debug(f"Opened connection #{self.metrics.connections_opened} to {origin}")
+                else:
+                    self.metrics.tls_handshakes += 1
+            if inner is not None:
+                await inner(event_name, info)
+
+        return trace
+
+
+class _ReleasingStream(httpx.AsyncByteStream):
+    def __init__(self, stream: httpx.AsyncByteStream, release: Callable[[], None]):
+        self._stream = stream
+        self._release = release
+
+    async def __aiter__(self) -> AsyncIterator[bytes]:
+        async for chunk in self._stream:
+            yield chunk
+
+    async def aclose(self) -> None:
+        try:
+            await self._stream.aclose()
+        finally:
+            if self._release is not None:
+                self._release()
+                self._release = None
+
+
+shared_transport = PooledTransport()
+
+
+def pooled_http_client(timeout: float, **kwargs: Any) -> httpx.AsyncClient:
+    """An `httpx.AsyncClient` with its own timeout (and `kwargs`) on top of the process-wide connection pool."""
+    return httpx.AsyncClient(
+        transport=shared_transport, timeout=httpx.Timeout(timeout, connect=DEFAULT_CONNECT_TIMEOUT), **kwargs
+    )
@@ -0,0 +1,102 @@
+import asyncio
+import logging
+import os
+import sys
+import threading
+import time
+import traceback
+from dataclasses import asdict, dataclass
+from typing import Any
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_STALL_THRESHOLD = float(os.environ.get("LOOP_STALL_THRESHOLD", "0.25"))  # [sec]; 0 disables
+DEFAULT_TICK_INTERVAL = float(os.environ.get("LOOP_TICK_INTERVAL", "0.05"))  # [sec]
+
+
+@dataclass
+class LoopMetrics:
+    stalls: int = 0
+    stalled_seconds: float = 0.0
+    max_stall_seconds: float = 0.0
+    max_lag_seconds: float = 0.0  # worst lateness of a heartbeat, stalls included
+
+
+class EventLoopMonitor:
+    """Detects callbacks that block the event loop and logs where they are stuck.
+
+    A heartbeat task on the loop records when it last ran; a watchdog thread
+    checks it every tick. When the loop has not run the heartbeat for longer than
+    `threshold`, the watchdog logs the loop thread's current stack once per stall,
+    which points at the blocking call (a sync HTTP request, `time.sleep`, a
+    `*_sync` MCP call, ...) while it is still blocking.
+    """
+
+    def __init__(self, threshold: float = DEFAULT_STALL_THRESHOLD, interval: float = DEFAULT_TICK_INTERVAL):
+        self.threshold = threshold
+        self.interval = interval
+        self.metrics = LoopMetrics()
+
+        self._last_tick = time.monotonic()
+        self._loop_thread_id: int | None = None
+        self._heartbeat: asyncio.Task | None = None
+        self._stop_event = threading.Event()
+        self._watchdog: threading.Thread | None = None
+
+    def start(self) -> None:
+        """Start monitoring the running event loop."""
+        if self.threshold <= 0 or self._heartbeat is not None:
+            return
+        self._loop_thread_id = threading.get_ident()
+        self._last_tick = time.monotonic()
+        self._heartbeat = asyncio.create_task(self._beat())
+        self._stop_event.clear()
+        self._watchdog = threading.Thread(target=self._watch, name="event-loop-watchdog", daemon=True)
+        self._watchdog.start()
+        logger.info(f"Watching the event loop for stalls over {self.threshold}s")
+
+    def stop(self) -> None:
+        self._stop_event.set()
+        if self._heartbeat is not None:
+            self._heartbeat.cancel()
+            self._heartbeat = None
+
+    def stats(self) -> dict[str, Any]:
+        return {**asdict(self.metrics), "lag_seconds": round(max(0.0, time.monotonic() - self._last_tick), 3)}
+
+    async def _beat(self) -> None:
+        while True:
+            expected = time.monotonic() + self.interval
+            await asyncio.sleep(self.interval)
+            now = time.monotonic()
+            self.metrics.max_lag_seconds = max(self.metrics.max_lag_seconds, now - expected)
+            self._last_tick = now
+
+    def _watch(self) -> None:
+        stalled_since: float | None = None
+        while not self._stop_event.wait(self.interval):
+            last_tick = self._last_tick
+            blocked = time.monotonic() - last_tick
+            if blocked <= self.threshold:
+                if stalled_since is not None:
+                    self._record(last_tick - stalled_since)
+                    stalled_since = None
+                continue
+            if stalled_since == last_tick:
+                continue  # already reported
+
+            if stalled_since is not None:  # the previous stall ended between two checks
+                self._record(last_tick - stalled_since)
+            stalled_since = last_tick
+            frame = sys._current_frames().get(self._loop_thread_id)
+            stack = "".join(traceback.format_stack(frame)) if frame is not None else "(no frame)\n"
+            logger.warning(f"Event loop blocked for {blocked:.3f}s so far; the loop thread is at:\n{stack}")
+
+    def _record(self, stalled: float) -> None:
+        self.metrics.stalls += 1
+        self.metrics.stalled_seconds += stalled
+        self.metrics.max_stall_seconds = max(self.metrics.max_stall_seconds, stalled)
+        logger.warning(f"Event loop was blocked for {stalled:.3f}s")
+
+
+loop_monitor = EventLoopMonitor()
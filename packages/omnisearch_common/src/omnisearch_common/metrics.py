@@ -0,0 +1,76 @@
+import os
+from typing import Any, Callable, Mapping
+
+from omnisearch_common.prompt_cache import prompt_cache_reporter
+
+PREFIX = "omnisearch"
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+# Token counters of CacheUsage, by the `kind` label they are exported with.
+TOKEN_KINDS = {
+    "input": "input_tokens",
+    "cache_read": "cache_read_input_tokens",
+    "cache_write": "cache_write_input_tokens",
+    "output": "output_tokens",
+}
+
+
+def render_metrics(**sources: Callable[[], Mapping[str, Any]]) -> str:
+    """Prometheus text exposition of this process' token usage and memory plus the stats of `sources`.
+
+    Usage is reported per layer (agent name) since the process started. Every
+    numeric value of a source's stats becomes a gauge `omnisearch_<source>_<key>`;
+    a mapping value becomes one sample per entry, labelled `key`.
+    """
+    lines: list[str] = []
+    usage = prompt_cache_reporter.snapshot()
+
+    lines += ["# HELP omnisearch_tokens_total Model tokens by agent layer.", "# TYPE omnisearch_tokens_total counter"]
+    for layer, layer_usage in usage.items():
+        for kind, field in TOKEN_KINDS.items():
+            lines.append(_sample("tokens_total", getattr(layer_usage, field), layer=layer, kind=kind))
+
+    for name, field, description in (
+        ("model_calls_total", "model_calls", "Model invocations by agent layer."),
+        ("agent_invocations_total", "invocations", "Agent invocations by layer."),
+        ("cost_usd_total", "cost_usd", "Estimated model cost in USD by agent layer."),
+    ):
+        lines += [f"# HELP {PREFIX}_{name} {description}", f"# TYPE {PREFIX}_{name} counter"]
+        lines += [_sample(name, getattr(layer_usage, field), layer=layer) for layer, layer_usage in usage.items()]
+
+    if (resident := _resident_memory_bytes()) is not None:
+        lines += [
+            "# HELP process_resident_memory_bytes Resident memory size in bytes.",
+            "# TYPE process_resident_memory_bytes gauge",
+            f"process_resident_memory_bytes {float(resident)}",
+        ]
+
+    for source, stats in sources.items():
+        for key, value in stats().items():
+            name = f"{source}_{key}"
+            if isinstance(value, Mapping):
+                samples = [_sample(name, count, key=str(label)) for label, count in value.items()]
+            elif isinstance(value, (int, float)):
+                samples = [_sample(name, value)]
+            else:
+                continue
+            lines += [f"# TYPE {PREFIX}_{name} gauge", *samples]
+
+    return "\n".join(lines) + "\n"
+
+
+def _sample(name: str, value: float, **labels: str) -> str:
+    label_text = ",".join(f'{key}="{_escape(label)}"' for key, label in labels.items())
+    return f"{PREFIX}_{name}{{{label_text}}} {float(value)}" if labels else f"{PREFIX}_{name} {float(value)}"
+
+
+def _resident_memory_bytes() -> int | None:
+    try:
+        with open("/proc/self/statm") as statm:  # Linux, as on AgentCore Runtime
+            return int(statm.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError):
+        return None
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
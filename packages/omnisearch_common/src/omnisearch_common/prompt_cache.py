@@ -0,0 +1,215 @@
+import logging
+import os
+import threading
+import weakref
+from contextvars import ContextVar
+from dataclasses import asdict, dataclass, field
+from typing import Any, Mapping, Sequence
+
+from strands.hooks import AfterInvocationEvent, BeforeInvocationEvent, HookProvider, HookRegistry
+from strands.models import BedrockModel
+from strands.types.event_loop import Usage
+
+logger = logging.getLogger(__name__)
+
+# Cache point type placed after the static prefixes; set to "" to disable prompt caching.
+CACHE_POINT_TYPE = os.environ.get("BEDROCK_PROMPT_CACHE", "default")
+
+# Which static prefixes each model family accepts a cache point after.
+CACHE_POINT_SUPPORT = {
+    "anthropic.claude": {"cache_prompt", "cache_tools"},
+    "amazon.nova": {"cache_prompt"},
+}
+
+# On-demand list prices in USD per million tokens: input, output, cache read, cache write.
+MODEL_PRICES = {
+    "anthropic.claude-sonnet-4": (3.0, 15.0, 0.3, 3.75),
+    "amazon.nova-pro": (0.8, 3.2, 0.2, 0.8),
+    "amazon.nova-lite": (0.06, 0.24, 0.015, 0.06),
+    "amazon.nova-micro": (0.035, 0.14, 0.00875, 0.035),
+}
+# Usage keys in the order of MODEL_PRICES.
+PRICED_USAGE_KEYS = ("inputTokens", "outputTokens", "cacheReadInputTokens", "cacheWriteInputTokens")
+
+# Usage of each model call made during the current agent invocation, by the model ID that
+# answered it. Set by PromptCacheReporter; models that may answer with a model other than
+# their configured one (e.g. a fallback) add to it with `record_model_usage`.
+answered_usage: ContextVar[list[tuple[str, Usage]] | None] = ContextVar("answered_usage", default=None)
+
+
+def record_model_usage(model_id: str, usage: Usage) -> None:
+    if (answered := answered_usage.get()) is not None:
+        answered.append((model_id, usage))
+
+
+def estimate_cost(model_id: str, usage: Mapping[str, int]) -> float:
+    """USD cost of `usage` at the list prices of `model_id`, or 0 for an unknown model."""
+    prices = next((prices for family, prices in MODEL_PRICES.items() if family in model_id), None)
+    if prices is None:
+        return 0.0
+    return sum(usage.get(key, 0) * price for key, price in zip(PRICED_USAGE_KEYS, prices)) / 1_000_000
+
+
+def cached_bedrock_model(
+    model_id: str, model_class: type[BedrockModel] = BedrockModel, **model_config
+) -> BedrockModel:
+    """A BedrockModel whose system prompt, and tool specs where supported, are cache points.
+
+    Both prefixes are identical on every turn of every request, so after the first
+    call Bedrock reads them from its prompt cache instead of processing them again.
+    """
+    if CACHE_POINT_TYPE:
+        for family, prefixes in CACHE_POINT_SUPPORT.items():
+            if family in model_id:
+                model_config = {prefix: CACHE_POINT_TYPE for prefix in prefixes} | model_config
+                break
+    return model_class(model_id=model_id, **model_config)
+
+
+@dataclass
+class CacheUsage:
+    invocations: int = 0  # agent invocations
+    model_calls: int = 0
+    input_tokens: int = 0  # uncached
+    cache_read_input_tokens: int = 0
+    cache_write_input_tokens: int = 0
+    output_tokens: int = 0
+    cost_usd: float = 0.0  # estimated from MODEL_PRICES
+
+    @property
+    def cached_ratio(self) -> float:
+        total = self.input_tokens + self.cache_read_input_tokens + self.cache_write_input_tokens
+        return self.cache_read_input_tokens / total if total else 0.0
+
+    def add(self, other: "CacheUsage") -> None:
+        self.invocations += other.invocations
+        self.model_calls += other.model_calls
+        self.input_tokens += other.input_tokens
+        self.cache_read_input_tokens += other.cache_read_input_tokens
+        self.cache_write_input_tokens += other.cache_write_input_tokens
+        self.output_tokens += other.output_tokens
+        self.cost_usd += other.cost_usd
+
+    def to_dict(self) -> dict[str, Any]:
+        return {**asdict(self), "cost_usd": round(self.cost_usd, 6), "cached_ratio": round(self.cached_ratio, 3)}
+
+    @classmethod
+    def from_dict(cls, data: Mapping[str, Any]) -> "CacheUsage":
+        return cls(**{key: data.get(key, 0) for key in cls.__dataclass_fields__})
+
+    @classmethod
+    def between(
+        cls,
+        before: Usage,
+        after: Usage,
+        model_id: str = "",
+        model_calls: int = 0,
+        answered: Sequence[tuple[str, Usage]] = (),
+    ) -> "CacheUsage":
+        """Usage from `before` to `after`. Calls in `answered` are priced as the model that
+        answered them, the rest as `model_id`."""
+
+        def delta(key: str) -> int:
+            return after.get(key, 0) - before.get(key, 0)
+
+        usage = cls(
+            invocations=1,
+            model_calls=model_calls,
+            input_tokens=delta("inputTokens"),
+            cache_read_input_tokens=delta("cacheReadInputTokens"),
+            cache_write_input_tokens=delta("cacheWriteInputTokens"),
+            output_tokens=delta("outputTokens"),
+        )
+        unattributed = {key: delta(key) for key in PRICED_USAGE_KEYS}
+        for answered_by, call in answered:
+            usage.cost_usd += estimate_cost(answered_by, call)
+            for key in PRICED_USAGE_KEYS:
+                unattributed[key] -= call.get(key, 0)
+        usage.cost_usd += estimate_cost(model_id, {key: max(0, count) for key, count in unattributed.items()})
+        return usage
+
+
+@dataclass
+class RequestUsage:
+    """Token usage of one request by layer (agent name), including layers reached over A2A."""
+
+    layers: dict[str, CacheUsage] = field(default_factory=dict)
+
+    @property
+    def total(self) -> CacheUsage:
+        total = CacheUsage()
+        for usage in self.layers.values():
+            total.add(usage)
+        return total
+
+    def add(self, layer: str, usage: CacheUsage) -> None:
+        self.layers.setdefault(layer, CacheUsage()).add(usage)
+
+    def merge(self, reported: Mapping[str, Any]) -> None:
+        """Add a breakdown another agent reported with `to_dict()`."""
+        for layer, usage in reported.get("layers", {}).items():
+            self.add(layer, CacheUsage.from_dict(usage))
+
+    def to_dict(self) -> dict[str, Any]:
+        return {
+            "layers": {layer: usage.to_dict() for layer, usage in self.layers.items()},
+            "total": self.total.to_dict(),
+        }
+
+
+# A request handler can set this to a RequestUsage to total every agent invocation
+# made while serving the request, e.g. to report it in response metadata.
+request_usage: ContextVar[RequestUsage | None] = ContextVar("request_usage", default=None)
+
+
+class PromptCacheReporter(HookProvider):
+    """Logs cache-read vs. uncached input tokens for every agent invocation.
+
+    Usage is taken as the difference of the agent's accumulated usage around the
+    invocation, so long-lived agents report each request on its own. It is added to
+    the current `request_usage` and to the process-wide `totals` by agent name.
+    """
+
+    def __init__(self):
+        self.totals: dict[str, CacheUsage] = {}
+        self._totals_lock = threading.Lock()  # agents may run on other threads' loops
+        self._started: weakref.WeakKeyDictionary[Any, tuple[Usage, int, list, list | None]] = (
+            weakref.WeakKeyDictionary()
+        )
+
+    def register_hooks(self, registry: HookRegistry, **kwargs) -> None:
+        registry.add_callback(BeforeInvocationEvent, self._before_invocation)
+        registry.add_callback(AfterInvocationEvent, self._after_invocation)
+
+    def snapshot(self) -> dict[str, CacheUsage]:
+        with self._totals_lock:
+            return {layer: CacheUsage(**asdict(usage)) for layer, usage in self.totals.items()}
+
+    def _before_invocation(self, event: BeforeInvocationEvent) -> None:
+        metrics = event.agent.event_loop_metrics
+        answered: list[tuple[str, Usage]] = []
+        outer = answered_usage.get()
+        self._started[event.agent] = (dict(metrics.accumulated_usage), metrics.cycle_count, answered, outer)
+        answered_usage.set(answered)
+
+    def _after_invocation(self, event: AfterInvocationEvent) -> None:
+        metrics = event.agent.event_loop_metrics
+        before, cycles, answered, outer = self._started.pop(event.agent, ({}, metrics.cycle_count, [], None))
+        # Hooks run in the caller's context: hand the list of an enclosing invocation back to it.
+        answered_usage.set(outer)
+        model_id = event.agent.model.config.get("model_id", "")
+        usage = CacheUsage.between(
+            before, metrics.accumulated_usage, model_id, metrics.cycle_count - cycles, answered
+        )
+
+        logger.info(
+            f"{event.agent.name}: {usage.cache_read_input_tokens} cache-read / {usage.input_tokens} uncached "
+            f"input tokens ({usage.cached_ratio:.0%} cached, {usage.cache_write_input_tokens} written to cache)"
+        )
+        with self._totals_lock:
+            self.totals.setdefault(event.agent.name, CacheUsage()).add(usage)
+        if (request := request_usage.get()) is not None:
+            request.add(event.agent.name, usage)
+
+
+prompt_cache_reporter = PromptCacheReporter()
@@ -0,0 +1,167 @@
+import asyncio
+import contextvars
+import logging
+import os
+import re
+import sqlite3
+import threading
+import time
+import unicodedata
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Awaitable, Callable, Literal
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_MAX_ENTRIES = int(os.environ.get("RESULT_CACHE_MAX_ENTRIES", "512"))
+DEFAULT_TTL = float(os.environ.get("RESULT_CACHE_TTL", "3600"))  # [sec]
+DEFAULT_STALE_TTL = float(os.environ.get("RESULT_CACHE_STALE_TTL", "86400"))  # [sec]
+DEFAULT_SQLITE_PATH = os.environ.get("RESULT_CACHE_SQLITE_PATH")
+
+CacheStatus = Literal["hit", "stale", "miss"]
+
+
+def normalize_query(query: str) -> str:
+    query = unicodedata.normalize("NFKC", query).casefold()
+    return re.sub(r"\s+", " ", query).strip()
+
+
+@dataclass
+class _Entry:
+    value: str
+    stored_at: float  # time.time(), so entries stay comparable across restarts
+
+
+class ResultCache:
+    """Two-tier cache of specialist search results keyed by normalized query.
+
+    Entries younger than `ttl` are served as hits. Entries up to `ttl + stale_ttl`
+    are served immediately as `stale` while a background task refreshes them
+    (stale-while-revalidate); anything older is evicted and fetched again. The
+    in-memory tier is an LRU of `max_entries`; when `sqlite_path` is set, entries
+    are also written through to a local SQLite file that survives restarts.
+
+    Only values `cacheable` accepts are stored (by default, any that are not blank),
+    so an empty answer is searched again next time instead of served for an hour.
+    """
+
+    def __init__(
+        self,
+        max_entries: int = DEFAULT_MAX_ENTRIES,
+        ttl: float = DEFAULT_TTL,
+        stale_ttl: float = DEFAULT_STALE_TTL,
+        sqlite_path: str | None = DEFAULT_SQLITE_PATH,
+    ):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.stale_ttl = stale_ttl
+
+        self._memory: OrderedDict[str, _Entry] = OrderedDict()
+        self._revalidating: dict[str, asyncio.Task] = {}
+
+        self._db: sqlite3.Connection | None = None
+        self._db_lock = threading.Lock()
+        if sqlite_path:
+            self._db = sqlite3.connect(sqlite_path, check_same_thread=False)
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS results (key TEXT PRIMARY KEY, value TEXT NOT NULL, stored_at REAL NOT NULL)"
+            )
+            self._db.commit()
+
+    async def get_or_fetch(
+        self,
+        namespace: str,
+        query: str,
+        fetch: Callable[[str], Awaitable[str]],
+        cacheable: Callable[[str], bool] = lambda value: bool(value.strip()),
+    ) -> tuple[str, CacheStatus]:
+        key = f"{namespace}:{normalize_query(query)}"
+
+        entry = self._memory_get(key)
+        if entry is None and self._db is not None:
+            entry = await asyncio.to_thread(self._disk_get, key)
+            if entry is not None:
+                self._memory_set(key, entry)
+
+        if entry is not None:
+            age = time.time() - entry.stored_at
+            if age <= self.ttl:
+                return entry.value, "hit"
+            if age <= self.ttl + self.stale_ttl:
+                self._revalidate(key, query, fetch, cacheable)
+                return entry.value, "stale"
+            await self._evict(key)
+
+        value = await fetch(query)
+        if cacheable(value):
+            await self._store(key, value)
+        return value, "miss"
+
+    def _revalidate(
+        self, key: str, query: str, fetch: Callable[[str], Awaitable[str]], cacheable: Callable[[str], bool]
+    ) -> None:
+        if key in self._revalidating:
+            return
+
+        async def refresh():
+            try:
+                value = await fetch(query)
+                # An empty refresh keeps serving the stale entry rather than replacing it.
+                if cacheable(value):
+                    await self._store(key, value)
+            except Exception:
+                logger.exception(f"Failed to revalidate cached result for '{key}'")
+            finally:
+                self._revalidating.pop(key, None)
+
+        # Run detached from the request that found the stale entry, so the refresh
+        # does not report into its per-request context (collected results, streams).
+        self._revalidating[key] = asyncio.create_task(refresh(), context=contextvars.Context())
+
+    async def _store(self, key: str, value: str) -> None:
+        entry = _Entry(value, time.time())
+        self._memory_set(key, entry)
+        if self._db is not None:
+            await asyncio.to_thread(self._disk_set, key, entry)
+
+    def _memory_get(self, key: str) -> _Entry | None:
+        entry = self._memory.get(key)
+        if entry is not None:
+            self._memory.move_to_end(key)
+        return entry
+
+    def _memory_set(self, key: str, entry: _Entry) -> None:
+        self._memory[key] = entry
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_entries:
+            self._memory.popitem(last=False)
+
+    async def _evict(self, key: str) -> None:
+        self._memory.pop(key, None)
+        if self._db is not None:
+            await asyncio.to_thread(self._disk_delete, key)
+
+    def _disk_get(self, key: str) -> _Entry | None:
+        with self._db_lock:
+            row = self._db.execute("SELECT value, stored_at FROM results WHERE key = ?", (key,)).fetchone()
+        return _Entry(*row) if row else None
+
+    def _disk_delete(self, key: str) -> None:
+        with self._db_lock:
+            self._db.execute("DELETE FROM results WHERE key = ?", (key,))
+            self._db.commit()
+
+    def _disk_set(self, key: str, entry: _Entry) -> None:
+        with self._db_lock:
+            self._db.execute(
+                "INSERT OR REPLACE INTO results (key, value, stored_at) VALUES (?, ?, ?)",
+                (key, entry.value, entry.stored_at),
+            )
+            # Expired rows are dropped on write so the file does not grow without bound.
+            self._db.execute(
+                "DELETE FROM results WHERE stored_at < ?", (time.time() - self.ttl - self.stale_ttl,)
+            )
+            self._db.commit()
+
+
+result_cache = ResultCache()
@@ -0,0 +1,234 @@
+import hashlib
+import logging
+import re
+import unicodedata
+from dataclasses import dataclass, field
+
+from omnisearch_common.dedupe import NearDuplicateDetector, near_duplicate_detector
+from omnisearch_common.thinking_filter import strip_thinking
+
+logger = logging.getLogger(__name__)
+
+RESULT_HEADING = re.compile(r"^#\s+Result\b")
+CONTENT_HEADING = re.compile(r"^##\s+Content\s*$")
+SOURCES_HEADING = re.compile(r"^##\s+Sources\s*$")
+SEPARATOR = re.compile(r"^\s*(?:-{3,}|\*{3,}|_{3,})\s*$")
+FENCE = re.compile(r"^\s*(```|~~~)")
+MARKDOWN_LINK = re.compile(r"\[([^\]]*)\]\(\s*<?([^)\s>]+)>?(?:\s+\"[^\"]*\")?\s*\)")
+BARE_URL = re.compile(r"https?://\S+")
+
+
+@dataclass
+class Source:
+    title: str
+    url: str
+
+
+@dataclass
+class SearchResult:
+    """One `# Result N` section of specialist output.
+
+    `content` holds the verbatim blocks (paragraphs, lists, fenced code) of the
+    `## Content` section; blocks are never rewritten, only kept or dropped.
+    """
+
+    version: str = ""
+    content: list[str] = field(default_factory=list)
+    sources: list[Source] = field(default_factory=list)
+    specialists: list[str] = field(default_factory=list)
+
+
+def parse_results(markdown: str, specialist: str | None = None) -> list[SearchResult]:
+    """Parse `# Result N / ## Content / ## Sources` markdown into result records.
+
+    Output that does not follow the format at all becomes a single record holding
+    the whole text, so nothing a specialist returned is silently lost.
+    """
+    specialists = [specialist] if specialist else []
+    results: list[SearchResult] = []
+    sections: dict[str, list[str]] | None = None
+    section = "version"
+    in_fence = False
+
+    def finish():
+        if sections is not None:
+            result = SearchResult(
+                version="\n".join(sections["version"]).strip(),
+                content=_blocks(sections["content"]),
+                sources=_sources(sections["sources"]),
+                specialists=list(specialists),
+            )
+            if result.content or result.sources:
+                results.append(result)
+
+    for line in strip_thinking(markdown).splitlines():
+        if FENCE.match(line):
+            in_fence = not in_fence
+        elif not in_fence:
+            if RESULT_HEADING.match(line):
+                finish()
+                sections, section = {"version": [], "content": [], "sources": []}, "version"
+                continue
+            if sections is not None and CONTENT_HEADING.match(line):
+                section = "content"
+                continue
+            if sections is not None and SOURCES_HEADING.match(line):
+                section = "sources"
+                continue
+            if sections is not None and section == "sources" and SEPARATOR.match(line):
+                finish()
+                sections = None
+                continue
+
+        if sections is not None:
+            sections[section].append(line)
+    finish()
+
+    if not results and (text := strip_thinking(markdown).strip()):
+        results.append(SearchResult(content=[text], specialists=list(specialists)))
+    return results
+
+
+def cites_sources(markdown: str) -> bool:
+    """Whether any result in `markdown` cites a source; a reply without one found nothing worth keeping."""
+    return any(result.sources for result in parse_results(markdown))
+
+
+def aggregate(
+    results: list[SearchResult], detector: NearDuplicateDetector | None = near_duplicate_detector
+) -> tuple[list[SearchResult], int]:
+    """Merge results that cite the same sources and drop repeated content blocks.
+
+    Results are grouped by their set of source URLs, in order of first appearance.
+    A content block is dropped when the same text (ignoring whitespace) was already
+    kept for the same source, so identical quotes of different pages are both kept.
+    Then, unless `detector` is None, blocks that nearly repeat an earlier block of
+    any result are collapsed into it (see `collapse_near_duplicates`).
+
+    Returns the merged results and the estimated tokens the near-duplicate pass saved.
+    """
+    groups: dict[tuple[str, ...], SearchResult] = {}
+    seen: set[tuple[str, str]] = set()
+
+    for result in results:
+        urls = tuple(sorted({normalize_url(source.url) for source in result.sources}))
+        # Unsourced output is only ever merged with output of the same specialist.
+        key = urls or tuple(f"specialist:{name}" for name in result.specialists)
+        group = groups.get(key)
+        if group is None:
+            group = groups[key] = SearchResult()
+
+        for block in result.content:
+            digest = content_hash(block)
+            if any((url, digest) in seen for url in key):
+                continue
+            seen.update((url, digest) for url in key)
+            group.content.append(block)
+
+        if result.version and result.version not in group.version.split("\n"):
+            group.version = f"{group.version}\n{result.version}".strip()
+
+        known = {normalize_url(source.url) for source in group.sources}
+        for source in result.sources:
+            if normalize_url(source.url) not in known:
+                known.add(normalize_url(source.url))
+                group.sources.append(source)
+
+        group.specialists.extend(name for name in result.specialists if name not in group.specialists)
+
+    merged = [group for group in groups.values() if group.content]
+    tokens_saved = collapse_near_duplicates(merged, detector) if detector is not None else 0
+    return [group for group in merged if group.content], tokens_saved
+
+
+def collapse_near_duplicates(results: list[SearchResult], detector: NearDuplicateDetector) -> int:
+    """Drop content blocks that nearly repeat an earlier block, in place.
+
+    The result keeping the earlier block also cites the sources of the dropped one,
+    so attribution survives even when a result loses all of its content. Returns the
+    estimated number of tokens saved.
+    """
+    located = [(result, block) for result in results for block in result.content]
+    found = detector.find([block for _, block in located])
+    if not found.originals:
+        return 0
+
+    for index, original in found.originals.items():
+        kept_in, dropped_from = located[original][0], located[index][0]
+        known = {normalize_url(source.url) for source in kept_in.sources}
+        kept_in.sources.extend(source for source in dropped_from.sources if normalize_url(source.url) not in known)
+        kept_in.specialists.extend(name for name in dropped_from.specialists if name not in kept_in.specialists)
+
+    for result in results:
+        result.content = []
+    for index, (result, block) in enumerate(located):
+        if index not in found.originals:
+            result.content.append(block)
+
+    logger.info(
+        f"Collapsed {len(found.originals)} of {found.blocks} content blocks as near-duplicates, "
+        f"saving ~{found.tokens_saved} tokens"
+    )
+    return found.tokens_saved
+
+
+def format_markdown(results: list[SearchResult]) -> str:
+    sections = []
+    for number, result in enumerate(results, start=1):
+        lines = [f"# Result {number}", ""]
+        if result.version:
+            lines += [result.version, ""]
+        lines += ["## Content", "", "\n\n".join(result.content), ""]
+        if result.sources:
+            lines += ["## Sources", ""]
+            lines += [f"- [{source.title or source.url}]({source.url})" for source in result.sources]
+            lines.append("")
+        lines.append("---")
+        sections.append("\n".join(lines))
+    return "\n\n".join(sections)
+
+
+def normalize_url(url: str) -> str:
+    scheme, separator, rest = url.strip().partition("://")
+    if not separator:
+        return url.strip()
+    host, slash, path = rest.partition("/")
+    return f"{scheme.lower()}://{host.lower()}{slash}{path}".rstrip("/")
+
+
+def content_hash(text: str) -> str:
+    normalized = " ".join(unicodedata.normalize("NFKC", text).split())
+    return hashlib.sha256(normalized.encode()).hexdigest()
+
+
+def _blocks(lines: list[str]) -> list[str]:
+    blocks: list[list[str]] = []
+    current: list[str] = []
+    in_fence = False
+
+    for line in lines:
+        if FENCE.match(line):
+            in_fence = not in_fence
+        if not line.strip() and not in_fence:
+            if current:
+                blocks.append(current)
+                current = []
+            continue
+        current.append(line)
+    if current:
+        blocks.append(current)
+
+    # A trailing `---` without a Sources section is the record separator, not content.
+    if blocks and len(blocks[-1]) == 1 and SEPARATOR.match(blocks[-1][0]):
+        blocks.pop()
+    return ["\n".join(block) for block in blocks]
+
+
+def _sources(lines: list[str]) -> list[Source]:
+    sources = []
+    for line in lines:
+        if links := MARKDOWN_LINK.findall(line):
+            sources.extend(Source(title.strip(), url) for title, url in links)
+        elif match := BARE_URL.search(line):
+            sources.append(Source("", match.group().rstrip(".,;")))
+    return sources
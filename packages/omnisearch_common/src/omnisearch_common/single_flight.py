@@ -0,0 +1,101 @@
+import asyncio
+import logging
+from dataclasses import asdict, dataclass, field
+from typing import Any, Awaitable, Callable, Generic, TypeVar
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+Listener = Callable[[str], Awaitable[None]]
+
+
+@dataclass
+class SingleFlightMetrics:
+    executions: int = 0
+    coalesced: int = 0  # calls that joined an execution already in flight
+    abandoned: int = 0  # executions cancelled because every caller left
+
+
+@dataclass
+class _Flight:
+    task: asyncio.Task
+    chunks: list[str] = field(default_factory=list)  # published so far, replayed to late joiners
+    listeners: list[Listener] = field(default_factory=list)
+    callers: int = 0
+
+
+class SingleFlight(Generic[T]):
+    """Runs at most one execution per key; concurrent calls with the same key share it.
+
+    The execution runs in a task of its own, so a caller that is cancelled (or times
+    out) only stops waiting; the others still get the result, or the exception. It
+    is cancelled only once every caller has left. The task copies the context of the
+    caller that started it, deadline included, so an execution shared by callers with
+    different deadlines should replace it with its own bound. Text the execution passes to its
+    `publish` callback is forwarded to the `listener` of every caller, and replayed
+    to callers that join late, so each of them can stream the whole output.
+    """
+
+    def __init__(self):
+        self.metrics = SingleFlightMetrics()
+        self._flights: dict[str, _Flight] = {}
+
+    async def run(
+        self,
+        key: str,
+        execute: Callable[[Listener], Awaitable[T]],
+        listener: Listener | None = None,
+    ) -> T:
+        flight = self._flights.get(key)
+        if flight is None:
+            flight = self._start(key, execute)
+        else:
+            self.metrics.coalesced += 1
+            logger.info(f"Joining the in-flight execution for '{key}'")
+
+        flight.callers += 1
+        try:
+            if listener is not None:
+                replayed = 0
+                while replayed < len(flight.chunks):  # more may be published while replaying
+                    await listener(flight.chunks[replayed])
+                    replayed += 1
+                flight.listeners.append(listener)
+            return await asyncio.shield(flight.task)
+        finally:
+            flight.callers -= 1
+            if listener is not None and listener in flight.listeners:
+                flight.listeners.remove(listener)
+            if flight.callers == 0 and not flight.task.done():
+                self.metrics.abandoned += 1
+                flight.task.cancel()
+
+    def stats(self) -> dict[str, Any]:
+        return {**asdict(self.metrics), "in_flight": len(self._flights)}
+
+    def _start(self, key: str, execute: Callable[[Listener], Awaitable[T]]) -> _Flight:
+        async def publish(text: str):
+            flight.chunks.append(text)
+            for listener in list(flight.listeners):
+                try:
+                    await listener(text)
+                except Exception:
+                    # One caller's broken stream must not fail the execution shared with the others.
+                    logger.exception(f"Dropping a listener of '{key}' that failed")
+                    if listener in flight.listeners:
+                        flight.listeners.remove(listener)
+
+        # The task copies the starting caller's context (trace, usage accounting).
+        flight = _Flight(asyncio.create_task(execute(publish)))
+        self._flights[key] = flight
+        self.metrics.executions += 1
+
+        def done(task: asyncio.Task):
+            if self._flights.get(key) is flight:
+                del self._flights[key]
+            if not task.cancelled():
+                task.exception()  # retrieved by the callers; marks it so even if all of them left
+
+        flight.task.add_done_callback(done)
+        return flight
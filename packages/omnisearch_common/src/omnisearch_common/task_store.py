@@ -0,0 +1,187 @@
+import asyncio
+import logging
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import asdict, dataclass
+from typing import Any
+
+from a2a.server.context import ServerCallContext
+from a2a.server.tasks import TaskStore
+from a2a.types import Part, Task, TextPart
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_MAX_TASKS = int(os.environ.get("TASK_STORE_MAX_TASKS", "1000"))
+DEFAULT_MAX_BYTES = int(os.environ.get("TASK_STORE_MAX_BYTES", str(64 * 1024 * 1024)))
+DEFAULT_MAX_TASKS_PER_CONTEXT = int(os.environ.get("TASK_STORE_MAX_TASKS_PER_CONTEXT", "16"))
+DEFAULT_IDLE_TTL = float(os.environ.get("TASK_STORE_IDLE_TTL", "3600"))  # [sec]
+DEFAULT_SQLITE_PATH = os.environ.get("TASK_STORE_SQLITE_PATH")
+
+TASK_OVERHEAD_BYTES = 1024  # ids, status and metadata, roughly
+
+
+@dataclass
+class _Entry:
+    task: Task
+    size: int  # estimated bytes
+    touched_at: float
+
+
+@dataclass
+class TaskStoreMetrics:
+    evicted_lru: int = 0  # over max_tasks or max_bytes
+    evicted_context: int = 0  # over max_tasks_per_context
+    expired: int = 0  # idle for idle_ttl
+    spilled: int = 0
+    spill_hits: int = 0
+
+
+class BoundedTaskStore(TaskStore):
+    """A2A task store whose memory stays bounded however long the server runs.
+
+    Tasks are kept in an LRU capped at `max_tasks` and at `max_bytes` of estimated
+    size, and each context ID keeps at most `max_tasks_per_context` of its most
+    recent tasks. Tasks nobody read or updated for `idle_ttl` are dropped. When
+    `sqlite_path` is set, tasks evicted by the caps are spilled to a local SQLite
+    file and loaded back if asked for again; spilled tasks expire the same way.
+    """
+
+    def __init__(
+        self,
+        max_tasks: int = DEFAULT_MAX_TASKS,
+        max_bytes: int = DEFAULT_MAX_BYTES,
+        max_tasks_per_context: int = DEFAULT_MAX_TASKS_PER_CONTEXT,
+        idle_ttl: float = DEFAULT_IDLE_TTL,
+        sqlite_path: str | None = DEFAULT_SQLITE_PATH,
+    ):
+        self.max_tasks = max_tasks
+        self.max_bytes = max_bytes
+        self.max_tasks_per_context = max(1, max_tasks_per_context)
+        self.idle_ttl = idle_ttl
+        self.metrics = TaskStoreMetrics()
+
+        self._tasks: OrderedDict[str, _Entry] = OrderedDict()  # least recently used first
+        self._contexts: dict[str, OrderedDict[str, None]] = {}  # task IDs by context, oldest first
+        self._bytes = 0
+
+        self._db: sqlite3.Connection | None = None
+        self._db_lock = threading.Lock()
+        if sqlite_path:
+            self._db = sqlite3.connect(sqlite_path, check_same_thread=False)
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS tasks (id TEXT PRIMARY KEY, task TEXT NOT NULL, stored_at REAL NOT NULL)"
+            )
+            self._db.execute("CREATE INDEX IF NOT EXISTS tasks_stored_at ON tasks (stored_at)")
+            self._db.commit()
+
+    async def save(self, task: Task, context: ServerCallContext | None = None) -> None:
+        spilled = self._put(task)
+        spilled += self._evict()
+        if spilled and self._db is not None:
+            await asyncio.to_thread(self._disk_set, spilled)
+
+    async def get(self, task_id: str, context: ServerCallContext | None = None) -> Task | None:
+        self._expire()
+        entry = self._tasks.get(task_id)
+        if entry is not None:
+            entry.touched_at = time.time()
+            self._tasks.move_to_end(task_id)
+            return entry.task
+
+        if self._db is None:
+            return None
+        task = await asyncio.to_thread(self._disk_take, task_id)
+        if task is not None:
+            self.metrics.spill_hits += 1
+            await self.save(task)
+        return task
+
+    async def delete(self, task_id: str, context: ServerCallContext | None = None) -> None:
+        self._remove(task_id)
+        if self._db is not None:
+            await asyncio.to_thread(self._disk_take, task_id)
+
+    def stats(self) -> dict[str, Any]:
+        return {
+            **asdict(self.metrics),
+            "tasks": len(self._tasks),
+            "contexts": len(self._contexts),
+            "bytes": self._bytes,
+            "max_tasks": self.max_tasks,
+            "max_bytes": self.max_bytes,
+        }
+
+    def _put(self, task: Task) -> list[Task]:
+        self._remove(task.id)
+        entry = _Entry(task, _estimate_size(task), time.time())
+        self._tasks[task.id] = entry
+        self._bytes += entry.size
+
+        context_tasks = self._contexts.setdefault(task.context_id, OrderedDict())
+        context_tasks[task.id] = None
+        spilled = []
+        while len(context_tasks) > self.max_tasks_per_context:
+            spilled.append(self._remove(next(iter(context_tasks))))
+            self.metrics.evicted_context += 1
+        return spilled
+
+    def _evict(self) -> list[Task]:
+        self._expire()
+        spilled = []
+        while len(self._tasks) > 1 and (len(self._tasks) > self.max_tasks or self._bytes > self.max_bytes):
+            spilled.append(self._remove(next(iter(self._tasks))))
+            self.metrics.evicted_lru += 1
+        return spilled
+
+    def _expire(self) -> None:
+        cutoff = time.time() - self.idle_ttl
+        while self._tasks and next(iter(self._tasks.values())).touched_at < cutoff:
+            self._remove(next(iter(self._tasks)))
+            self.metrics.expired += 1
+
+    def _remove(self, task_id: str) -> Task | None:
+        entry = self._tasks.pop(task_id, None)
+        if entry is None:
+            return None
+        self._bytes -= entry.size
+        context_tasks = self._contexts.get(entry.task.context_id)
+        if context_tasks is not None:
+            context_tasks.pop(task_id, None)
+            if not context_tasks:
+                del self._contexts[entry.task.context_id]
+        return entry.task
+
+    def _disk_set(self, tasks: list[Task]) -> None:
+        now = time.time()
+        with self._db_lock:
+            self._db.executemany(
+                "INSERT OR REPLACE INTO tasks (id, task, stored_at) VALUES (?, ?, ?)",
+                [(task.id, task.model_dump_json(exclude_none=True), now) for task in tasks],
+            )
+            # Expired rows are dropped on write so the file does not grow without bound.
+            self._db.execute("DELETE FROM tasks WHERE stored_at < ?", (now - self.idle_ttl,))
+            self._db.commit()
+        self.metrics.spilled += len(tasks)
+
+    def _disk_take(self, task_id: str) -> Task | None:
+        with self._db_lock:
+            row = self._db.execute(
+                "SELECT task FROM tasks WHERE id = ? AND stored_at >= ?", (task_id, time.time() - self.idle_ttl)
+            ).fetchone()
+            self._db.execute("DELETE FROM tasks WHERE id = ?", (task_id,))
+            self._db.commit()
+        return Task.model_validate_json(row[0]) if row else None
+
+
+def _estimate_size(task: Task) -> int:
+    # Text dominates a task's size; sizing it without serializing keeps saves cheap
+    # while an answer is streamed chunk by chunk.
+    parts: list[Part] = [part for message in task.history or [] for part in message.parts]
+    parts += [part for artifact in task.artifacts or [] for part in artifact.parts]
+    return TASK_OVERHEAD_BYTES + sum(len(part.root.text) for part in parts if isinstance(part.root, TextPart))
+
+
+task_store = BoundedTaskStore()
@@ -0,0 +1,58 @@
+import re
+
+OPEN_TAG = "<thinking>"
+CLOSE_TAG = "</thinking>"
+
+
+def strip_thinking(text: str) -> str:
+    return re.sub(r"<thinking>.*?</thinking>", "", text, flags=re.DOTALL)
+
+
+class ThinkingFilter:
+    """Incrementally removes `<thinking>...</thinking>` blocks from streamed text.
+
+    `feed()` returns the part of each chunk that is safe to emit right away. Text that
+    could be the start of a tag split across chunks (e.g. "<thin") is held back until
+    the next chunk decides it; `flush()` releases whatever remains at the end. The
+    output is identical to running `strip_thinking` over the concatenated stream,
+    except that an unterminated block is dropped rather than emitted.
+    """
+
+    def __init__(self):
+        self._inside = False
+        self._pending = ""
+
+    def feed(self, chunk: str) -> str:
+        text = self._pending + chunk
+        self._pending = ""
+        emitted = []
+
+        while text:
+            tag = CLOSE_TAG if self._inside else OPEN_TAG
+            index = text.find(tag)
+            if index >= 0:
+                if not self._inside:
+                    emitted.append(text[:index])
+                text = text[index + len(tag) :]
+                self._inside = not self._inside
+                continue
+
+            # No complete tag: keep back the longest suffix that may begin one.
+            keep = _partial_tag_suffix(text, tag)
+            if not self._inside:
+                emitted.append(text[: len(text) - keep])
+            self._pending = text[len(text) - keep :]
+            break
+
+        return "".join(emitted)
+
+    def flush(self) -> str:
+        pending, self._pending = self._pending, ""
+        return "" if self._inside else pending
+
+
+def _partial_tag_suffix(text: str, tag: str) -> int:
+    for length in range(min(len(tag) - 1, len(text)), 0, -1):
+        if text.endswith(tag[:length]):
+            return length
+    return 0
@@ -0,0 +1,167 @@
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from typing import Any, Callable
+
+from mcp.types import ServerNotification, Tool as MCPTool, ToolListChangedNotification
+from strands.tools.mcp.mcp_client import MCPClient
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_TOOL_SCHEMA_TTL = float(os.environ.get("MCP_TOOL_SCHEMA_TTL", "300"))  # [sec]
+REFRESH_WORKERS = 2  # threads shared by the refreshes of every endpoint
+
+
+@dataclass
+class _Entry:
+    tools: list[MCPTool]
+    fingerprint: str
+    fetched_at: float
+    version: int = 1
+    stale: bool = False
+    refreshing: bool = False
+    refresh_again: bool = False  # invalidated while refreshing; the fetch may predate the change
+    fetch: Callable[[], list[MCPTool]] | None = field(default=None, repr=False)
+
+
+class ToolSchemaCache:
+    """In-memory MCP tool schemas keyed by endpoint URL.
+
+    Lookups are always served from memory once an endpoint has been fetched. Entries
+    older than the TTL, or invalidated by a `tools/list_changed` notification, are
+    refreshed on a small shared pool of background threads while the previous
+    schemas keep being served. Refreshes of one endpoint never overlap: requests
+    made during a refresh are coalesced into it, or into one more refresh when a
+    `tools/list_changed` notification arrived after it started.
+    """
+
+    def __init__(self, ttl: float = DEFAULT_TOOL_SCHEMA_TTL):
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self.refreshes = 0
+        self.changes = 0
+
+        self._entries: dict[str, _Entry] = {}
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(REFRESH_WORKERS, thread_name_prefix="mcp-tool-schema-refresh")
+
+    def get(self, endpoint: str, fetch: Callable[[], list[MCPTool]]) -> list[MCPTool]:
+        tools = self._lookup(endpoint, fetch)
+        if tools is None:
+            tools = fetch()
+            self._store(endpoint, tools, fetch)
+        return tools
+
+    async def get_async(self, endpoint: str, fetch: Callable[[], list[MCPTool]]) -> list[MCPTool]:
+        """`get` for code on an event loop: a miss is fetched on a worker thread, not on the loop."""
+        tools = self._lookup(endpoint, fetch)
+        if tools is None:
+            tools = await asyncio.to_thread(fetch)
+            self._store(endpoint, tools, fetch)
+        return tools
+
+    def version(self, endpoint: str) -> int:
+        entry = self._entries.get(endpoint)
+        return entry.version if entry is not None else 0
+
+    def invalidate(self, endpoint: str) -> None:
+        with self._lock:
+            entry = self._entries.get(endpoint)
+            if entry is None:
+                return
+            entry.stale = True
+            if entry.fetch is not None:
+                self._schedule_refresh(endpoint, entry, again=True)
+
+    def stats(self) -> dict[str, Any]:
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "refreshes": self.refreshes,
+            "changes": self.changes,
+            "endpoints": {endpoint: entry.version for endpoint, entry in self._entries.items()},
+        }
+
+    def _lookup(self, endpoint: str, fetch: Callable[[], list[MCPTool]]) -> list[MCPTool] | None:
+        with self._lock:
+            entry = self._entries.get(endpoint)
+            if entry is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            entry.fetch = fetch
+            if entry.stale or time.monotonic() - entry.fetched_at > self.ttl:
+                self._schedule_refresh(endpoint, entry)
+            return entry.tools
+
+    def _store(self, endpoint: str, tools: list[MCPTool], fetch: Callable[[], list[MCPTool]]) -> None:
+        fingerprint = _fingerprint(tools)
+
+        with self._lock:
+            entry = self._entries.get(endpoint)
+            if entry is None:
+                self._entries[endpoint] = _Entry(tools, fingerprint, time.monotonic(), fetch=fetch)
+                return
+
+            if entry.fingerprint != fingerprint:
+                self.changes += 1
+                entry.version += 1
+                logger.info(f"Tool schemas for {endpoint} changed (version {entry.version})")
+
+            entry.tools = tools
+            entry.fingerprint = fingerprint
+            entry.fetched_at = time.monotonic()
+            entry.stale = False
+
+    def _schedule_refresh(self, endpoint: str, entry: _Entry, again: bool = False) -> None:
+        # Called with self._lock held.
+        if entry.fetch is None:
+            return
+        if entry.refreshing:
+            entry.refresh_again = entry.refresh_again or again
+            return
+        entry.refreshing = True
+        self._executor.submit(self._refresh, endpoint, entry)
+
+    def _refresh(self, endpoint: str, entry: _Entry) -> None:
+        try:
+            self._store(endpoint, entry.fetch(), entry.fetch)
+            self.refreshes += 1
+        except Exception:
+            logger.exception(f"Failed to refresh tool schemas for {endpoint}")
+        finally:
+            with self._lock:
+                if entry.refresh_again:
+                    entry.refresh_again = False
+                    entry.stale = True
+                    self._executor.submit(self._refresh, endpoint, entry)
+                else:
+                    entry.refreshing = False
+
+
+class ListChangedMCPClient(MCPClient):
+    """MCPClient that reports `notifications/tools/list_changed` to a callback."""
+
+    def __init__(self, transport_callable, on_tools_changed: Callable[[], None], **kwargs):
+        super().__init__(transport_callable, **kwargs)
+        self._on_tools_changed = on_tools_changed
+
+    async def _handle_error_message(self, message):
+        if isinstance(message, ServerNotification) and isinstance(message.root, ToolListChangedNotification):
+            self._on_tools_changed()
+        await super()._handle_error_message(message)
+
+
+def _fingerprint(tools: list[MCPTool]) -> str:
+    payload = json.dumps([tool.model_dump(mode="json") for tool in tools], sort_keys=True)
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+
+tool_schema_cache = ToolSchemaCache()
@@ -0,0 +1,120 @@
+import json
+import logging
+import os
+import threading
+from typing import Any, Mapping, Sequence
+
+from opentelemetry import context, propagate, trace
+from opentelemetry.sdk.resources import Resource
+from opentelemetry.sdk.trace import ReadableSpan, TracerProvider
+from opentelemetry.sdk.trace.export import BatchSpanProcessor, SpanExporter, SpanExportResult
+from starlette.types import ASGIApp, Receive, Scope, Send
+from strands.telemetry import StrandsTelemetry
+from strands.telemetry.config import get_otel_resource
+
+logger = logging.getLogger(__name__)
+
+# Comma-separated: "jsonl", "console" and/or "otlp" (OTEL_EXPORTER_OTLP_* settings). Unset disables tracing.
+TRACE_EXPORTERS = [name.strip() for name in os.environ.get("TRACE_EXPORTER", "").split(",") if name.strip()]
+TRACE_JSONL_PATH = os.environ.get("TRACE_JSONL_PATH", "traces.jsonl")
+
+# Key of the W3C trace context (traceparent / tracestate) in A2A message metadata
+# and MCP request `_meta`, for hops where HTTP headers may not be forwarded.
+TRACE_CONTEXT_KEY = "trace_context"
+
+tracer = trace.get_tracer("omnisearch")
+
+
+class JsonLinesSpanExporter(SpanExporter):
+    """Appends every finished span to a local file as one JSON object per line."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+
+    def export(self, spans: Sequence[ReadableSpan]) -> SpanExportResult:
+        lines = [json.dumps(_span_record(span), ensure_ascii=False, default=str) + "\n" for span in spans]
+        with self._lock, open(self.path, "a") as file:
+            file.writelines(lines)
+        return SpanExportResult.SUCCESS
+
+    def shutdown(self) -> None:
+        pass
+
+
+def setup_tracing(service_name: str) -> None:
+    """Install a tracer provider for `service_name` with the exporters named in TRACE_EXPORTER.
+
+    Strands' own agent, model and tool spans go to the same provider, so they nest
+    with the spans of this workspace.
+    """
+    if not TRACE_EXPORTERS:
+        return
+
+    provider = TracerProvider(resource=get_otel_resource().merge(Resource({"service.name": service_name})))
+    telemetry = StrandsTelemetry(tracer_provider=provider)
+    trace.set_tracer_provider(provider)
+
+    for name in TRACE_EXPORTERS:
+        if name == "console":
+            telemetry.setup_console_exporter()
+        elif name == "otlp":
+            telemetry.setup_otlp_exporter()
+        elif name == "jsonl":
+            provider.add_span_processor(BatchSpanProcessor(JsonLinesSpanExporter(TRACE_JSONL_PATH)))
+        else:
+            logger.warning(f"Unknown trace exporter '{name}'")
+    logger.info(f"Tracing {service_name} to {', '.join(TRACE_EXPORTERS)}")
+
+
+def inject_trace_context(span_context: context.Context | None = None) -> dict[str, str]:
+    """The current (or given) trace context as W3C headers, e.g. to put in message metadata."""
+    carrier: dict[str, str] = {}
+    propagate.inject(carrier, context=span_context)
+    return carrier
+
+
+def extract_trace_context(metadata: Mapping[str, Any] | None) -> context.Context | None:
+    """The trace context carried under TRACE_CONTEXT_KEY in `metadata`, if any."""
+    carrier = (metadata or {}).get(TRACE_CONTEXT_KEY)
+    if not isinstance(carrier, Mapping) or "traceparent" not in carrier:
+        return None
+    return propagate.extract(carrier)
+
+
+class TraceContextMiddleware:
+    """ASGI middleware that continues the trace of incoming `traceparent` headers."""
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        headers = {key.decode("latin-1"): value.decode("latin-1") for key, value in scope["headers"]}
+        token = context.attach(propagate.extract(headers))
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            context.detach(token)
+
+
+def _span_record(span: ReadableSpan) -> dict[str, Any]:
+    return {
+        "name": span.name,
+        "service": span.resource.attributes.get("service.name"),
+        "trace_id": format(span.context.trace_id, "032x"),
+        "span_id": format(span.context.span_id, "016x"),
+        "parent_id": format(span.parent.span_id, "016x") if span.parent else None,
+        "kind": span.kind.name,
+        "start": span.start_time,
+        "duration_ms": round((span.end_time - span.start_time) / 1e6, 3),
+        "status": span.status.status_code.name,
+        "attributes": dict(span.attributes or {}),
+        "events": [
+            {"name": event.name, "offset_ms": round((event.timestamp - span.start_time) / 1e6, 3)}
+            for event in span.events
+        ],
+    }
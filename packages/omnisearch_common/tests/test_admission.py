@@ -0,0 +1,99 @@
+import asyncio
+import json
+import time
+
+import pytest
+from starlette.applications import Starlette
+from starlette.responses import JSONResponse
+from starlette.routing import Route
+from starlette.testclient import TestClient
+
+from omnisearch_common.admission import AdmissionControl, AdmissionMiddleware, Rejected
+
+
+def test_full_queue_is_rejected_with_429():
+    async def main():
+        control = AdmissionControl(max_in_flight=1, max_queue=1, max_queue_wait=5)
+        await control.acquire()
+        queued = asyncio.create_task(control.acquire())
+        await asyncio.sleep(0)
+        with pytest.raises(Rejected) as rejected:
+            await control.acquire()
+        control.release(0.01)
+        await queued
+        return rejected.value.status_code, control.stats()
+
+    status_code, stats = asyncio.run(main())
+    assert status_code == 429
+    assert stats["admitted"] == 2
+    assert stats["rejected_queue_full"] == 1
+
+
+def test_predicted_wait_over_budget_is_rejected_with_503():
+    async def main():
+        control = AdmissionControl(max_in_flight=1, max_queue=10, max_queue_wait=1)
+        await control.acquire()
+        control.release(5.0)  # runs take 5s, so a queued request cannot start within 1s
+        await control.acquire()
+        with pytest.raises(Rejected) as rejected:
+            await control.acquire()
+        return rejected.value
+
+    rejected = asyncio.run(main())
+    assert rejected.status_code == 503
+    assert rejected.retry_after == 5.0
+
+
+def test_middleware_only_queues_agent_runs():
+    control = AdmissionControl(max_in_flight=1, max_queue=0, max_queue_wait=1)
+
+    async def endpoint(request):
+        return JSONResponse({"method": json.loads(await request.body())["method"]})
+
+    app = AdmissionMiddleware(Starlette(routes=[Route("/", endpoint, methods=["POST"])]), control)
+    with TestClient(app) as client:
+        asyncio.run(control.acquire())  # saturated
+        started = time.monotonic()
+        send = client.post("/", json={"jsonrpc": "2.0", "id": 1, "method": "message/send"})
+        cancel = client.post("/", json={"jsonrpc": "2.0", "id": 2, "method": "tasks/cancel"})
+    assert send.status_code == 429
+    assert "Retry-After" in send.headers
+    assert cancel.json() == {"method": "tasks/cancel"}  # the body reaches the app intact
+    assert time.monotonic() - started < 1
+
+
+def test_the_wait_budget_is_capped_by_the_callers_deadline():
+    async def main():
+        control = AdmissionControl(max_in_flight=1, max_queue=10, max_queue_wait=30)
+        await control.acquire()
+        control.release(5.0)
+        await control.acquire()
+        with pytest.raises(Rejected) as predicted:
+            await control.acquire(timeout=2)  # a run takes 5s, the caller has 2s left
+        control.service_seconds = None  # no prediction: the request queues until its deadline
+        started = time.monotonic()
+        with pytest.raises(Rejected) as timed_out:
+            await control.acquire(timeout=0.05)
+        return predicted.value, timed_out.value, time.monotonic() - started, control.stats()
+
+    predicted, timed_out, waited, stats = asyncio.run(main())
+    assert predicted.status_code == timed_out.status_code == 503
+    assert waited < 1
+    assert stats["rejected_deadline"] == 1
+    assert stats["timed_out"] == 1
+
+
+def test_middleware_passes_on_the_deadline_left_after_admission():
+    control = AdmissionControl(max_in_flight=1, max_queue=1, max_queue_wait=5)
+
+    async def endpoint(request):
+        body = await request.body()
+        assert int(request.headers["content-length"]) == len(body)
+        return JSONResponse(json.loads(body)["params"]["message"]["metadata"])
+
+    app = AdmissionMiddleware(Starlette(routes=[Route("/", endpoint, methods=["POST"])]), control)
+    message = {"role": "user", "parts": [{"kind": "text", "text": "Hi"}], "metadata": {"timeout": 10}}
+    request = {"jsonrpc": "2.0", "id": 1, "method": "message/send", "params": {"message": message}}
+    with TestClient(app) as client:
+        response = client.post("/", json=request)
+    assert 9 < response.json()["timeout"] <= 10
@@ -0,0 +1,96 @@
+import asyncio
+
+import httpx
+from a2a.types import AgentCapabilities, AgentCard
+from a2a.utils.constants import AGENT_CARD_WELL_KNOWN_PATH, PREV_AGENT_CARD_WELL_KNOWN_PATH
+
+from omnisearch_common.agent_cards import AgentCardRegistry
+
+URL = "http://agent.invalid"
+CARD = AgentCard(
+    name="AWS Knowledge Agent",
+    description="Answers questions about AWS.",
+    url=f"{URL}/",
+    version="1.0.0",
+    capabilities=AgentCapabilities(streaming=True),
+    default_input_modes=["text"],
+    default_output_modes=["text"],
+    skills=[],
+)
+
+
+class Agent:
+    """Serves CARD at `path` with an ETag; every other path is 404."""
+
+    def __init__(self, path: str = AGENT_CARD_WELL_KNOWN_PATH):
+        self.path = path
+        self.down = False
+        self.requests: list[httpx.Request] = []
+
+    def handle(self, request: httpx.Request) -> httpx.Response:
+        self.requests.append(request)
+        if self.down:
+            return httpx.Response(502)
+        if request.url.path != self.path:
+            return httpx.Response(404)
+        if request.headers.get("if-none-match") == '"v1"':
+            return httpx.Response(304, headers={"ETag": '"v1"'})
+        return httpx.Response(200, headers={"ETag": '"v1"'}, content=CARD.model_dump_json(exclude_none=True))
+
+
+def make_registry(agent: Agent, **kwargs) -> AgentCardRegistry:
+    registry = AgentCardRegistry(cache_path=None, **kwargs)
+    registry._http = httpx.AsyncClient(transport=httpx.MockTransport(agent.handle))
+    return registry
+
+
+async def settle(registry: AgentCardRegistry) -> None:
+    """Wait for the background revalidation a stale lookup started."""
+    await asyncio.gather(*registry._fetching.values(), return_exceptions=True)
+
+
+def test_falls_back_to_the_previous_well_known_path():
+    agent = Agent(PREV_AGENT_CARD_WELL_KNOWN_PATH)
+    registry = make_registry(agent)
+
+    card = asyncio.run(registry.get(f"{URL}/"))
+    assert card.name == CARD.name
+    assert [request.url.path for request in agent.requests] == [
+        AGENT_CARD_WELL_KNOWN_PATH,
+        PREV_AGENT_CARD_WELL_KNOWN_PATH,
+    ]
+
+
+def test_stale_cards_are_revalidated_conditionally():
+    agent = Agent()
+    registry = make_registry(agent, ttl=0)
+
+    async def main():
+        first = await registry.get(URL)
+        second = await registry.get(URL)  # stale at once: served, and revalidated in the background
+        await settle(registry)
+        return first, second
+
+    first, second = asyncio.run(main())
+    assert second is first
+    assert agent.requests[-1].headers["if-none-match"] == '"v1"'
+    assert registry.stats()["fetched"] == 1
+    assert registry.stats()["revalidated"] == 1
+
+
+def test_failed_revalidation_backs_off():
+    agent = Agent()
+    registry = make_registry(agent, ttl=0.05, retry_after=60)
+
+    async def main():
+        card = await registry.get(URL)
+        await asyncio.sleep(0.1)
+        agent.down = True
+        for _ in range(3):
+            assert await registry.get(URL) is card  # the cached card is kept
+            await settle(registry)
+
+    asyncio.run(main())
+    assert len(agent.requests) == 2  # the download and one failed revalidation
+    assert registry.stats()["failed_revalidations"] == 1
+
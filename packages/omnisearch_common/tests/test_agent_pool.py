@@ -0,0 +1,120 @@
+import asyncio
+import time
+
+from strands.models import Model
+
+from omnisearch_common.agent_pool import AgentPool
+from omnisearch_common.agent_template import AgentTemplate
+
+
+class FakeModel(Model):
+    """Answers every request with the same text, without calling Bedrock."""
+
+    def update_config(self, **model_config):
+        pass
+
+    def get_config(self):
+        return {}
+
+    async def structured_output(self, output_model, prompt, system_prompt=None, **kwargs):
+        raise NotImplementedError
+        yield
+
+    async def stream(self, messages, tool_specs=None, system_prompt=None, **kwargs):
+        yield {"messageStart": {"role": "assistant"}}
+        yield {"contentBlockStart": {"start": {}}}
+        yield {"contentBlockDelta": {"delta": {"text": "answer"}}}
+        yield {"contentBlockStop": {}}
+        yield {"messageStop": {"stopReason": "end_turn"}}
+        yield {
+            "metadata": {
+                "usage": {"inputTokens": 1, "outputTokens": 1, "totalTokens": 2},
+                "metrics": {"latencyMs": 1},
+            }
+        }
+
+
+def make_pool(size: int = 1, idle_ttl: float = 300) -> AgentPool:
+    return AgentPool(AgentTemplate(model=FakeModel(), name="test"), size=size, idle_ttl=idle_ttl)
+
+
+def test_concurrent_checkouts_get_distinct_agents():
+    pool = make_pool(size=2)
+
+    async def main():
+        async with pool.agent() as first, pool.agent() as second:
+            return first is not second
+
+    assert asyncio.run(main())
+    assert pool.stats()["created"] == 2
+
+
+def test_checkin_resets_the_agent_for_the_next_task():
+    pool = make_pool()
+
+    async def main():
+        async with pool.agent() as agent:
+            await agent.invoke_async("What is S3 Vectors?")
+            agent.state.set("seen", True)
+            used = agent
+        async with pool.agent() as agent:
+            return used, agent, list(agent.messages), agent.state.get("seen"), agent.event_loop_metrics.cycle_count
+
+    used, reused, messages, seen, cycles = asyncio.run(main())
+    assert reused is used
+    assert messages == []
+    assert seen is None
+    assert cycles == 0
+
+
+def test_grows_when_every_agent_is_busy():
+    pool = make_pool()
+
+    async def main():
+        async with pool.agent(), pool.agent():
+            return pool.stats()
+
+    busy = asyncio.run(main())
+    assert busy["created"] == 2
+    assert busy["peak_in_use"] == 2
+    assert pool.stats()["idle"] == 2
+
+
+def test_surplus_agents_idle_past_the_ttl_are_dropped_on_checkin():
+    pool = make_pool(idle_ttl=0.01)
+    agents = [pool._checkout() for _ in range(3)]
+    pool._checkin(agents[0])
+    pool._checkin(agents[1])
+    time.sleep(0.05)
+    pool._checkin(agents[2])
+
+    stats = pool.stats()
+    assert stats["idle"] == pool.size
+    assert stats["dropped"] == 2
+
+
+def test_surplus_agents_idle_past_the_ttl_are_dropped_on_checkout():
+    pool = make_pool()
+    agents = [pool._checkout() for _ in range(3)]
+    for agent in agents:
+        pool._checkin(agent)
+    pool.idle_ttl = 0  # everything returned so far has now expired
+    pool._checkout()
+
+    stats = pool.stats()
+    assert stats["idle"] == 1  # one kept for the minimum size, one checked out
+    assert stats["dropped"] == 1
+
+
+def test_background_trimmer_shrinks_a_quiet_pool_to_its_size():
+    pool = make_pool(idle_ttl=0.05)
+    agents = [pool._checkout() for _ in range(3)]
+    for agent in agents:
+        pool._checkin(agent)
+    trimmer = pool._trimmer
+    trimmer.join(timeout=2)  # it exits once no surplus agent is left
+
+    assert not trimmer.is_alive()
+    assert pool._trimmer is None
+    assert pool.stats()["idle"] == pool.size
+    assert pool.stats()["dropped"] == 2
@@ -0,0 +1,110 @@
+import asyncio
+from collections import deque
+
+import pytest
+from strands.models import Model
+from strands.types.exceptions import ModelThrottledException
+
+from omnisearch_common.bedrock_model import ModelChainExhausted, ResilientModel, TokenBucket, _latencies
+
+
+def test_token_bucket_allows_a_burst_then_paces():
+    async def main():
+        bucket = TokenBucket(rate=20, capacity=3)
+        # Concurrent callers queue behind each other: each waits one more interval.
+        return await asyncio.gather(*(bucket.acquire() for _ in range(5)))
+
+    waits = asyncio.run(main())
+    assert waits[:3] == [0.0, 0.0, 0.0]
+    assert waits[3] == pytest.approx(0.05, abs=0.02)
+    assert waits[4] == pytest.approx(0.1, abs=0.02)
+
+
+def test_token_bucket_without_rate_never_waits():
+    async def main():
+        bucket = TokenBucket(rate=0, capacity=1)
+        return [await bucket.acquire() for _ in range(3)]
+
+    assert asyncio.run(main()) == [0.0, 0.0, 0.0]
+
+
+class ScriptedModel(Model):
+    """Plays one scripted behaviour per request: "throttle", "stall", "fail" or "answer"."""
+
+    def __init__(self, model_id: str, *script: str):
+        self.config = {"model_id": model_id}
+        self.script = list(script)
+        self.requests = 0
+        self.cancelled = 0
+
+    def update_config(self, **model_config):
+        pass
+
+    def get_config(self):
+        return self.config
+
+    async def structured_output(self, output_model, prompt, system_prompt=None, **kwargs):
+        raise NotImplementedError
+        yield
+
+    async def stream(self, messages, tool_specs=None, system_prompt=None, **kwargs):
+        behaviour = self.script[min(self.requests, len(self.script) - 1)]
+        self.requests += 1
+        if behaviour == "throttle":
+            raise ModelThrottledException("Too many requests")
+        if behaviour == "fail":
+            raise ValueError("Malformed request")
+        if behaviour == "stall":
+            try:
+                await asyncio.sleep(5)
+            except asyncio.CancelledError:
+                self.cancelled += 1
+                raise
+        yield {"messageStart": {"role": "assistant"}}
+        yield {"contentBlockDelta": {"delta": {"text": self.config["model_id"]}}}
+        yield {"messageStop": {"stopReason": "end_turn"}}
+
+
+def answer(model: ResilientModel) -> str:
+    async def main():
+        return [event async for event in model.stream([{"role": "user", "content": [{"text": "Hi"}]}])]
+
+    events = asyncio.run(main())
+    return "".join(event["contentBlockDelta"]["delta"]["text"] for event in events if "contentBlockDelta" in event)
+
+
+def test_throttled_requests_are_retried():
+    primary = ScriptedModel("test.retry-v1", "throttle", "throttle", "answer")
+    assert answer(ResilientModel([primary], max_attempts=3, base_delay=0)) == "test.retry-v1"
+    assert primary.requests == 3
+
+
+def test_falls_back_to_the_next_model_once_attempts_are_used_up():
+    primary = ScriptedModel("test.fallback-primary-v1", "throttle")
+    fallback = ScriptedModel("test.fallback-secondary-v1", "answer")
+    assert answer(ResilientModel([primary, fallback], max_attempts=2, base_delay=0)) == "test.fallback-secondary-v1"
+    assert primary.requests == 2
+    assert fallback.requests == 1
+
+
+def test_an_exhausted_chain_raises_and_other_errors_are_not_retried():
+    chain = [ScriptedModel("test.exhausted-a-v1", "throttle"), ScriptedModel("test.exhausted-b-v1", "throttle")]
+    with pytest.raises(ModelChainExhausted):
+        answer(ResilientModel(chain, max_attempts=2, base_delay=0))
+    assert [model.requests for model in chain] == [2, 2]
+
+    failing = ScriptedModel("test.failing-v1", "fail")
+    with pytest.raises(ValueError):
+        answer(ResilientModel([failing], max_attempts=3, base_delay=0))
+    assert failing.requests == 1
+
+
+def test_a_stalled_start_is_hedged_and_the_loser_cancelled():
+    primary = ScriptedModel("test.hedge-v1", "stall", "answer")
+    _latencies["test.hedge-v1"] = deque([0.01] * 20)
+    try:
+        assert answer(ResilientModel([primary], hedge_percentile=0.95)) == "test.hedge-v1"
+    finally:
+        del _latencies["test.hedge-v1"]
+    assert primary.requests == 2
+    assert primary.cancelled == 1
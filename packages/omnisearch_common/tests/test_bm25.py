@@ -0,0 +1,21 @@
+from omnisearch_common.bm25 import BM25, content_terms, tokenize
+
+
+def test_tokenize_splits_words_and_casefolds():
+    assert tokenize("Amazon S3 Vectors!") == ["amazon", "s3", "vectors"]
+
+
+def test_tokenize_japanese_by_script():
+    # Katakana runs stay whole, kanji runs become bigrams.
+    assert tokenize("ベクトル検索機能") == ["ベクトル", "検索", "索機", "機能"]
+
+
+def test_content_terms_drop_stopwords_and_hiragana():
+    assert content_terms(tokenize("What is the limit of S3 とは")) == ["limit", "s3"]
+
+
+def test_scores_rank_matching_documents_first():
+    documents = [tokenize(text) for text in ["lambda cold start", "s3 bucket versioning", "s3 vectors index"]]
+    scores = BM25(documents).scores(tokenize("s3 vectors"))
+    assert scores.index(max(scores)) == 2
+    assert scores[0] == 0
@@ -0,0 +1,43 @@
+import re
+
+from omnisearch_common.context_budget import ContextBudget, split_sections
+
+INTRO = "# Amazon S3 Vectors\n\n" + "A vector bucket holds vector indexes of embeddings. " * 8 + "\n\n"
+LAMBDA = "## Lambda cold starts\n\n" + "Provisioned concurrency keeps functions initialized. " * 8 + "\n\n"
+CODE = "## Example\n\n```bash\n# check the credentials first\naws sts get-caller-identity\n```\n\n"
+QUOTAS = "## Vector index quotas\n\n" + "Each vector index holds up to fifty million vectors. " * 8 + "\n"
+PAGE = INTRO + LAMBDA + CODE + QUOTAS
+
+MARKER = re.compile(r"<!-- characters (\d+)-(\d+) -->\n")
+
+
+def test_split_sections_at_headings_outside_code_fences():
+    starts = [section.start for section in split_sections(PAGE, max_chars=10_000)]
+    assert starts == [0, len(INTRO), len(INTRO + LAMBDA), len(INTRO + LAMBDA + CODE)]
+
+
+def test_oversized_sections_are_split_at_paragraph_breaks():
+    text = "# Title\n\n" + "\n\n".join("word " * 20 for _ in range(5))
+    sections = split_sections(text, max_chars=250)
+    assert len(sections) > 1
+    assert all(section.end - section.start <= 250 for section in sections)
+    assert "".join(text[section.start : section.end] for section in sections) == text
+
+
+def test_short_pages_are_kept_whole():
+    assert ContextBudget(budget_tokens=1000).trim(PAGE, "vector index quotas") == PAGE
+
+
+def test_trimmed_sections_are_marked_with_their_offsets_in_the_page():
+    base_offset = 5000  # the page was read from start_index=5000
+    trimmed = ContextBudget(budget_tokens=300, section_tokens=300).trim(PAGE, "vector index quotas", base_offset)
+
+    assert trimmed.startswith("[Showing 2 of 4 sections")
+    assert "Provisioned concurrency" not in trimmed
+    markers = list(MARKER.finditer(trimmed))
+    assert len(markers) == 2
+    for marker, following in zip(markers, markers[1:] + [None]):
+        start, end = int(marker[1]) - base_offset, int(marker[2]) - base_offset
+        quoted = trimmed[marker.end() : following.start() if following else len(trimmed)]
+        assert quoted.strip("\n") == PAGE[start:end].strip("\n")
+    assert [int(marker[1]) - base_offset for marker in markers] == [0, len(INTRO + LAMBDA + CODE)]
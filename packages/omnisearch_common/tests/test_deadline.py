@@ -0,0 +1,59 @@
+import asyncio
+import time
+
+import pytest
+
+from omnisearch_common.deadline import (
+    DEADLINE_KEY,
+    deadline_scope,
+    enforce_deadline,
+    extract_deadline,
+    inject_deadline,
+    remaining,
+)
+
+
+def test_no_deadline_by_default():
+    assert remaining() is None
+    assert inject_deadline({}) == {}
+
+
+def test_scopes_only_bring_the_deadline_forward():
+    with deadline_scope(10):
+        with deadline_scope(60):
+            assert remaining() <= 10
+        with deadline_scope(1):
+            assert remaining() <= 1
+    assert remaining() is None
+
+
+def test_budget_round_trips_through_metadata():
+    with deadline_scope(5):
+        metadata = inject_deadline({"other": 1})
+    assert 4 < metadata[DEADLINE_KEY] <= 5
+    assert extract_deadline(metadata) == metadata[DEADLINE_KEY]
+    assert extract_deadline({DEADLINE_KEY: "not a number"}) is None
+    assert extract_deadline(None) is None
+    assert extract_deadline({DEADLINE_KEY: -1}) == 0
+
+
+def test_enforce_deadline_cancels_the_block():
+    async def main():
+        started = time.monotonic()
+        with pytest.raises(TimeoutError):
+            async with enforce_deadline(0.05):
+                await asyncio.sleep(10)
+        return time.monotonic() - started
+
+    assert asyncio.run(main()) < 1
+
+
+def test_deadline_propagates_to_child_tasks():
+    async def child():
+        return remaining()
+
+    async def main():
+        with deadline_scope(3):
+            return await asyncio.create_task(child())
+
+    assert 2 < asyncio.run(main()) <= 3
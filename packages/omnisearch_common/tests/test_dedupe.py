@@ -0,0 +1,16 @@
+from omnisearch_common.dedupe import NearDuplicateDetector
+
+TEXT = " ".join(f"token{i}" for i in range(100))
+
+
+def test_finds_near_duplicates_of_earlier_blocks():
+    detector = NearDuplicateDetector(threshold=0.8)
+    found = detector.find([TEXT, "something else entirely " * 10, TEXT.replace("token50", "changed")])
+    assert found.originals == {2: 0}
+    assert found.tokens_saved > 0
+
+
+def test_dissimilar_blocks_are_kept():
+    detector = NearDuplicateDetector(threshold=0.8)
+    half = " ".join(f"token{i}" for i in range(50)) + " " + " ".join(f"other{i}" for i in range(50))
+    assert detector.find([TEXT, half]).originals == {}
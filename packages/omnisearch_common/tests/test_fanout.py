@@ -0,0 +1,61 @@
+import asyncio
+import time
+
+from omnisearch_common.deadline import deadline_scope
+from omnisearch_common.fanout import Specialist, collected_results, fan_out, format_results
+
+ANSWER = """# Result 1
+
+## Content
+
+{text}
+
+## Sources
+
+- https://docs.aws.amazon.com/{name}
+"""
+
+
+def specialist(name: str, delay: float = 0.0, error: str | None = None, timeout: float = 5) -> Specialist:
+    async def search(query: str) -> str:
+        await asyncio.sleep(delay)
+        if error is not None:
+            raise RuntimeError(error)
+        return ANSWER.format(text=f"{name} answers {query}.", name=name)
+
+    return Specialist(name, search, timeout=timeout)
+
+
+def test_a_slow_specialist_times_out_without_holding_up_the_others():
+    async def main():
+        started = time.monotonic()
+        results = await fan_out("lambda", [specialist("slow", delay=5, timeout=0.1), specialist("fast")])
+        return results, time.monotonic() - started
+
+    results, elapsed = asyncio.run(main())
+    assert [(result.specialist, result.status) for result in results] == [("slow", "timeout"), ("fast", "ok")]
+    assert elapsed < 1
+
+
+def test_the_request_deadline_bounds_every_specialist():
+    async def main():
+        with deadline_scope(0.1):
+            return await fan_out("lambda", [specialist("slow", delay=5), specialist("slower", delay=6)])
+
+    assert [result.status for result in asyncio.run(main())] == ["timeout", "timeout"]
+
+
+def test_partial_failures_still_return_the_other_results():
+    async def main():
+        collected = []
+        collected_results.set(collected)
+        results = await fan_out("s3", [specialist("broken", error="connection refused"), specialist("aws")])
+        return results, collected
+
+    results, collected = asyncio.run(main())
+    assert [result.status for result in results] == ["error", "ok"]
+    assert collected == results
+
+    answer = format_results(results)
+    assert "aws answers s3." in answer
+    assert "Unavailable specialists: broken (connection refused)" in answer
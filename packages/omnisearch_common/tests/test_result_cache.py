@@ -0,0 +1,81 @@
+import asyncio
+
+from omnisearch_common.result_cache import ResultCache, normalize_query
+
+
+class Fetcher:
+    def __init__(self, *values: str):
+        self.values = list(values)
+        self.queries: list[str] = []
+
+    async def __call__(self, query: str) -> str:
+        self.queries.append(query)
+        return self.values.pop(0)
+
+
+def test_normalize_query_folds_width_case_and_whitespace():
+    assert normalize_query("  Ｓ３　Vectors ") == "s3 vectors"
+    assert normalize_query("Straße") == normalize_query("STRASSE")
+
+
+def test_variants_of_a_query_share_an_entry():
+    cache = ResultCache(sqlite_path=None)
+    fetch = Fetcher("answer")
+
+    async def main():
+        return [await cache.get_or_fetch("aws", query, fetch) for query in ("S3 Vectors", "  ｓ3   vectors")]
+
+    assert asyncio.run(main()) == [("answer", "miss"), ("answer", "hit")]
+    assert fetch.queries == ["S3 Vectors"]
+
+
+def test_sqlite_tier_survives_a_restart_and_backs_the_memory_lru(tmp_path):
+    path = str(tmp_path / "results.sqlite3")
+    fetch = Fetcher("s3 answer", "lambda answer")
+
+    async def main():
+        cache = ResultCache(max_entries=1, sqlite_path=path)
+        await cache.get_or_fetch("aws", "s3", fetch)
+        await cache.get_or_fetch("aws", "lambda", fetch)  # evicts "s3" from memory only
+        evicted = await cache.get_or_fetch("aws", "s3", fetch)
+        restarted = await ResultCache(sqlite_path=path).get_or_fetch("aws", "lambda", fetch)
+        return evicted, restarted
+
+    assert asyncio.run(main()) == (("s3 answer", "hit"), ("lambda answer", "hit"))
+    assert fetch.queries == ["s3", "lambda"]
+
+
+def test_stale_entries_are_served_while_refreshed_in_the_background():
+    cache = ResultCache(ttl=0.05, stale_ttl=10, sqlite_path=None)
+    fetch = Fetcher("old", "new")
+
+    async def main():
+        await cache.get_or_fetch("aws", "s3", fetch)
+        await asyncio.sleep(0.1)
+        stale = await cache.get_or_fetch("aws", "s3", fetch)
+        await asyncio.sleep(0.01)  # let the refresh finish
+        return stale, await cache.get_or_fetch("aws", "s3", fetch)
+
+    assert asyncio.run(main()) == (("old", "stale"), ("new", "hit"))
+
+
+def test_entries_past_the_stale_window_are_fetched_again():
+    cache = ResultCache(ttl=0.01, stale_ttl=0.01, sqlite_path=None)
+    fetch = Fetcher("old", "new")
+
+    async def main():
+        await cache.get_or_fetch("aws", "s3", fetch)
+        await asyncio.sleep(0.05)
+        return await cache.get_or_fetch("aws", "s3", fetch)
+
+    assert asyncio.run(main()) == ("new", "miss")
+
+
+def test_blank_answers_are_not_cached():
+    cache = ResultCache(sqlite_path=None)
+    fetch = Fetcher("  ", "answer")
+
+    async def main():
+        return [await cache.get_or_fetch("aws", "s3", fetch) for _ in range(2)]
+
+    assert asyncio.run(main()) == [("  ", "miss"), ("answer", "miss")]
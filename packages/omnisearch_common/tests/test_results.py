@@ -0,0 +1,78 @@
+from omnisearch_common.dedupe import NearDuplicateDetector
+from omnisearch_common.results import aggregate, cites_sources, format_markdown, normalize_url, parse_results
+
+AWS = """<thinking>which tools</thinking>
+# Result 1
+
+## Content
+
+S3 Vectors stores vector embeddings.
+
+```python
+client.put_vectors()
+```
+
+## Sources
+
+- [What is S3 Vectors](https://docs.aws.amazon.com/s3/vectors/)
+
+---
+
+# Result 2
+
+## Content
+
+Second quote.
+
+## Sources
+
+- https://docs.aws.amazon.com/other
+"""
+
+
+def test_parse_results():
+    [first, second] = parse_results(AWS, "AWS")
+    assert first.content == ["S3 Vectors stores vector embeddings.", "```python\nclient.put_vectors()\n```"]
+    assert [(source.title, source.url) for source in first.sources] == [
+        ("What is S3 Vectors", "https://docs.aws.amazon.com/s3/vectors/")
+    ]
+    assert first.specialists == ["AWS"]
+    assert second.sources[0].url == "https://docs.aws.amazon.com/other"
+
+
+def test_unformatted_output_is_kept_whole():
+    [result] = parse_results("No results were found.", "AWS")
+    assert result.content == ["No results were found."]
+    assert result.sources == []
+    assert not cites_sources("No results were found.")
+    assert cites_sources(AWS)
+
+
+def test_aggregate_merges_same_sources_and_drops_repeated_blocks():
+    other = parse_results(AWS.replace("docs.aws.amazon.com/s3/vectors/", "DOCS.aws.amazon.com/s3/vectors"), "AWS 2")
+    merged, tokens_saved = aggregate(parse_results(AWS, "AWS") + other, detector=None)
+    assert len(merged) == 2
+    assert merged[0].content == parse_results(AWS)[0].content
+    assert merged[0].specialists == ["AWS", "AWS 2"]
+    assert tokens_saved == 0
+
+
+def test_aggregate_collapses_near_duplicates_across_sources():
+    quote = " ".join(f"word{i}" for i in range(60))
+    results = parse_results(
+        f"# Result 1\n\n## Content\n\n{quote}\n\n## Sources\n\n- [A](https://a.example)\n\n---\n\n"
+        f"# Result 2\n\n## Content\n\n{quote} extra\n\n## Sources\n\n- [B](https://b.example)\n"
+    )
+    [merged], tokens_saved = aggregate(results, NearDuplicateDetector(threshold=0.8))
+    assert merged.content == [quote]
+    assert tokens_saved == -(-len(f"{quote} extra") // 4)
+    assert [source.url for source in merged.sources] == ["https://a.example", "https://b.example"]
+
+
+def test_format_markdown_round_trips():
+    results = parse_results(AWS)
+    assert [result.content for result in parse_results(format_markdown(results))] == [r.content for r in results]
+
+
+def test_normalize_url():
+    assert normalize_url("HTTPS://Docs.AWS.amazon.com/Path/") == "https://docs.aws.amazon.com/Path"
@@ -0,0 +1,72 @@
+import asyncio
+
+import pytest
+
+from omnisearch_common.single_flight import SingleFlight
+
+
+def test_concurrent_callers_share_one_execution():
+    flights = SingleFlight[str]()
+    calls = 0
+
+    async def execute(publish):
+        nonlocal calls
+        calls += 1
+        await publish("chunk")
+        await asyncio.sleep(0.05)
+        return "done"
+
+    async def main():
+        received: list[str] = []
+
+        async def listener(text):
+            received.append(text)
+
+        results = await asyncio.gather(*(flights.run("key", execute, listener) for _ in range(5)))
+        return results, received
+
+    results, received = asyncio.run(main())
+    assert results == ["done"] * 5
+    assert calls == 1
+    assert received == ["chunk"] * 5  # replayed to callers that joined after it was published
+    assert flights.stats()["coalesced"] == 4
+
+
+def test_cancelled_caller_does_not_cancel_the_others():
+    flights = SingleFlight[str]()
+
+    async def execute(publish):
+        await asyncio.sleep(0.1)
+        return "done"
+
+    async def main():
+        first = asyncio.create_task(flights.run("key", execute))
+        second = asyncio.create_task(flights.run("key", execute))
+        await asyncio.sleep(0.01)
+        first.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await first
+        return await second
+
+    assert asyncio.run(main()) == "done"
+
+
+def test_execution_is_cancelled_once_every_caller_left():
+    flights = SingleFlight[str]()
+
+    async def main():
+        stopped = asyncio.Event()
+
+        async def execute(publish):
+            try:
+                await asyncio.sleep(10)
+            finally:
+                stopped.set()
+
+        caller = asyncio.create_task(flights.run("key", execute))
+        await asyncio.sleep(0.01)
+        caller.cancel()
+        await asyncio.wait_for(stopped.wait(), 1)
+
+    asyncio.run(main())
+    assert flights.stats()["abandoned"] == 1
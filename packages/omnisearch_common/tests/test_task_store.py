@@ -0,0 +1,72 @@
+import asyncio
+
+from a2a.types import Artifact, Part, Task, TaskState, TaskStatus, TextPart
+
+from omnisearch_common.task_store import BoundedTaskStore
+
+
+def task(task_id: str, context_id: str = "context", text: str = "") -> Task:
+    artifacts = [Artifact(artifact_id="a", parts=[Part(root=TextPart(text=text))])] if text else None
+    return Task(
+        id=task_id, context_id=context_id, status=TaskStatus(state=TaskState.completed), artifacts=artifacts
+    )
+
+
+def test_least_recently_used_tasks_are_evicted():
+    async def main():
+        store = BoundedTaskStore(max_tasks=2, max_tasks_per_context=10, sqlite_path=None)
+        await store.save(task("1"))
+        await store.save(task("2"))
+        await store.get("1")
+        await store.save(task("3"))
+        return store, [await store.get(task_id) is not None for task_id in "123"]
+
+    store, kept = asyncio.run(main())
+    assert kept == [True, False, True]
+    assert store.stats()["evicted_lru"] == 1
+
+
+def test_tasks_per_context_are_capped():
+    async def main():
+        store = BoundedTaskStore(max_tasks=100, max_tasks_per_context=2, sqlite_path=None)
+        for task_id in "123":
+            await store.save(task(task_id))
+        await store.save(task("4", context_id="other"))
+        return [await store.get(task_id) is not None for task_id in "1234"]
+
+    assert asyncio.run(main()) == [False, True, True, True]
+
+
+def test_size_is_bounded():
+    async def main():
+        store = BoundedTaskStore(max_tasks=100, max_bytes=30_000, max_tasks_per_context=100, sqlite_path=None)
+        for index in range(10):
+            await store.save(task(str(index), text="x" * 10_000))
+        return store.stats()
+
+    stats = asyncio.run(main())
+    assert stats["bytes"] <= 30_000
+    assert stats["tasks"] < 10
+
+
+def test_idle_tasks_expire():
+    async def main():
+        store = BoundedTaskStore(idle_ttl=0.05, sqlite_path=None)
+        await store.save(task("1"))
+        await asyncio.sleep(0.1)
+        return await store.get("1"), store.stats()["expired"]
+
+    assert asyncio.run(main()) == (None, 1)
+
+
+def test_evicted_tasks_are_spilled_and_loaded_back(tmp_path):
+    async def main():
+        store = BoundedTaskStore(max_tasks=1, max_tasks_per_context=10, sqlite_path=str(tmp_path / "tasks.db"))
+        await store.save(task("1", text="kept on disk"))
+        await store.save(task("2"))
+        return await store.get("1"), store.stats()
+
+    spilled, stats = asyncio.run(main())
+    assert spilled.artifacts[0].parts[0].root.text == "kept on disk"
+    assert stats["spilled"] >= 1
+    assert stats["spill_hits"] == 1
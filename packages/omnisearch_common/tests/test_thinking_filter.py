@@ -0,0 +1,28 @@
+import pytest
+
+from omnisearch_common.thinking_filter import ThinkingFilter, strip_thinking
+
+STREAM = "Before <thinking>plan the search</thinking>after <thinking>more</thinking>end"
+
+
+def test_strip_thinking():
+    assert strip_thinking(STREAM) == "Before after end"
+
+
+@pytest.mark.parametrize("size", [1, 2, 3, 5, 7, 11, len(STREAM)])
+def test_filter_matches_strip_thinking_at_any_chunk_size(size):
+    thinking_filter = ThinkingFilter()
+    output = "".join(thinking_filter.feed(STREAM[i : i + size]) for i in range(0, len(STREAM), size))
+    assert output + thinking_filter.flush() == strip_thinking(STREAM)
+
+
+def test_partial_tag_is_held_back_until_decided():
+    thinking_filter = ThinkingFilter()
+    assert thinking_filter.feed("text <thin") == "text "
+    assert thinking_filter.feed("g> not a tag") == "<thing> not a tag"
+
+
+def test_unterminated_block_is_dropped():
+    thinking_filter = ThinkingFilter()
+    assert thinking_filter.feed("answer <thinking>never closed") == "answer "
+    assert thinking_filter.flush() == ""
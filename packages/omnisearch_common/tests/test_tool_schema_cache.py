@@ -0,0 +1,80 @@
+import threading
+import time
+
+from mcp.types import Tool
+
+from omnisearch_common.tool_schema_cache import ToolSchemaCache
+
+ENDPOINT = "http://mcp.invalid/fake"
+
+
+class Fetcher:
+    """Lists tools named after `self.names`, optionally blocking until `release` is set."""
+
+    def __init__(self, *names: str):
+        self.names = list(names)
+        self.calls = 0
+        self.release = threading.Event()
+        self.release.set()
+
+    def __call__(self) -> list[Tool]:
+        self.calls += 1
+        self.release.wait(2)
+        return [Tool(name=name, inputSchema={"type": "object"}) for name in self.names]
+
+
+def wait_for(condition) -> None:
+    deadline = time.monotonic() + 2
+    while not condition() and time.monotonic() < deadline:
+        time.sleep(0.01)
+
+
+def test_schemas_are_served_from_memory_until_the_ttl_expires():
+    cache = ToolSchemaCache(ttl=0.05)
+    fetch = Fetcher("search")
+
+    assert [tool.name for tool in cache.get(ENDPOINT, fetch)] == ["search"]
+    cache.get(ENDPOINT, fetch)
+    assert fetch.calls == 1
+
+    fetch.names = ["search", "read"]
+    time.sleep(0.1)
+    # The expired entry is still served while it is refreshed in the background.
+    assert [tool.name for tool in cache.get(ENDPOINT, fetch)] == ["search"]
+    wait_for(lambda: cache.version(ENDPOINT) == 2)
+
+    assert [tool.name for tool in cache.get(ENDPOINT, fetch)] == ["search", "read"]
+    assert fetch.calls == 2
+    assert cache.stats()["changes"] == 1
+
+
+def test_list_changed_invalidates_the_entry_and_refreshes_it():
+    cache = ToolSchemaCache(ttl=300)
+    fetch = Fetcher("search")
+    cache.get(ENDPOINT, fetch)
+
+    fetch.names = ["read"]
+    cache.invalidate(ENDPOINT)
+    wait_for(lambda: cache.version(ENDPOINT) == 2)
+
+    assert [tool.name for tool in cache.get(ENDPOINT, fetch)] == ["read"]
+    assert fetch.calls == 2
+
+
+def test_refresh_requests_are_coalesced():
+    cache = ToolSchemaCache(ttl=0)
+    fetch = Fetcher("search")
+    cache.get(ENDPOINT, fetch)
+
+    fetch.release.clear()  # hold the first refresh
+    for _ in range(5):
+        cache.get(ENDPOINT, fetch)  # every lookup finds the entry expired
+    wait_for(lambda: fetch.calls == 2)
+    cache.invalidate(ENDPOINT)  # arrives during the refresh: one more is due
+    cache.invalidate(ENDPOINT)
+    fetch.release.set()
+    wait_for(lambda: cache.stats()["refreshes"] == 2)
+    time.sleep(0.05)
+
+    assert fetch.calls == 3
+    assert cache.stats()["refreshes"] == 2